@@ -48,6 +48,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'rag_app.middleware.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -86,9 +87,108 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # WAL lets several workers read while one of them writes.
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
+# Where LangGraph conversation state is kept: "django" (shared database,
+# safe with several workers) or "memory" (per-process, for development).
+LANGGRAPH_CHECKPOINTER = os.getenv('LANGGRAPH_CHECKPOINTER', 'django')
+# Checkpoints kept per conversation by the "django" checkpointer; older ones
+# and the state only they used are deleted. 0 keeps them all.
+LANGGRAPH_CHECKPOINTS_KEPT = int(os.getenv('LANGGRAPH_CHECKPOINTS_KEPT', '10'))
+
+# CIFAVA workflow variant: "cifava" (analyze_questions + agent, two LLM calls
+# per turn) or "cifava_fused" (one structured call per turn).
+CIFAVA_GRAPH = os.getenv('CIFAVA_GRAPH', 'cifava')
+
+# Seconds between checks of config/prompts.json for changes; edited prompts are
+# recompiled and picked up without restarting the server.
+PROMPTS_RELOAD_INTERVAL = float(os.getenv('PROMPTS_RELOAD_INTERVAL', '1.0'))
+
+# Cache for deterministic LLM calls (CIFAVA answer classification):
+# "tiered" (in-memory LRU over a local SQLite file), "memory" or "none".
+LLM_CACHE = os.getenv('LLM_CACHE', 'tiered')
+LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', str(BASE_DIR / 'llm_cache.sqlite3'))
+LLM_CACHE_TTL = int(os.getenv('LLM_CACHE_TTL', str(24 * 60 * 60)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '1024'))
+
+# Backends created at startup (in a background thread) instead of on first use:
+# comma-separated names among embeddings, faiss, lexical, rag, agent.
+RAG_WARM_UP = [name.strip() for name in os.getenv('RAG_WARM_UP', '').split(',') if name.strip()]
+
+# CIFAVA answers are buffered and written in batches by a background thread:
+# at most every ANSWER_FLUSH_INTERVAL seconds or once ANSWER_FLUSH_BATCH wait.
+ANSWER_FLUSH_INTERVAL = float(os.getenv('ANSWER_FLUSH_INTERVAL', '1.0'))
+ANSWER_FLUSH_BATCH = int(os.getenv('ANSWER_FLUSH_BATCH', '500'))
+# Completed forms are exported once their row is this many seconds old, so
+# transactions still running when an export reads cannot commit behind it.
+EXPORT_SETTLE_SECONDS = float(os.getenv('EXPORT_SETTLE_SECONDS', '30'))
+
+# Embeddings cache keyed by (model, sha256(text)), shared by every vector store
+# and worker on the host: "sqlite" (float32 vectors in a local file) or "none".
+EMBEDDING_CACHE = os.getenv('EMBEDDING_CACHE', 'sqlite')
+EMBEDDING_CACHE_PATH = os.getenv('EMBEDDING_CACHE_PATH', str(BASE_DIR / 'embedding_cache.sqlite3'))
+
+# FAISS additions are embedded VECTOR_EMBED_BATCH texts per provider call and
+# journaled; the index files are rewritten once VECTOR_FLUSH_EVERY documents
+# wait, at most VECTOR_FLUSH_INTERVAL seconds after an addition, and at exit
+# (the ingest command only once, at its end).
+VECTOR_EMBED_BATCH = int(os.getenv('VECTOR_EMBED_BATCH', '64'))
+VECTOR_FLUSH_EVERY = int(os.getenv('VECTOR_FLUSH_EVERY', '1000'))
+VECTOR_FLUSH_INTERVAL = float(os.getenv('VECTOR_FLUSH_INTERVAL', '5.0'))
+
+# How each process loads the saved FAISS index: "heap" (read whole) or "mmap"
+# (index and docstore memory-mapped read-only and shared through the page
+# cache; startup time does not grow with the index).
+VECTOR_LOAD_MODE = os.getenv('VECTOR_LOAD_MODE', 'heap')
+
+# FAISS index built by rebuild_index/convert_index: "flat" (exact), "ivf_flat",
+# "ivf_pq" or "hnsw". IVF lists (0: 4 * sqrt(N)), PQ sub-quantizers, HNSW links
+# per node and training sample size, then the default search knobs.
+VECTOR_INDEX_TYPE = os.getenv('VECTOR_INDEX_TYPE', 'flat')
+VECTOR_IVF_NLIST = int(os.getenv('VECTOR_IVF_NLIST', '0'))
+VECTOR_PQ_M = int(os.getenv('VECTOR_PQ_M', '64'))
+VECTOR_HNSW_M = int(os.getenv('VECTOR_HNSW_M', '32'))
+VECTOR_TRAIN_SAMPLE = int(os.getenv('VECTOR_TRAIN_SAMPLE', '100000'))
+VECTOR_NPROBE = int(os.getenv('VECTOR_NPROBE', '16'))
+VECTOR_EF_SEARCH = int(os.getenv('VECTOR_EF_SEARCH', '64'))
+
+# Local BM25 index over Document title/content (rag_app.search.hybrid_search
+# fuses it with FAISS): file location, BM25 k1 and b, and how often each
+# process applies document changes made elsewhere and writes the file. RRF
+# constant and candidates taken from each side.
+LEXICAL_INDEX_PATH = os.getenv('LEXICAL_INDEX_PATH', str(BASE_DIR / 'lexical_index'))
+LEXICAL_BM25_K1 = float(os.getenv('LEXICAL_BM25_K1', '1.2'))
+LEXICAL_BM25_B = float(os.getenv('LEXICAL_BM25_B', '0.75'))
+LEXICAL_FLUSH_INTERVAL = float(os.getenv('LEXICAL_FLUSH_INTERVAL', '5.0'))
+HYBRID_RRF_K = int(os.getenv('HYBRID_RRF_K', '60'))
+HYBRID_CANDIDATES = int(os.getenv('HYBRID_CANDIDATES', '50'))
+
+# manage.py ingest: chunk length and overlap (tokens), concurrent embedding
+# calls, and chunks written to the database and FAISS per commit.
+INGEST_CHUNK_TOKENS = int(os.getenv('INGEST_CHUNK_TOKENS', '500'))
+INGEST_CHUNK_OVERLAP = int(os.getenv('INGEST_CHUNK_OVERLAP', '50'))
+INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', '4'))
+INGEST_COMMIT_SIZE = int(os.getenv('INGEST_COMMIT_SIZE', '1000'))
+
+# In-process metrics (view, LangGraph node, LLM, checkpoint and FAISS timings,
+# token counts) exposed in Prometheus text format on /metrics. Each worker
+# process keeps its own values.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+# Clients allowed to scrape /metrics besides staff users: comma-separated
+# addresses or CIDR networks (e.g. "127.0.0.1,10.0.0.0/8"), matched against
+# REMOTE_ADDR. Loopback only by default.
+METRICS_ALLOWED_NETWORKS = [
+    network.strip()
+    for network in os.getenv('METRICS_ALLOWED_NETWORKS', '127.0.0.1,::1').split(',')
+    if network.strip()
+]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -138,13 +238,31 @@ REST_FRAMEWORK = {
     ),
     'DEFAULT_PARSER_CLASSES': (
         'rest_framework.parsers.JSONParser',
-    )
+    ),
+    # Per-user request rates of the throttled endpoints (throttle_scope),
+    # counted in the default cache.
+    'DEFAULT_THROTTLE_RATES': {
+        'search_many': os.getenv('SEARCH_MANY_THROTTLE_RATE', '10/min'),
+        'hybrid_search': os.getenv('HYBRID_SEARCH_THROTTLE_RATE', '30/min'),
+    },
 }
 
-ELASTICSEARCH_DSL = {
-    'default': {
-        'hosts': 'http://localhost:9200'
-    }
+# Application logs (rag_app.*) on the console; Django keeps its defaults.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'plain': {'format': '%(asctime)s - %(levelname)s - %(name)s - %(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'plain'},
+    },
+    'loggers': {
+        'rag_app': {
+            'handlers': ['console'],
+            'level': os.getenv('RAG_LOG_LEVEL', 'INFO'),
+        },
+    },
 }
 
 # LOGGING = {
@@ -2,6 +2,7 @@ from langchain.agents import initialize_agent, AgentType
 from langchain.llms import OpenAI
 from langchain.tools import Tool
 from .rag import search_rag
+from .services.providers import LazyProvider
 import os
 
 # 🔹 Definir una herramienta para buscar en RAG (FAISS)
@@ -18,12 +19,14 @@ tools = [
     )
 ]
 
-# 🔥 Crear el Agente con OpenAI y LangChain
-llm = OpenAI(openai_api_key=os.getenv("OPENAI_API_KEY"))
+# 🔥 Crear el Agente con OpenAI y LangChain (en el primer uso, no al importar)
+def build_agent():
+    llm = OpenAI(openai_api_key=os.getenv("OPENAI_API_KEY"))
+    return initialize_agent(
+        tools=tools,
+        llm=llm,
+        agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
+        verbose=True,
+    )
 
-agent = initialize_agent(
-    tools=tools,
-    llm=llm,
-    agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
-    verbose=True,
-)
\ No newline at end of file
+agent_provider = LazyProvider("agent", build_agent)
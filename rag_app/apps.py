@@ -1,6 +1,42 @@
+import threading
+
 from django.apps import AppConfig
 
 
 class RagAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'rag_app'
+
+    def ready(self):
+        # Keeps the lexical index in step with Document saves and deletes.
+        from . import signals  # noqa: F401
+
+        # Importing the chat services registers their LangGraph workflows;
+        # compiling them here validates every graph once at startup instead of
+        # rebuilding it on each request.
+        from .services import chat_service, cifava_chat_service  # noqa: F401
+        from .services.graph_registry import graph_registry
+        from .services.prompt_registry import prompt_registry
+
+        graph_registry.compile_all()
+        prompt_registry.reload()
+        self.warm_up()
+
+    def warm_up(self):
+        """
+        Vector stores, the lexical index and the agent are created on first
+        use. Those listed in settings.RAG_WARM_UP ("embeddings", "faiss",
+        "lexical", "rag", "agent") are created now instead, in a
+        background thread so a slow backend does not hold up startup.
+        """
+        from django.conf import settings
+
+        names = getattr(settings, "RAG_WARM_UP", [])
+        if not names:
+            return
+
+        from .services.providers import warm_up
+
+        threading.Thread(
+            target=warm_up, args=(names,), name="rag-warm-up", daemon=True
+        ).start()
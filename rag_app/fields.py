@@ -0,0 +1,71 @@
+import base64
+import struct
+from typing import Optional, Sequence, Union
+
+import numpy as np
+from django.core.exceptions import ValidationError
+from django.db import models
+
+# b"VF", dtype code, padding, dimension (uint32). Eight bytes, so the values
+# that follow stay aligned for NumPy.
+HEADER = struct.Struct("<2sBxI")
+MAGIC = b"VF"
+DTYPES = {1: np.dtype("<f4")}
+DTYPE_CODES = {dtype: code for code, dtype in DTYPES.items()}
+
+VectorLike = Union[np.ndarray, Sequence[float]]
+
+
+def pack_vector(vector: VectorLike) -> bytes:
+    """Header followed by the vector as little-endian float32."""
+    array = np.ascontiguousarray(vector, dtype="<f4")
+    if array.ndim != 1:
+        raise ValueError("A vector must be one-dimensional.")
+    return HEADER.pack(MAGIC, DTYPE_CODES[array.dtype], len(array)) + array.tobytes()
+
+
+def unpack_vector(data: Union[bytes, memoryview]) -> np.ndarray:
+    """
+    Read-only array over ``data`` itself (no copy), as returned by the
+    database driver.
+    """
+    magic, code, dimension = HEADER.unpack_from(data)
+    if magic != MAGIC or code not in DTYPES:
+        raise ValueError("Not a packed vector.")
+    return np.frombuffer(data, dtype=DTYPES[code], count=dimension, offset=HEADER.size)
+
+
+class VectorField(models.BinaryField):
+    """
+    Embedding stored as a packed binary vector (see ``pack_vector``): 4 bytes
+    per dimension instead of a JSON list of decimal strings. Reads return a
+    NumPy array over the fetched bytes; lists and arrays can be assigned.
+    """
+
+    description = "Packed float32 vector"
+
+    def from_db_value(self, value, expression, connection) -> Optional[np.ndarray]:
+        if value is None:
+            return None
+        return unpack_vector(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, np.ndarray):
+            return value
+        if isinstance(value, str):
+            value = base64.b64decode(value)
+        try:
+            if isinstance(value, (bytes, bytearray, memoryview)):
+                return unpack_vector(value)
+            return np.asarray(value, dtype="<f4")
+        except (ValueError, TypeError, struct.error) as e:
+            raise ValidationError(f"Invalid vector: {e}")
+
+    def get_prep_value(self, value):
+        if value is None or isinstance(value, (bytes, memoryview)):
+            return value
+        return pack_vector(value)
+
+    def value_to_string(self, obj) -> str:
+        value = self.get_prep_value(self.value_from_object(obj))
+        return "" if value is None else base64.b64encode(value).decode("ascii")
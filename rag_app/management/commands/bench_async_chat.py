@@ -0,0 +1,85 @@
+import asyncio
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from langgraph.checkpoint.memory import MemorySaver
+
+from rag_app.services import cifava_chat_service
+from rag_app.services.fake_llm import FakeChatModel
+from rag_app.services.graph_registry import graph_registry
+
+
+class Command(BaseCommand):
+    help = (
+        "Concurrency benchmark: runs many simultaneous CIFAVA conversations "
+        "against a fake LLM with artificial latency, once on a bounded thread "
+        "pool (sync invoke, like a threaded WSGI worker) and once on a single "
+        "event loop (ainvoke, like an ASGI worker)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sessions", type=int, default=200)
+        parser.add_argument("--turns", type=int, default=3)
+        parser.add_argument(
+            "--latency", type=float, default=0.5, help="Fake LLM latency (seconds)."
+        )
+        parser.add_argument(
+            "--threads", type=int, default=8, help="Thread pool size for the sync run."
+        )
+        parser.add_argument(
+            "--graph", default=getattr(settings, "CIFAVA_GRAPH", "cifava")
+        )
+
+    def handle(self, *args, **options):
+        sessions = options["sessions"]
+        turns = options["turns"]
+        fake_llm = FakeChatModel(latency=options["latency"])
+
+        with cifava_chat_service.runnable_provider.override(
+            fake_llm
+        ), cifava_chat_service.classifier_provider.override(fake_llm):
+            app = graph_registry.build(options["graph"]).compile(
+                checkpointer=MemorySaver()
+            )
+
+            elapsed = self.run_sync(app, sessions, turns, options["threads"])
+            self.report(f"sync, {options['threads']} threads", elapsed, sessions, turns)
+
+            elapsed = asyncio.run(self.run_async(app, sessions, turns))
+            self.report("async, 1 event loop", elapsed, sessions, turns)
+
+    def run_sync(self, app, sessions, turns, threads):
+        def conversation(_):
+            config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+            for turn in range(turns):
+                app.invoke(
+                    {"messages": [{"role": "user", "content": f"mensaje {turn}"}]},
+                    config,
+                )
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(conversation, range(sessions)))
+        return time.perf_counter() - start
+
+    async def run_async(self, app, sessions, turns):
+        async def conversation():
+            config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+            for turn in range(turns):
+                await app.ainvoke(
+                    {"messages": [{"role": "user", "content": f"mensaje {turn}"}]},
+                    config,
+                )
+
+        start = time.perf_counter()
+        await asyncio.gather(*(conversation() for _ in range(sessions)))
+        return time.perf_counter() - start
+
+    def report(self, label, elapsed, sessions, turns):
+        self.stdout.write(
+            f"{label}: {sessions} sessions x {turns} turns in {elapsed:.2f} s "
+            f"({sessions * turns / elapsed:.1f} turns/s)"
+        )
@@ -0,0 +1,57 @@
+import statistics
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from langgraph.checkpoint.memory import MemorySaver
+
+from rag_app.services import cifava_chat_service
+from rag_app.services.fake_llm import FakeChatModel
+from rag_app.services.graph_registry import graph_registry
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares per-turn latency of the two-node CIFAVA flow "
+        "(analyze_questions + agent) against the fused single-call flow, "
+        "using a stub LLM with a fixed latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--turns", type=int, default=20)
+        parser.add_argument(
+            "--latency", type=float, default=0.2, help="Stub LLM latency (seconds)."
+        )
+
+    def handle(self, *args, **options):
+        turns = options["turns"]
+        fake_llm = FakeChatModel(latency=options["latency"])
+        # Uncached classifier, so both flows are compared on model calls alone.
+        with cifava_chat_service.runnable_provider.override(
+            fake_llm
+        ), cifava_chat_service.classifier_provider.override(fake_llm):
+            for name in (
+                cifava_chat_service.CIFAVA_GRAPH,
+                cifava_chat_service.CIFAVA_FUSED_GRAPH,
+            ):
+                app = graph_registry.build(name).compile(checkpointer=MemorySaver())
+                config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+                fake_llm.reset_calls()
+
+                latencies = []
+                for turn in range(turns):
+                    start = time.perf_counter()
+                    app.invoke(
+                        {"messages": [{"role": "user", "content": f"mensaje {turn}"}]},
+                        config,
+                    )
+                    latencies.append(time.perf_counter() - start)
+
+                # The first turn only greets, so it is reported separately.
+                rest = latencies[1:] or latencies
+                self.stdout.write(
+                    f"{name}: first turn {latencies[0] * 1e3:.1f} ms, "
+                    f"following turns mean {statistics.mean(rest) * 1e3:.1f} ms / "
+                    f"max {max(rest) * 1e3:.1f} ms, "
+                    f"{fake_llm.calls / turns:.2f} LLM calls per turn"
+                )
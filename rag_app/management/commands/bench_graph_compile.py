@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from rag_app.services.graph_registry import graph_registry
+
+
+class Command(BaseCommand):
+    help = (
+        "Microbenchmark of the per-turn graph overhead: building and compiling "
+        "a workflow on every request versus fetching it from the registry."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=200)
+        parser.add_argument(
+            "--graph",
+            action="append",
+            dest="graphs",
+            help="Workflow name to benchmark (repeatable). Defaults to all.",
+        )
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+        names = options["graphs"] or graph_registry.names()
+
+        for name in names:
+            start = time.perf_counter()
+            for _ in range(iterations):
+                graph_registry.compile(name)
+            per_turn_before = (time.perf_counter() - start) / iterations
+
+            graph_registry.get(name)
+            start = time.perf_counter()
+            for _ in range(iterations):
+                graph_registry.get(name)
+            per_turn_after = (time.perf_counter() - start) / iterations
+
+            self.stdout.write(
+                f"{name}: build+compile per turn {per_turn_before * 1e3:.3f} ms, "
+                f"registry lookup per turn {per_turn_after * 1e6:.3f} us "
+                f"({per_turn_before / per_turn_after:.0f}x less overhead)"
+            )
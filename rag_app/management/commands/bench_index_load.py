@@ -0,0 +1,83 @@
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+import faiss
+import numpy as np
+from django.core.management.base import BaseCommand
+from langchain_community.vectorstores import FAISS
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_core.documents import Document
+
+from rag_app.services.fake_llm import FakeEmbeddings
+from rag_app.services.mapped_docstore import write_mapped_docstore
+
+
+def rss_kb() -> int:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def load_once(path: str, mode: str, dimensions: int):
+    """Runs in a fresh process: (seconds to load, RSS growth in KB, first search seconds)."""
+    import django
+
+    django.setup()
+    from rag_app.services.vector_service import FAISSManager
+
+    embeddings = FakeEmbeddings(size=dimensions)
+    before = rss_kb()
+    start = time.perf_counter()
+    manager = FAISSManager(Path(path), embeddings=embeddings, load_mode=mode)
+    loaded = time.perf_counter() - start
+    start = time.perf_counter()
+    manager.search("consulta")
+    searched = time.perf_counter() - start
+    return loaded, rss_kb() - before, searched
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures FAISSManager startup in a fresh process with the index read "
+        "into the heap and memory-mapped, for several index sizes: load time, "
+        "RSS growth and first search latency. Uses offline embeddings and "
+        "throwaway indexes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="10000,100000")
+        parser.add_argument("--dimensions", type=int, default=768)
+
+    def handle(self, *args, **options):
+        dimensions = options["dimensions"]
+        rng = np.random.default_rng(0)
+        context = get_context("spawn")
+
+        with tempfile.TemporaryDirectory() as directory:
+            for size in (int(value) for value in options["sizes"].split(",")):
+                path = Path(directory) / str(size)
+                index = faiss.IndexFlatL2(dimensions)
+                index.add(rng.standard_normal((size, dimensions)).astype("float32"))
+                ids = {n: str(n) for n in range(size)}
+                docstore = InMemoryDocstore(
+                    {str(n): Document(page_content=f"documento {n}", metadata={"n": n}) for n in range(size)}
+                )
+                db = FAISS(FakeEmbeddings(size=dimensions), index, docstore, ids)
+                db.save_local(str(path))
+                write_mapped_docstore(db, path)
+                del db, index, docstore
+
+                for mode in ("heap", "mmap"):
+                    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                        loaded, rss, searched = executor.submit(
+                            load_once, str(path), mode, dimensions
+                        ).result()
+                    self.stdout.write(
+                        f"{size} vectors, {mode}: loaded in {loaded * 1000:.0f} ms, "
+                        f"+{rss / 1024:.0f} MB RSS, first search {searched * 1000:.1f} ms"
+                    )
@@ -0,0 +1,87 @@
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from rag_app.services.lexical_index import INDEX_NAME, LexicalIndex
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the lexical (BM25) index on synthetic documents in a "
+        "throwaway directory: indexing rate, merge and save, file size, load "
+        "time, and search latency before and after incremental additions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--documents", type=int, default=100000)
+        parser.add_argument("--words", type=int, default=200, help="Words per document.")
+        parser.add_argument("--vocabulary", type=int, default=50000)
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--k", type=int, default=10)
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        # Zipf-like word frequencies, as in natural text.
+        vocabulary = [f"palabra{n}" for n in range(options["vocabulary"])]
+        weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+
+        def text(words):
+            return " ".join(rng.choices(vocabulary, weights, k=words))
+
+        rows = [
+            (n + 1, f"documento {n}", text(options["words"]))
+            for n in range(options["documents"])
+        ]
+        queries = [text(3) for _ in range(options["queries"])]
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory)
+            index = LexicalIndex(path, flush_interval=3600)
+
+            start = time.perf_counter()
+            index.add_documents(rows)
+            added = time.perf_counter() - start
+            self.stdout.write(
+                f"add: {len(rows) / added:.0f} documents/s ({added:.1f}s)"
+            )
+            self.report_search(index, queries, options["k"], "search (buffered)")
+
+            start = time.perf_counter()
+            index.save()
+            self.stdout.write(
+                f"merge + save: {time.perf_counter() - start:.2f}s, "
+                f"{len(index.postings)} postings, "
+                f"{(path / INDEX_NAME).stat().st_size / 1e6:.1f} MB on disk"
+            )
+            self.report_search(index, queries, options["k"], "search (merged)")
+
+            extra = [(len(rows) + n + 1, "nuevo", text(options["words"])) for n in range(1000)]
+            start = time.perf_counter()
+            index.add_documents(extra)
+            self.stdout.write(
+                f"add 1000 more: {(time.perf_counter() - start) * 1000:.0f} ms"
+            )
+            self.report_search(index, queries, options["k"], "search (merged + 1000 buffered)")
+            index.close()
+
+            start = time.perf_counter()
+            loaded = LexicalIndex(path)
+            self.stdout.write(
+                f"load: {(time.perf_counter() - start) * 1000:.0f} ms, {len(loaded)} documents"
+            )
+
+    def report_search(self, index, queries, k, label):
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query, k=k)
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        self.stdout.write(
+            f"{label}: median {statistics.median(latencies) * 1000:.2f} ms, "
+            f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.2f} ms"
+        )
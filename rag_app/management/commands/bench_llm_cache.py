@@ -0,0 +1,69 @@
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from langchain_core.messages import AIMessage, HumanMessage
+
+from rag_app.services import cifava_chat_service
+from rag_app.services.fake_llm import FakeChatModel
+from rag_app.services.llm_cache import TieredLLMCache
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the answer-classification step (analyze_questions) when the "
+        "same message is submitted repeatedly (retries, double clicks), "
+        "without cache, with a warm memory tier and with only the SQLite "
+        "tier (a fresh process), using a stub LLM with a fixed latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeats", type=int, default=20)
+        parser.add_argument(
+            "--latency", type=float, default=0.3, help="Stub LLM latency (seconds)."
+        )
+
+    def handle(self, *args, **options):
+        repeats = options["repeats"]
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "llm_cache.sqlite3"
+            uncached = FakeChatModel(latency=options["latency"])
+            self.run("no cache", uncached, repeats)
+
+            cache = TieredLLMCache(path=path)
+            cached = FakeChatModel(latency=options["latency"], cache=cache)
+            self.run("memory + sqlite", cached, repeats, cache)
+
+            # A new cache object on the same file: empty memory tier.
+            cache = TieredLLMCache(path=path, max_entries=0)
+            cached = FakeChatModel(latency=options["latency"], cache=cache)
+            self.run("sqlite only", cached, repeats, cache)
+
+    def run(self, label, model, repeats, cache=None):
+        latencies = []
+        with cifava_chat_service.classifier_provider.override(model):
+            for _ in range(repeats):
+                state = {
+                    "messages": [
+                        HumanMessage(content="hola"),
+                        AIMessage(content="¡Hola! ¿Cuál es tu nombre?"),
+                        HumanMessage(content="Me llamo Ana y trabajo de enfermera"),
+                    ],
+                    "answers": {},
+                    "next_question": 0,
+                }
+                start = time.perf_counter()
+                cifava_chat_service.analyze_questions(state)
+                latencies.append(time.perf_counter() - start)
+
+        line = (
+            f"{label}: mean {statistics.mean(latencies) * 1e3:.2f} ms, "
+            f"max {max(latencies) * 1e3:.2f} ms, "
+            f"{model.calls} LLM calls for {repeats} submissions"
+        )
+        if cache is not None:
+            line += f", {cache.stats()}"
+        self.stdout.write(line)
@@ -0,0 +1,64 @@
+import tempfile
+import time
+from pathlib import Path
+
+import faiss
+from django.core.management.base import BaseCommand
+from langchain_community.vectorstores import FAISS
+
+from rag_app.services.fake_llm import FakeEmbeddings
+from rag_app.services.vector_service import FAISSManager
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares answering Q queries with Q calls to FAISSManager.search and "
+        "with one search_many call (one embeddings call, one matrix search), "
+        "on a throwaway index with offline embeddings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--documents", type=int, default=50000)
+        parser.add_argument("--dimensions", type=int, default=768)
+        parser.add_argument("--queries", type=int, default=64)
+        parser.add_argument("--k", type=int, default=4)
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=0.05,
+            help="Fake embeddings latency per provider call (seconds).",
+        )
+
+    def handle(self, *args, **options):
+        embeddings = FakeEmbeddings(size=options["dimensions"])
+        queries = [f"consulta {n}" for n in range(options["queries"])]
+        k = options["k"]
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "index"
+            texts = [f"documento {n}" for n in range(options["documents"])]
+            FAISS.from_texts(texts, embeddings).save_local(str(path))
+            embeddings.latency = options["latency"]
+            manager = FAISSManager(path, embeddings=embeddings)
+
+            embeddings.calls = 0
+            start = time.perf_counter()
+            single = [manager.search(query, k=k) for query in queries]
+            one_by_one = time.perf_counter() - start
+            single_calls = embeddings.calls
+
+            embeddings.calls = 0
+            start = time.perf_counter()
+            batched = manager.search_many(queries, k=k)
+            together = time.perf_counter() - start
+            manager.close()
+
+        assert single == batched, "search_many must return what search returns"
+        for label, elapsed, calls in (
+            ("search x Q", one_by_one, single_calls),
+            ("search_many", together, embeddings.calls),
+        ):
+            self.stdout.write(
+                f"{label}: {elapsed * 1000:.0f} ms, {len(queries) / elapsed:.0f} queries/s, "
+                f"{calls} embedding calls (faiss threads: {faiss.omp_get_max_threads()})"
+            )
@@ -0,0 +1,83 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter: Django setup, importing the RAG modules, and
+# the first request through the full middleware stack.
+FIRST_REQUEST_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+setup = time.perf_counter() - start
+
+start = time.perf_counter()
+import rag_app.rag, rag_app.services.vector_service
+imports = time.perf_counter() - start
+
+from django.test import Client
+start = time.perf_counter()
+response = Client().get(sys.argv[1])
+first_request = time.perf_counter() - start
+print(json.dumps({"setup": setup, "imports": imports, "first_request": first_request,
+                  "status": response.status_code}))
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures startup cost in fresh processes: wall time of "
+        "'manage.py check', and Django setup, import of the RAG modules and "
+        "first request latency. RAG_WARM_UP is cleared so nothing is created "
+        "ahead of time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeats", type=int, default=5)
+        parser.add_argument("--path", default="/metrics", help="URL of the first request.")
+
+    def handle(self, *args, **options):
+        manage = str(Path(settings.BASE_DIR) / "manage.py")
+        env = {**os.environ, "RAG_WARM_UP": ""}
+
+        checks = []
+        for _ in range(options["repeats"]):
+            start = time.perf_counter()
+            result = subprocess.run(
+                [sys.executable, manage, "check"], env=env, capture_output=True, text=True
+            )
+            checks.append(time.perf_counter() - start)
+            if result.returncode:
+                raise CommandError(f"manage.py check failed:\n{result.stderr}")
+        self.stdout.write(
+            f"manage.py check: median {statistics.median(checks) * 1000:.0f} ms, "
+            f"max {max(checks) * 1000:.0f} ms"
+        )
+
+        runs = []
+        for _ in range(options["repeats"]):
+            result = subprocess.run(
+                [sys.executable, "-c", FIRST_REQUEST_SCRIPT, options["path"]],
+                env=env,
+                cwd=settings.BASE_DIR,
+                capture_output=True,
+                text=True,
+            )
+            if result.returncode:
+                raise CommandError(f"First request run failed:\n{result.stderr}")
+            runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+        for key in ("setup", "imports", "first_request"):
+            values = [run[key] for run in runs]
+            self.stdout.write(
+                f"{key}: median {statistics.median(values) * 1000:.1f} ms, "
+                f"max {max(values) * 1000:.1f} ms"
+            )
+        self.stdout.write(f"first request status: {runs[-1]['status']}")
@@ -0,0 +1,102 @@
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import faiss
+from django.core.management.base import BaseCommand
+from langchain_community.vectorstores import FAISS
+
+from rag_app.services.fake_llm import FakeEmbeddings
+from rag_app.services.vector_service import FAISSManager
+
+
+class ExclusiveLockManager(FAISSManager):
+    """The previous behaviour: one lock shared by searches and writes."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        self.lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def add_document(self, content, metadata):
+        with self.lock:
+            self.db.add_texts([content], metadatas=[metadata])
+            self.db.save_local(str(self.index_path))
+
+    def search(self, query):
+        with self.lock:
+            return super().search(query)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures FAISSManager search throughput with 1..N searching threads "
+        "while a writer keeps adding documents, comparing the snapshot "
+        "(lock-free reads) manager with a single exclusive lock. Uses "
+        "offline embeddings and a throwaway index."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--documents", type=int, default=20000)
+        parser.add_argument("--dimensions", type=int, default=256)
+        parser.add_argument("--threads", default="1,2,4,8")
+        parser.add_argument(
+            "--seconds", type=float, default=3.0, help="Duration of each run."
+        )
+        parser.add_argument(
+            "--write-interval",
+            type=float,
+            default=0.05,
+            help="Pause between the writer's additions (seconds).",
+        )
+
+    def handle(self, *args, **options):
+        embeddings = FakeEmbeddings(size=options["dimensions"])
+        threads = [int(value) for value in options["threads"].split(",")]
+        faiss.omp_set_num_threads(1)  # Parallelism comes from the threads
+
+        with tempfile.TemporaryDirectory() as directory:
+            texts = [f"documento {n}" for n in range(options["documents"])]
+            seed = FAISS.from_texts(texts, embeddings)
+
+            for label, manager_class in (
+                ("exclusive lock", ExclusiveLockManager),
+                ("snapshot", FAISSManager),
+            ):
+                path = Path(directory) / label.replace(" ", "_")
+                seed.save_local(str(path))
+                manager = manager_class(path, embeddings=embeddings)
+                for count in threads:
+                    searches, writes = self.run(manager, count, options)
+                    self.stdout.write(
+                        f"{label}: {count} threads, "
+                        f"{searches / options['seconds']:.0f} searches/s, "
+                        f"{writes / options['seconds']:.1f} writes/s"
+                    )
+                manager.close()
+
+    def run(self, manager, threads, options):
+        stop = threading.Event()
+
+        def reader(number):
+            done = 0
+            while not stop.is_set():
+                manager.search(f"consulta {number} {done}")
+                done += 1
+            return done
+
+        def writer():
+            done = 0
+            while not stop.is_set():
+                manager.add_document(f"nuevo {time.monotonic()}", {"title": "bench"})
+                done += 1
+                stop.wait(options["write_interval"])
+            return done
+
+        with ThreadPoolExecutor(max_workers=threads + 1) as executor:
+            written = executor.submit(writer)
+            searched = [executor.submit(reader, n) for n in range(threads)]
+            time.sleep(options["seconds"])
+            stop.set()
+            return sum(f.result() for f in searched), written.result()
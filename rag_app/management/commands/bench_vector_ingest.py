@@ -0,0 +1,63 @@
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from rag_app.services.fake_llm import FakeEmbeddings
+from rag_app.services.vector_service import FAISSManager
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures ingesting N documents into a fresh FAISSManager one "
+        "add_document at a time with the index saved after each (the previous "
+        "behaviour) and with add_documents (batched embedding, journaled, "
+        "saved once). Uses offline embeddings with a fixed per-call latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--documents", type=int, default=2000)
+        parser.add_argument("--dimensions", type=int, default=1536)
+        parser.add_argument("--batch-size", type=int, default=64)
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=0.05,
+            help="Fake embeddings latency per provider call (seconds).",
+        )
+
+    def handle(self, *args, **options):
+        texts = [f"documento {n}" for n in range(options["documents"])]
+        metadatas = [{"title": f"doc {n}"} for n in range(len(texts))]
+
+        with tempfile.TemporaryDirectory() as directory:
+            for label in ("one by one, saved each time", "add_documents"):
+                embeddings = FakeEmbeddings(
+                    size=options["dimensions"], latency=options["latency"]
+                )
+                path = Path(directory) / label.split(",")[0].replace(" ", "_")
+                manager = FAISSManager(
+                    path,
+                    embeddings=embeddings,
+                    batch_size=options["batch_size"],
+                    flush_every=len(texts) + 1,
+                    flush_interval=3600,
+                )
+                embeddings.calls = 0
+
+                start = time.perf_counter()
+                if label == "add_documents":
+                    manager.add_documents(texts, metadatas)
+                else:
+                    for text, metadata in zip(texts, metadatas):
+                        manager.add_document(text, metadata)
+                        manager.flush()
+                manager.close()
+                elapsed = time.perf_counter() - start
+
+                self.stdout.write(
+                    f"{label}: {elapsed:.2f}s, "
+                    f"{len(texts) / elapsed:.0f} documents/s, "
+                    f"{embeddings.calls} embedding calls"
+                )
@@ -0,0 +1,88 @@
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from rag_app.models import Document
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares storing document embeddings as JSON (the previous column "
+        "type) and as packed float32 (VectorField): bulk insert time, time to "
+        "load every vector into a NumPy matrix, and bytes per stored vector. "
+        "Runs against a throwaway SQLite test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--documents", type=int, default=5000)
+        parser.add_argument("--dimensions", type=int, default=1536)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((options["documents"], options["dimensions"]))
+        vectors = vectors.astype("float32")
+
+        with tempfile.TemporaryDirectory() as directory:
+            setup_test_environment()
+            connection.settings_dict.setdefault("TEST", {})["NAME"] = str(
+                Path(directory) / "bench_vector_storage.sqlite3"
+            )
+            old_name = connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, serialize=False
+            )
+            try:
+                self.report("json", *self.run_json(vectors))
+                self.report("float32", *self.run_vector(vectors))
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                teardown_test_environment()
+
+    def run_json(self, vectors):
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE TABLE bench_json (id INTEGER PRIMARY KEY, embedding TEXT)")
+
+            start = time.perf_counter()
+            with transaction.atomic():
+                cursor.executemany(
+                    "INSERT INTO bench_json (embedding) VALUES (%s)",
+                    [(json.dumps(vector.tolist()),) for vector in vectors],
+                )
+            write = time.perf_counter() - start
+
+            start = time.perf_counter()
+            cursor.execute("SELECT embedding FROM bench_json ORDER BY id")
+            matrix = np.array([json.loads(row[0]) for row in cursor.fetchall()], dtype="float32")
+            read = time.perf_counter() - start
+
+            cursor.execute("SELECT AVG(LENGTH(embedding)) FROM bench_json")
+            size = cursor.fetchone()[0]
+        return write, read, size, matrix
+
+    def run_vector(self, vectors):
+        start = time.perf_counter()
+        Document.objects.bulk_create(
+            [Document(title=str(n), content="", embedding=vector) for n, vector in enumerate(vectors)],
+            batch_size=500,
+        )
+        write = time.perf_counter() - start
+
+        start = time.perf_counter()
+        matrix = np.stack(Document.objects.order_by("id").values_list("embedding", flat=True))
+        read = time.perf_counter() - start
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT AVG(LENGTH(embedding)) FROM {Document._meta.db_table}")
+            size = cursor.fetchone()[0]
+        return write, read, size, matrix
+
+    def report(self, label, write, read, size, matrix):
+        self.stdout.write(
+            f"{label}: insert {write:.2f}s, load {read:.2f}s "
+            f"({len(matrix) / read:.0f} vectors/s), {size:.0f} bytes per vector"
+        )
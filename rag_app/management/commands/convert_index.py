@@ -0,0 +1,66 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rag_app.services.faiss_indexes import (
+    INDEX_TYPES,
+    VECTOR_EF_SEARCH,
+    VECTOR_HNSW_M,
+    VECTOR_INDEX_TYPE,
+    VECTOR_IVF_NLIST,
+    VECTOR_NPROBE,
+    VECTOR_PQ_M,
+    VECTOR_TRAIN_SAMPLE,
+    index_type_of,
+)
+from rag_app.services.vector_service import get_faiss_manager
+
+
+class Command(BaseCommand):
+    help = (
+        "Converts the saved FAISS index (e.g. the default flat one) to another "
+        "index type without embedding anything again: IVF-Flat and IVF-PQ are "
+        "trained on a random sample of the stored vectors, HNSW is built "
+        "directly. Document ids and metadata are kept. Use tune_index to "
+        "choose nprobe/efSearch afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--type", choices=INDEX_TYPES, default=VECTOR_INDEX_TYPE)
+        parser.add_argument(
+            "--nlist", type=int, default=VECTOR_IVF_NLIST, help="IVF lists (0: 4 * sqrt(N))."
+        )
+        parser.add_argument(
+            "--pq-m", type=int, default=VECTOR_PQ_M, help="PQ sub-quantizers; must divide the dimension."
+        )
+        parser.add_argument("--hnsw-m", type=int, default=VECTOR_HNSW_M)
+        parser.add_argument("--train-sample", type=int, default=VECTOR_TRAIN_SAMPLE)
+        parser.add_argument("--nprobe", type=int, default=VECTOR_NPROBE)
+        parser.add_argument("--ef-search", type=int, default=VECTOR_EF_SEARCH)
+
+    def handle(self, *args, **options):
+        try:
+            faiss_manager = get_faiss_manager()
+        except Exception as e:
+            raise CommandError(f"The FAISS index could not be loaded: {e}")
+        before = index_type_of(faiss_manager.db.index)
+
+        start = time.perf_counter()
+        try:
+            faiss_manager.convert(
+                options["type"],
+                nlist=options["nlist"],
+                pq_m=options["pq_m"],
+                hnsw_m=options["hnsw_m"],
+                train_sample=options["train_sample"],
+                nprobe=options["nprobe"],
+                ef_search=options["ef_search"],
+            )
+        except (RuntimeError, ValueError) as e:
+            # faiss reports bad parameters (e.g. too few training vectors) as RuntimeError.
+            raise CommandError(str(e))
+
+        self.stdout.write(
+            f"Converted {faiss_manager.db.index.ntotal} vectors from {before} to "
+            f"{options['type']} in {time.perf_counter() - start:.1f}s."
+        )
@@ -0,0 +1,73 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rag_app.services.form_export import (
+    EXPORT_CHUNK_SIZE,
+    EXPORT_FORMATS,
+    export_lines,
+    load_checkpoint,
+    save_checkpoint,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Exports completed CIFAVA forms, one row per form with the answers as "
+        "columns in the order of form.json, as CSV or JSON Lines. Forms are "
+        "streamed in chunks and written as they are read. With --checkpoint "
+        "the position is saved after every chunk, and the next run with the "
+        "same name appends only the forms completed since then. Forms "
+        "completed in the last EXPORT_SETTLE_SECONDS wait for the next run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+        parser.add_argument(
+            "--output", help="File to write (appended to when resuming); default stdout."
+        )
+        parser.add_argument(
+            "--checkpoint",
+            help="Name of the export checkpoint to resume from and advance.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        name = options["checkpoint"]
+        after = load_checkpoint(name) if name else None
+        if after is None and name:
+            self.stderr.write(f"No checkpoint '{name}' yet; exporting every completed form.")
+
+        exported = {"chunks": 0}
+
+        def on_chunk(cursor):
+            # The chunk is already written; make it durable before moving on.
+            output.flush()
+            exported["chunks"] += 1
+            if name:
+                save_checkpoint(name, cursor)
+
+        path = options["output"]
+        if path:
+            try:
+                output = open(path, "a" if after else "w", encoding="utf-8", newline="")
+            except OSError as e:
+                raise CommandError(f"Cannot open {path}: {e}")
+        else:
+            output = sys.stdout
+
+        try:
+            for text in export_lines(
+                options["format"],
+                after=after,
+                chunk_size=options["chunk_size"],
+                # A resumed CSV continues the previous file, without a header.
+                header=after is None or not path,
+                on_chunk=on_chunk,
+            ):
+                output.write(text)
+        finally:
+            if path:
+                output.close()
+
+        self.stderr.write(f"Exported {exported['chunks']} chunk(s).")
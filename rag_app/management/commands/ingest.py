@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from rag_app.services.ingestion import (
+    INGEST_CHUNK_OVERLAP,
+    INGEST_CHUNK_TOKENS,
+    INGEST_COMMIT_SIZE,
+    INGEST_WORKERS,
+    IngestPipeline,
+    TokenChunker,
+    iter_chunks,
+    load_checkpoint,
+)
+from rag_app.services.vector_service import VECTOR_EMBED_BATCH, get_faiss_manager
+
+
+class Command(BaseCommand):
+    help = (
+        "Loads .txt/.md files and JSON Lines files ({\"title\", \"content\"} per "
+        "line) into the Document table and the FAISS index. Files are read "
+        "lazily, split into overlapping token chunks, deduplicated by content "
+        "hash and embedded in parallel batches. With --checkpoint the position "
+        "is saved after every commit, and the next run with the same name "
+        "continues after it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="Files or directories to ingest.")
+        parser.add_argument(
+            "--checkpoint", help="Name of the ingestion checkpoint to resume from and advance."
+        )
+        parser.add_argument("--chunk-tokens", type=int, default=INGEST_CHUNK_TOKENS)
+        parser.add_argument("--chunk-overlap", type=int, default=INGEST_CHUNK_OVERLAP)
+        parser.add_argument(
+            "--batch-size", type=int, default=VECTOR_EMBED_BATCH, help="Texts per embedding call."
+        )
+        parser.add_argument(
+            "--workers", type=int, default=INGEST_WORKERS, help="Concurrent embedding calls."
+        )
+        parser.add_argument(
+            "--commit-size", type=int, default=INGEST_COMMIT_SIZE, help="Chunks per write."
+        )
+
+    def handle(self, *args, **options):
+        try:
+            faiss_manager = get_faiss_manager()
+        except Exception as e:
+            raise CommandError(f"The FAISS index could not be loaded: {e}")
+        try:
+            chunker = TokenChunker(options["chunk_tokens"], options["chunk_overlap"])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        name = options["checkpoint"]
+        resume = load_checkpoint(name) if name else None
+        if resume is not None:
+            self.stderr.write(f"Resuming after record {resume[1]} of {resume[0]}.")
+
+        def on_commit(stats, position):
+            self.stderr.write(
+                f"{stats.chunks} chunks read, {stats.duplicates} duplicates, "
+                f"{stats.written} written, {stats.chunks / stats.elapsed:.0f} chunks/s"
+                + (f" (at record {position[1]} of {position[0]})" if position else "")
+            )
+
+        pipeline = IngestPipeline(
+            faiss_manager,
+            faiss_manager.embeddings,
+            batch_size=options["batch_size"],
+            workers=options["workers"],
+            commit_size=options["commit_size"],
+            checkpoint=name,
+            on_commit=on_commit,
+        )
+        stats = pipeline.run(iter_chunks(options["paths"], chunker, resume))
+        self.stderr.write(
+            f"Done: {stats.written} chunks written, {stats.duplicates} duplicates "
+            f"skipped, in {stats.elapsed:.1f}s."
+        )
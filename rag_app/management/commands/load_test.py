@@ -0,0 +1,279 @@
+import json
+import resource
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum
+from django.db.models.functions import Length
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from rag_app.models import GraphCheckpoint, GraphCheckpointBlob, GraphCheckpointWrite
+from rag_app.services.answer_store import answer_store
+from rag_app.services.cifava_chat_service import build_config
+from rag_app.services.fake_llm import FakeChatModel, FakeEmbeddings, offline_models
+from rag_app.services.graph_registry import graph_registry
+from rag_app.services.questions import QUESTION_CATALOG
+
+ENDPOINTS = ("cifava", "chat", "character")
+
+
+def percentile(cut_points, p):
+    return cut_points[p - 1] if cut_points else 0.0
+
+
+def stored_state_bytes() -> int:
+    """Bytes of LangGraph state currently stored in the database."""
+    total = 0
+    for model, fields in (
+        (GraphCheckpoint, ("checkpoint", "metadata")),
+        (GraphCheckpointBlob, ("blob",)),
+        (GraphCheckpointWrite, ("blob",)),
+    ):
+        for field in fields:
+            total += model.objects.aggregate(size=Sum(Length(field)))["size"] or 0
+    return total
+
+
+def form_messages():
+    """Greeting plus one answer per form question (the first option if closed)."""
+    return ["hola"] + [
+        question.options[0] if question.options else f"respuesta {question.index}"
+        for question in QUESTION_CATALOG
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Offline load test of the chat endpoints. Every LLM and embeddings "
+        "client is replaced by a fake with tunable latency and output size, "
+        "and many concurrent sessions go through the full HTTP stack against "
+        "a throwaway test database (CIFAVA sessions fill the whole form). "
+        "Reports throughput, latency percentiles, LLM calls per completed "
+        "form and memory per session, and exits with an error when a "
+        "--max-*/--min-* threshold is not met, so it can gate performance "
+        "regressions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sessions", type=int, default=20)
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=None,
+            help="Concurrent sessions (threads); defaults to --sessions.",
+        )
+        parser.add_argument(
+            "--endpoints",
+            default=",".join(ENDPOINTS),
+            help=f"Comma-separated subset of: {', '.join(ENDPOINTS)}.",
+        )
+        parser.add_argument(
+            "--turns",
+            type=int,
+            default=5,
+            help="Messages per session for the chat and character endpoints.",
+        )
+        parser.add_argument(
+            "--latency", type=float, default=0.05, help="Fake LLM latency (seconds)."
+        )
+        parser.add_argument(
+            "--reply-words", type=int, default=30, help="Words per fake LLM reply."
+        )
+        parser.add_argument(
+            "--graph", default=getattr(settings, "CIFAVA_GRAPH", "cifava")
+        )
+        parser.add_argument("--json", action="store_true", help="Print a JSON report.")
+
+        # Regression gate
+        parser.add_argument("--max-p50-ms", type=float)
+        parser.add_argument("--max-p99-ms", type=float)
+        parser.add_argument("--min-rps", type=float, help="Minimum requests/s.")
+        parser.add_argument("--max-llm-calls-per-form", type=float)
+        parser.add_argument(
+            "--max-kb-per-session",
+            type=float,
+            help="Maximum stored conversation state per session (KB).",
+        )
+
+    def handle(self, *args, **options):
+        endpoints = [name.strip() for name in options["endpoints"].split(",") if name.strip()]
+        unknown = set(endpoints) - set(ENDPOINTS)
+        if unknown:
+            raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+
+        fake_llm = FakeChatModel(
+            latency=options["latency"], reply_words=options["reply_words"]
+        )
+        fake_embeddings = FakeEmbeddings(latency=options["latency"])
+
+        with tempfile.TemporaryDirectory() as directory:
+            setup_test_environment()
+            connection.settings_dict.setdefault("TEST", {})["NAME"] = str(
+                Path(directory) / "load_test.sqlite3"
+            )
+            old_name = connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, serialize=False
+            )
+            try:
+                with offline_models(fake_llm, fake_embeddings), override_settings(
+                    CIFAVA_GRAPH=options["graph"]
+                ):
+                    results = [
+                        self.run_endpoint(name, fake_llm, options) for name in endpoints
+                    ]
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                teardown_test_environment()
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            for result in results:
+                self.report(result)
+
+        failures = [
+            failure for result in results for failure in self.check_limits(result, options)
+        ]
+        if failures:
+            raise CommandError("Performance thresholds not met:\n" + "\n".join(failures))
+
+    def run_endpoint(self, name, fake_llm, options):
+        sessions = options["sessions"]
+        concurrency = options["concurrency"] or sessions
+        turns = options["turns"]
+        graph = options["graph"]
+
+        def session(number):
+            client = Client()
+            latencies, errors, completed = [], 0, False
+            try:
+                if name == "cifava":
+                    path, messages = "/iav/cifava/chat/", form_messages()
+                elif name == "chat":
+                    path = "/chat/"
+                    messages = [f"mensaje {turn}" for turn in range(turns)]
+                else:
+                    path = f"/character/load-test/{number}/"
+                    messages = [f"mensaje {turn}" for turn in range(turns)]
+
+                for message in messages:
+                    start = time.perf_counter()
+                    response = client.post(
+                        path, {"prompt": message}, content_type="application/json"
+                    )
+                    latencies.append(time.perf_counter() - start)
+                    errors += response.status_code != 200
+
+                if name == "cifava":
+                    thread_id = client.session["thread_id"]
+                    state = graph_registry.get(graph).get_state(
+                        build_config(thread_id, thread_id)
+                    )
+                    completed = state.values.get("next_question", 0) >= len(
+                        QUESTION_CATALOG
+                    )
+            finally:
+                connection.close()
+            return latencies, errors, completed
+
+        fake_llm.reset_calls()
+        bytes_before = stored_state_bytes()
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            outcomes = list(executor.map(session, range(sessions)))
+        elapsed = time.perf_counter() - start
+        # Pending answers must reach the test database before it is dropped.
+        answer_store.flush()
+
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        bytes_after = stored_state_bytes()
+
+        latencies = [latency for outcome in outcomes for latency in outcome[0]]
+        cut_points = (
+            statistics.quantiles(latencies, n=100, method="inclusive")
+            if len(latencies) > 1
+            else latencies * 99
+        )
+        completed = sum(outcome[2] for outcome in outcomes)
+
+        return {
+            "endpoint": name,
+            "sessions": sessions,
+            "concurrency": concurrency,
+            "requests": len(latencies),
+            "errors": sum(outcome[1] for outcome in outcomes),
+            "seconds": round(elapsed, 3),
+            "rps": round(len(latencies) / elapsed, 2),
+            "p50_ms": round(percentile(cut_points, 50) * 1e3, 2),
+            "p90_ms": round(percentile(cut_points, 90) * 1e3, 2),
+            "p99_ms": round(percentile(cut_points, 99) * 1e3, 2),
+            "max_ms": round(max(latencies, default=0) * 1e3, 2),
+            "llm_calls": fake_llm.calls,
+            "completed_forms": completed if name == "cifava" else None,
+            "llm_calls_per_form": (
+                round(fake_llm.calls / completed, 2)
+                if name == "cifava" and completed
+                else None
+            ),
+            # Conversation state persisted by the checkpointer, and peak RSS
+            # growth of this process (ru_maxrss is in KB on Linux).
+            "state_kb_per_session": round(
+                (bytes_after - bytes_before) / 1024 / sessions, 2
+            ),
+            "rss_kb_per_session": round((rss_after - rss_before) / sessions, 2),
+        }
+
+    def report(self, result):
+        line = (
+            f"{result['endpoint']}: {result['requests']} requests from "
+            f"{result['sessions']} sessions ({result['concurrency']} concurrent) "
+            f"in {result['seconds']:.2f} s, {result['rps']:.1f} req/s, "
+            f"p50 {result['p50_ms']:.1f} ms / p90 {result['p90_ms']:.1f} ms / "
+            f"p99 {result['p99_ms']:.1f} ms, {result['errors']} errors, "
+            f"{result['state_kb_per_session']:.1f} KB state + "
+            f"{result['rss_kb_per_session']:.1f} KB RSS per session"
+        )
+        if result["endpoint"] == "cifava":
+            line += (
+                f", {result['completed_forms']}/{result['sessions']} forms completed, "
+                f"{result['llm_calls_per_form']} LLM calls per form"
+            )
+        self.stdout.write(line)
+
+    def check_limits(self, result, options):
+        name = result["endpoint"]
+        limits = (
+            ("p50_ms", "max_p50_ms", max),
+            ("p99_ms", "max_p99_ms", max),
+            ("rps", "min_rps", min),
+            ("state_kb_per_session", "max_kb_per_session", max),
+        )
+        if name == "cifava":
+            limits += (("llm_calls_per_form", "max_llm_calls_per_form", max),)
+
+        failures = []
+        if result["errors"]:
+            failures.append(f"{name}: {result['errors']} failed requests")
+        if name == "cifava" and result["completed_forms"] < result["sessions"]:
+            failures.append(
+                f"{name}: only {result['completed_forms']}/{result['sessions']} "
+                "forms completed"
+            )
+        for metric, option, kind in limits:
+            limit = options[option]
+            value = result[metric]
+            if limit is None or value is None:
+                continue
+            if (kind is max and value > limit) or (kind is min and value < limit):
+                bound = "max" if kind is max else "min"
+                failures.append(f"{name}: {metric} {value} ({bound} {limit})")
+        return failures
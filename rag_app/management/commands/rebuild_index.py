@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from rag_app.models import Document
+from rag_app.services.faiss_indexes import INDEX_TYPES, VECTOR_INDEX_TYPE
+from rag_app.services.vector_service import VECTOR_EMBED_BATCH, get_faiss_manager
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the FAISS index from the Document table. Texts go through "
+        "the shared embeddings client, so with the embedding cache enabled "
+        "only documents never embedded before reach the provider."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=VECTOR_EMBED_BATCH, help="Texts per embedding call."
+        )
+        parser.add_argument(
+            "--type",
+            choices=INDEX_TYPES,
+            default=VECTOR_INDEX_TYPE,
+            help="Index type; IVF/HNSW knobs come from the VECTOR_* settings.",
+        )
+
+    def handle(self, *args, **options):
+        faiss_manager = get_faiss_manager()
+        embeddings = faiss_manager.embeddings
+        if hasattr(embeddings, "reset_stats"):
+            embeddings.reset_stats()
+
+        documents = (
+            (
+                document.content,
+                {"title": document.title, "document_id": document.pk},
+                document.content_hash or str(document.pk),
+            )
+            for document in Document.objects.order_by("id")
+            .only("id", "title", "content", "content_hash")
+            .iterator(chunk_size=2000)
+        )
+        start = time.perf_counter()
+        count = faiss_manager.rebuild(
+            documents, batch_size=options["batch_size"], index_type=options["type"]
+        )
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(f"Indexed {count} documents ({options['type']}) in {elapsed:.1f}s.")
+        if hasattr(embeddings, "stats"):
+            stats = embeddings.stats()
+            self.stdout.write(
+                f"Embedding cache: {stats['hits']} hits, {stats['misses']} misses "
+                f"(hit ratio {stats['hit_ratio']:.1%})."
+            )
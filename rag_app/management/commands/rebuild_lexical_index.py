@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from rag_app.services.lexical_index import INDEX_NAME, LexicalIndex
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the lexical (BM25) index from the Document table, e.g. after "
+        "bulk updates or deletes, which send no signals. Running processes "
+        "keep their copy until restarted."
+    )
+
+    def handle(self, *args, **options):
+        lexical_index = LexicalIndex()
+        start = time.perf_counter()
+        count = lexical_index.rebuild()
+        elapsed = time.perf_counter() - start
+        lexical_index.close()
+
+        size = (lexical_index.path / INDEX_NAME).stat().st_size
+        self.stdout.write(
+            f"Indexed {count} documents in {elapsed:.1f}s: {len(lexical_index.terms)} terms, "
+            f"{len(lexical_index.postings)} postings, {size / 1e6:.1f} MB on disk."
+        )
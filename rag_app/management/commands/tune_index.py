@@ -0,0 +1,63 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from rag_app.services.faiss_indexes import (
+    exact_neighbors,
+    index_type_of,
+    sample_vectors,
+    search_parameters,
+)
+from rag_app.services.vector_service import get_faiss_manager
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures recall@k and latency of the saved FAISS index for several "
+        "nprobe (IVF) or efSearch (HNSW) values. Queries are stored vectors "
+        "with a little noise; the exact answers come from a brute-force scan. "
+        "Pick the smallest value reaching the recall you need and set "
+        "VECTOR_NPROBE or VECTOR_EF_SEARCH."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--k", type=int, default=10)
+        parser.add_argument("--values", default="1,2,4,8,16,32,64,128,256")
+        parser.add_argument(
+            "--noise", type=float, default=0.05, help="Relative noise added to the queries."
+        )
+
+    def handle(self, *args, **options):
+        try:
+            db = get_faiss_manager().db
+        except Exception as e:
+            raise CommandError(f"The FAISS index could not be loaded: {e}")
+        index = db.index
+        index_type = index_type_of(index)
+        if index_type == "flat":
+            raise CommandError("The index is flat (exact); there is nothing to tune.")
+        knob = "nprobe" if index_type.startswith("ivf") else "ef_search"
+        k = options["k"]
+
+        queries = sample_vectors(index, options["queries"], seed=1)
+        rng = np.random.default_rng(2)
+        scale = options["noise"] * np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries + scale * rng.standard_normal(queries.shape) / np.sqrt(index.d)
+        queries = queries.astype("float32")
+        _, exact = exact_neighbors(index, queries, k)
+
+        self.stdout.write(f"{index_type}, {index.ntotal} vectors, {len(queries)} queries, k={k}")
+        for value in (int(value) for value in options["values"].split(",")):
+            params = search_parameters(index, **{knob: value})
+            start = time.perf_counter()
+            _, found = index.search(queries, k, params=params)
+            elapsed = time.perf_counter() - start
+            recall = np.mean(
+                [len(set(row) & set(truth)) / k for row, truth in zip(found, exact)]
+            )
+            self.stdout.write(
+                f"{knob}={value}: recall@{k} {recall:.3f}, "
+                f"{elapsed / len(queries) * 1000:.2f} ms/query"
+            )
@@ -0,0 +1,63 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.core.exceptions import MiddlewareNotUsed
+
+from .services.metrics import (
+    METRICS_ENABLED,
+    http_request_duration,
+    http_requests_in_flight,
+)
+
+
+class MetricsMiddleware:
+    """
+    Records the duration of every request by URL route and status code, and the
+    number of requests in flight. Works for both sync (WSGI) and async (ASGI)
+    request paths; for streaming responses it measures the time to the first
+    byte, not the whole stream.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        http_requests_in_flight.inc()
+        start = time.perf_counter()
+        response = None
+        try:
+            response = self.get_response(request)
+            return response
+        finally:
+            self.observe(request, response, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        http_requests_in_flight.inc()
+        start = time.perf_counter()
+        response = None
+        try:
+            response = await self.get_response(request)
+            return response
+        finally:
+            self.observe(request, response, time.perf_counter() - start)
+
+    def observe(self, request, response, elapsed):
+        http_requests_in_flight.dec()
+        match = getattr(request, "resolver_match", None)
+        http_request_duration.observe(
+            elapsed,
+            route=match.route if match else "unmatched",
+            method=request.method,
+            status=str(response.status_code) if response is not None else "500",
+        )
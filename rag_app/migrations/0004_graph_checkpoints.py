@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rag_app', '0003_chatsession_chatmessage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GraphCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('thread_id', models.CharField(max_length=255)),
+                ('checkpoint_ns', models.CharField(blank=True, default='', max_length=255)),
+                ('checkpoint_id', models.CharField(max_length=64)),
+                ('parent_checkpoint_id', models.CharField(blank=True, max_length=64, null=True)),
+                ('type', models.CharField(max_length=32)),
+                ('checkpoint', models.BinaryField()),
+                ('metadata', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('thread_id', 'checkpoint_ns', 'checkpoint_id'), name='unique_graph_checkpoint')],
+            },
+        ),
+        migrations.CreateModel(
+            name='GraphCheckpointBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('thread_id', models.CharField(max_length=255)),
+                ('checkpoint_ns', models.CharField(blank=True, default='', max_length=255)),
+                ('channel', models.CharField(max_length=255)),
+                ('version', models.CharField(max_length=64)),
+                ('type', models.CharField(max_length=32)),
+                ('blob', models.BinaryField(null=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('thread_id', 'checkpoint_ns', 'channel', 'version'), name='unique_graph_checkpoint_blob')],
+            },
+        ),
+        migrations.CreateModel(
+            name='GraphCheckpointWrite',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('thread_id', models.CharField(max_length=255)),
+                ('checkpoint_ns', models.CharField(blank=True, default='', max_length=255)),
+                ('checkpoint_id', models.CharField(max_length=64)),
+                ('task_id', models.CharField(max_length=64)),
+                ('task_path', models.CharField(blank=True, default='', max_length=255)),
+                ('idx', models.IntegerField()),
+                ('channel', models.CharField(max_length=255)),
+                ('type', models.CharField(max_length=32)),
+                ('blob', models.BinaryField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('thread_id', 'checkpoint_ns', 'checkpoint_id', 'task_id', 'idx'), name='unique_graph_checkpoint_write')],
+            },
+        ),
+    ]
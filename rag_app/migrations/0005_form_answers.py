@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-16 21:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rag_app', '0004_graph_checkpoints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FormAnswer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('form_id', models.CharField(max_length=255)),
+                ('question_key', models.CharField(max_length=32)),
+                ('question', models.TextField()),
+                ('answer', models.TextField()),
+                ('answered_at', models.DateTimeField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('form_id', 'question_key'), name='unique_form_answer')],
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:18
+
+from django.db import migrations
+
+import rag_app.fields
+
+BATCH_SIZE = 500
+
+
+def json_to_vector(apps, schema_editor):
+    Document = apps.get_model('rag_app', 'Document')
+    batch = []
+    for document in Document.objects.filter(embedding__isnull=False).only('id', 'embedding').iterator(chunk_size=BATCH_SIZE):
+        if not document.embedding:  # JSON null or []
+            continue
+        document.embedding_vector = rag_app.fields.pack_vector(document.embedding)
+        batch.append(document)
+        if len(batch) >= BATCH_SIZE:
+            Document.objects.bulk_update(batch, ['embedding_vector'])
+            batch = []
+    Document.objects.bulk_update(batch, ['embedding_vector'])
+
+
+def vector_to_json(apps, schema_editor):
+    Document = apps.get_model('rag_app', 'Document')
+    batch = []
+    for document in Document.objects.filter(embedding_vector__isnull=False).only('id', 'embedding_vector').iterator(chunk_size=BATCH_SIZE):
+        document.embedding = document.embedding_vector.tolist()
+        batch.append(document)
+        if len(batch) >= BATCH_SIZE:
+            Document.objects.bulk_update(batch, ['embedding'])
+            batch = []
+    Document.objects.bulk_update(batch, ['embedding'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rag_app', '0007_document_content_hash_ingestcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='embedding_vector',
+            field=rag_app.fields.VectorField(blank=True, null=True),
+        ),
+        migrations.RunPython(json_to_vector, vector_to_json),
+        migrations.RemoveField(
+            model_name='document',
+            name='embedding',
+        ),
+        migrations.RenameField(
+            model_name='document',
+            old_name='embedding_vector',
+            new_name='embedding',
+        ),
+    ]
@@ -0,0 +1,67 @@
+from django.db import migrations, models
+
+
+def forwards(apps, schema_editor):
+    FormSession = apps.get_model("rag_app", "FormSession")
+    FormCompletion = apps.get_model("rag_app", "FormCompletion")
+    ExportCheckpoint = apps.get_model("rag_app", "ExportCheckpoint")
+
+    # Forms already completed get their completion, in the old export order.
+    sessions = list(
+        FormSession.objects.filter(completed_at__isnull=False)
+        .order_by("completed_at", "id")
+        .values_list("id", "form_id", "completed_at")
+    )
+    FormCompletion.objects.bulk_create(
+        [FormCompletion(form_id=form_id, completed_at=completed_at) for _, form_id, completed_at in sessions],
+        batch_size=500,
+    )
+    completion_ids = list(FormCompletion.objects.order_by("id").values_list("id", flat=True))
+
+    # A checkpoint now points at the last completion it had exported.
+    for checkpoint in ExportCheckpoint.objects.all():
+        cursor = (checkpoint.completed_at, checkpoint.form_session_id)
+        exported = [
+            completion_id
+            for completion_id, (session_id, _, completed_at) in zip(completion_ids, sessions)
+            if (completed_at, session_id) <= cursor
+        ]
+        checkpoint.completion_id = exported[-1] if exported else 0
+        checkpoint.save(update_fields=["completion_id"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rag_app', '0008_document_embedding_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FormCompletion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('form_id', models.CharField(max_length=255)),
+                ('completed_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='exportcheckpoint',
+            name='completion_id',
+            field=models.BigIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.RunPython(forwards, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='exportcheckpoint',
+            name='completed_at',
+        ),
+        migrations.RemoveField(
+            model_name='exportcheckpoint',
+            name='form_session_id',
+        ),
+        migrations.RemoveIndex(
+            model_name='formsession',
+            name='form_session_completed',
+        ),
+    ]
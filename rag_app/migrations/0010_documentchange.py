@@ -0,0 +1,18 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rag_app', '0009_formcompletion_export_cursor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('document_id', models.BigIntegerField()),
+            ],
+        ),
+    ]
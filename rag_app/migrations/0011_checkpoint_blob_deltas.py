@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rag_app', '0010_documentchange'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='graphcheckpointblob',
+            name='base_version',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='graphcheckpointblob',
+            name='digest',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='graphcheckpointblob',
+            name='length',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:11
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rag_app', '0011_checkpoint_blob_deltas'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='FormSession',
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:11
+
+import django.db.models.functions.datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rag_app', '0012_delete_formsession'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='formcompletion',
+            name='recorded_at',
+            field=models.DateTimeField(db_default=django.db.models.functions.datetime.Now(), db_index=True),
+        ),
+    ]
@@ -1,13 +1,28 @@
 from django.db import models
+from django.db.models.functions import Now
+
+from .fields import VectorField
 
 # Create your models here.
 class Document(models.Model):
     title = models.CharField(max_length=255)
     content = models.TextField()
-    embedding = models.JSONField(null=True, blank=True)  # Hacer embedding opcional
+    embedding = VectorField(null=True, blank=True)  # float32 empaquetado, opcional
+    # sha256 of content; set by the ingest command, which skips known chunks.
+    content_hash = models.CharField(max_length=64, unique=True, null=True, blank=True)
 
     def __str__(self):
         return self.title
+
+
+class DocumentChange(models.Model):
+    """
+    One row per Document saved or deleted (by signal or by the ingest
+    pipeline). Every process applies these, in id order, to its lexical index.
+    """
+
+    document_id = models.BigIntegerField()
+
     
 class ChatSession(models.Model):
     session_id = models.CharField(max_length=255, unique=True)
@@ -17,4 +32,124 @@ class ChatMessage(models.Model):
     session = models.ForeignKey(ChatSession, on_delete=models.CASCADE, related_name="messages")
     role = models.CharField(max_length=10, choices=[("user", "User"), ("assistant", "Assistant")])
     content = models.TextField()
-    timestamp = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    timestamp = models.DateTimeField(auto_now_add=True)
+
+class GraphCheckpoint(models.Model):
+    """LangGraph checkpoint header. Channel values live in GraphCheckpointBlob."""
+
+    thread_id = models.CharField(max_length=255)
+    checkpoint_ns = models.CharField(max_length=255, default="", blank=True)
+    checkpoint_id = models.CharField(max_length=64)
+    parent_checkpoint_id = models.CharField(max_length=64, null=True, blank=True)
+    type = models.CharField(max_length=32)
+    checkpoint = models.BinaryField()
+    metadata = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["thread_id", "checkpoint_ns", "checkpoint_id"],
+                name="unique_graph_checkpoint",
+            )
+        ]
+
+
+class GraphCheckpointBlob(models.Model):
+    """
+    Serialized value of one channel at one version (only stored when it changes).
+
+    A list channel (e.g. ``messages``) that extends an earlier version only
+    stores the items appended since ``base_version``; its full value is the
+    base's value followed by them.
+    """
+
+    thread_id = models.CharField(max_length=255)
+    checkpoint_ns = models.CharField(max_length=255, default="", blank=True)
+    channel = models.CharField(max_length=255)
+    version = models.CharField(max_length=64)
+    type = models.CharField(max_length=32)
+    blob = models.BinaryField(null=True)
+    base_version = models.CharField(max_length=64, null=True, blank=True)
+    # List channels only: items in the full list and a chained sha256 of them.
+    length = models.IntegerField(null=True, blank=True)
+    digest = models.CharField(max_length=64, default="", blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["thread_id", "checkpoint_ns", "channel", "version"],
+                name="unique_graph_checkpoint_blob",
+            )
+        ]
+
+
+class GraphCheckpointWrite(models.Model):
+    """Pending write produced by a task before the next checkpoint is saved."""
+
+    thread_id = models.CharField(max_length=255)
+    checkpoint_ns = models.CharField(max_length=255, default="", blank=True)
+    checkpoint_id = models.CharField(max_length=64)
+    task_id = models.CharField(max_length=64)
+    task_path = models.CharField(max_length=255, default="", blank=True)
+    idx = models.IntegerField()
+    channel = models.CharField(max_length=255)
+    type = models.CharField(max_length=32)
+    blob = models.BinaryField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["thread_id", "checkpoint_ns", "checkpoint_id", "task_id", "idx"],
+                name="unique_graph_checkpoint_write",
+            )
+        ]
+
+
+class FormAnswer(models.Model):
+    """Answer to one CIFAVA form question within one form (session)."""
+
+    form_id = models.CharField(max_length=255)
+    question_key = models.CharField(max_length=32)
+    question = models.TextField()
+    answer = models.TextField()
+    answered_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["form_id", "question_key"], name="unique_form_answer"
+            )
+        ]
+
+
+class FormCompletion(models.Model):
+    """
+    One row each time a form is (re)completed, inserted in the same
+    transaction as its answers. Exports page through these by id, which the
+    database assigns when the row is written: a form flushed late by another
+    worker still lands after every cursor handed out before it. Ids become
+    visible in commit order only once ``recorded_at`` (set by the database)
+    is old enough, so exports leave out the most recent rows.
+    """
+
+    form_id = models.CharField(max_length=255)
+    completed_at = models.DateTimeField()
+    recorded_at = models.DateTimeField(db_default=Now(), db_index=True)
+
+
+class ExportCheckpoint(models.Model):
+    """Last FormCompletion id written by a named export."""
+
+    name = models.CharField(max_length=100, unique=True)
+    completion_id = models.BigIntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class IngestCheckpoint(models.Model):
+    """Last fully ingested record (source file, records read from it) of a named ingestion."""
+
+    name = models.CharField(max_length=100, unique=True)
+    source = models.TextField()
+    records = models.BigIntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
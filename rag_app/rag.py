@@ -1,21 +1,23 @@
-from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import Chroma
 from langchain_community.llms import OpenAI
 
-# Configura embeddings
-embeddings = OpenAIEmbeddings()
+from .services.embedding_cache import embeddings_provider
+from .services.providers import LazyProvider
 
 # Carga documentos
 docs = [
     {"title": "Ejemplo", "content": "Este es un documento de prueba."}
 ]
 
-# Guarda embeddings en Chroma
-db = Chroma.from_texts([doc["content"] for doc in docs], embeddings)
+# Guarda embeddings en Chroma (en el primer uso, no al importar)
+def build_db():
+    return Chroma.from_texts([doc["content"] for doc in docs], embeddings_provider.get())
+
+db_provider = LazyProvider("rag", build_db)
 
 # Función para buscar en RAG
 def search_rag(query):
-    results = db.similarity_search(query)
+    results = db_provider.get().similarity_search(query)
 
     # Extrae solo la información relevante
     formatted_results = []
@@ -27,3 +29,21 @@ def search_rag(query):
 
     return formatted_results
 
+
+# Varias consultas a la vez: un solo llamado de embeddings y una sola consulta
+# a la colección con todos los vectores
+def search_rag_many(queries, k=4):
+    if not queries:
+        return []
+    vectors = embeddings_provider.get().embed_documents(list(queries))
+    results = db_provider.get()._collection.query(
+        query_embeddings=vectors, n_results=k, include=["documents", "metadatas"]
+    )
+
+    return [
+        [
+            {"content": content, "metadata": metadata or {}}
+            for content, metadata in zip(documents, metadatas)
+        ]
+        for documents, metadatas in zip(results["documents"], results["metadatas"])
+    ]
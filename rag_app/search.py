@@ -1,17 +1,86 @@
-from elasticsearch_dsl import Document, Text, connections
+import hashlib
+from typing import Any, Dict, List, Sequence, Tuple
 
-# Asegúrate de usar la URL completa con esquema y puerto
-connections.create_connection(
-    hosts=['http://localhost:9200'],
-    verify_certs=False
-)
+from django.conf import settings
 
-class DocumentIndex(Document):
-    title = Text()
-    content = Text()
+from .models import Document
+from .services.lexical_index import get_lexical_index
+from .services.metrics import search_duration, timed
+from .services.vector_service import get_faiss_manager
 
-    class Index:
-        name = 'documents_index'
+# Búsqueda híbrida local: BM25 (rag_app.services.lexical_index) + FAISS,
+# combinados por reciprocal rank fusion. Sustituye al índice de Elasticsearch.
 
-    def save(self, **kwargs):
-        return super().save(**kwargs)
\ No newline at end of file
+# Constante de RRF: 60 es el valor habitual, resta peso a la posición exacta.
+HYBRID_RRF_K = getattr(settings, "HYBRID_RRF_K", 60)
+# Candidatos pedidos a cada búsqueda antes de fusionar.
+HYBRID_CANDIDATES = getattr(settings, "HYBRID_CANDIDATES", 50)
+
+
+def fusion_key(content: str, metadata: Dict[str, Any]) -> str:
+    """El mismo texto tiene la misma clave en ambos índices: su sha256."""
+    return metadata.get("content_hash") or hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def reciprocal_rank_fusion(
+    rankings: Dict[str, Sequence[str]], k: int = HYBRID_RRF_K
+) -> List[Tuple[str, float, Dict[str, int]]]:
+    """
+    ``(clave, puntuación, posiciones)`` ordenadas por la suma de
+    ``1 / (k + posición)`` en cada ranking; solo cuenta la primera aparición
+    de una clave en cada uno.
+    """
+    scores: Dict[str, float] = {}
+    ranks: Dict[str, Dict[str, int]] = {}
+    for name, keys in rankings.items():
+        for rank, key in enumerate(keys, start=1):
+            if name in ranks.setdefault(key, {}):
+                continue
+            ranks[key][name] = rank
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    order = sorted(scores, key=lambda key: -scores[key])
+    return [(key, scores[key], ranks[key]) for key in order]
+
+
+@timed(search_duration, operation="hybrid")
+def hybrid_search(
+    query: str,
+    k: int = 4,
+    candidates: int = HYBRID_CANDIDATES,
+    rrf_k: int = HYBRID_RRF_K,
+) -> List[Dict[str, Any]]:
+    """
+    Los ``k`` mejores documentos para ``query`` según BM25 y FAISS juntos:
+    cada uno devuelve ``candidates`` resultados y se fusionan por posición
+    (las puntuaciones de ambos no son comparables). Cada resultado lleva
+    ``content``, ``metadata``, ``score`` y ``ranks`` (posición en cada índice).
+    """
+    candidates = max(candidates, k)
+    results: Dict[str, Dict[str, Any]] = {}
+    rankings: Dict[str, List[str]] = {"lexical": [], "vector": []}
+
+    lexical = get_lexical_index().search(query, k=candidates)
+    documents = Document.objects.only("id", "title", "content", "content_hash").in_bulk(
+        [doc_id for doc_id, _ in lexical]
+    )
+    for doc_id, _ in lexical:
+        document = documents.get(doc_id)
+        if document is None:
+            continue  # Borrado después de indexarse
+        metadata = {"title": document.title, "document_id": document.pk}
+        if document.content_hash:
+            metadata["content_hash"] = document.content_hash
+        key = fusion_key(document.content, metadata)
+        results.setdefault(key, {"content": document.content, "metadata": metadata})
+        rankings["lexical"].append(key)
+
+    for result in get_faiss_manager().search(query, k=candidates):
+        key = fusion_key(result["content"], result["metadata"])
+        entry = results.setdefault(key, {"content": result["content"], "metadata": {}})
+        entry["metadata"] = {**result["metadata"], **entry["metadata"]}
+        rankings["vector"].append(key)
+
+    return [
+        {**results[key], "score": score, "ranks": ranks}
+        for key, score, ranks in reciprocal_rank_fusion(rankings, rrf_k)[:k]
+    ]
@@ -0,0 +1,180 @@
+import atexit
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Iterator, Optional, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from ..models import FormAnswer, FormCompletion
+
+logger = logging.getLogger(__name__)
+
+# Pending answers are written at most ANSWER_FLUSH_INTERVAL seconds after
+# being recorded, or as soon as ANSWER_FLUSH_BATCH of them are waiting.
+ANSWER_FLUSH_INTERVAL = getattr(settings, "ANSWER_FLUSH_INTERVAL", 1.0)
+ANSWER_FLUSH_BATCH = getattr(settings, "ANSWER_FLUSH_BATCH", 500)
+
+# (form_id, question_key)
+AnswerKey = Tuple[str, str]
+
+
+class AnswerStore:
+    """
+    Form answers keyed by (form id, question key), stored in the indexed
+    ``FormAnswer`` table.
+
+    ``store_answer`` only buffers the row; a background thread writes the
+    buffer with a single ``bulk_create`` (upserting on the unique key) every
+    ``flush_interval`` seconds, or right away once ``batch_size`` rows are
+    waiting. Lookups check the buffer first and then hit the unique index, so
+    their cost does not grow with the number of answers collected.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = ANSWER_FLUSH_INTERVAL,
+        batch_size: int = ANSWER_FLUSH_BATCH,
+    ) -> None:
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._pending: Dict[AnswerKey, FormAnswer] = {}
+        # form_id -> completed_at
+        self._completed: Dict[str, datetime] = {}
+        self._lock = threading.Lock()
+        # Serializes flushes (background thread vs. explicit flush()).
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def store_answer(
+        self, form_id: str, question_key: str, question: str, answer: str
+    ) -> None:
+        row = FormAnswer(
+            form_id=form_id,
+            question_key=question_key,
+            question=question,
+            answer=answer,
+            answered_at=timezone.now(),
+        )
+        with self._lock:
+            # A newer answer to the same question replaces the pending one.
+            self._pending[(form_id, question_key)] = row
+            full = len(self._pending) >= self.batch_size
+        self._ensure_flusher()
+        if full:
+            self._wake.set()
+
+    def mark_completed(self, form_id: str) -> None:
+        """
+        Record that the form has every question answered. Written in the same
+        flush as (and after) its pending answers, so an export never sees a
+        completed form with missing answers. The ``FormCompletion`` row the
+        export pages by gets its id when that flush writes it.
+        """
+        with self._lock:
+            self._completed[form_id] = timezone.now()
+        self._ensure_flusher()
+
+    def get_stored_answer(self, form_id: str, question_key: str) -> Optional[str]:
+        with self._lock:
+            row = self._pending.get((form_id, question_key))
+        if row is not None:
+            return row.answer
+        return (
+            FormAnswer.objects.filter(form_id=form_id, question_key=question_key)
+            .values_list("answer", flat=True)
+            .first()
+        )
+
+    def get_form_answers(self, form_id: str) -> Dict[str, str]:
+        answers = dict(
+            FormAnswer.objects.filter(form_id=form_id).values_list(
+                "question_key", "answer"
+            )
+        )
+        with self._lock:
+            answers.update(
+                {key: row.answer for (form, key), row in self._pending.items() if form == form_id}
+            )
+        return answers
+
+    def flush(self) -> None:
+        """Write every pending answer now."""
+        with self._flush_lock:
+            with self._lock:
+                rows = list(self._pending.values())
+                completions = list(self._completed.items())
+                self._pending = {}
+                self._completed = {}
+            if not rows and not completions:
+                return
+            try:
+                with transaction.atomic():
+                    FormAnswer.objects.bulk_create(
+                        rows,
+                        batch_size=self.batch_size,
+                        update_conflicts=True,
+                        unique_fields=["form_id", "question_key"],
+                        update_fields=["question", "answer", "answered_at"],
+                    )
+                    FormCompletion.objects.bulk_create(
+                        [
+                            FormCompletion(form_id=form_id, completed_at=completed_at)
+                            for form_id, completed_at in completions
+                        ],
+                        batch_size=self.batch_size,
+                    )
+            except Exception:
+                # Put them back (without overwriting newer entries) and retry
+                # on the next flush.
+                with self._lock:
+                    for row in rows:
+                        self._pending.setdefault((row.form_id, row.question_key), row)
+                    for form_id, completed_at in completions:
+                        self._completed.setdefault(form_id, completed_at)
+                raise
+
+    def _ensure_flusher(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="answer-store-flusher", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to write form answers; will retry")
+            finally:
+                # Do not keep a connection open between flushes.
+                connection.close()
+
+    def export_rows(self, form_id: Optional[str] = None) -> Iterator[FormAnswer]:
+        """Stored answers (optionally of one form) in a stable order, streamed."""
+        self.flush()
+        queryset = FormAnswer.objects.order_by("form_id", "answered_at", "id")
+        if form_id is not None:
+            queryset = queryset.filter(form_id=form_id)
+        return queryset.iterator(chunk_size=2000)
+
+
+answer_store = AnswerStore()
+
+
+@atexit.register
+def flush_at_exit() -> None:
+    # Do not lose the last buffered answers on a clean shutdown.
+    try:
+        answer_store.flush()
+    except Exception:
+        logger.exception("Failed to write form answers at exit")
@@ -1,20 +1,16 @@
 import datetime
 
-from typing_extensions import TypedDict
 from django.conf import settings
-from pathlib import Path
-import json
-from typing import Annotated, Optional, List
+from typing import Annotated
 
-from langgraph.checkpoint.memory import MemorySaver
 from langgraph.prebuilt import ToolNode
-from langgraph.graph import MessagesState, StateGraph, START, END
+from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 
 from langchain.schema import AIMessage, HumanMessage, SystemMessage
 from langchain_openai import ChatOpenAI
+from langchain_core.runnables import RunnableLambda
 from langchain_core.tools import tool
-from langchain_core.messages.utils import trim_messages
 from langchain_core.prompts import (
     ChatPromptTemplate,
     MessagesPlaceholder,
@@ -27,38 +23,18 @@ from .prompts_service import (
     PROP_INICIALIZAR_CONVERSACION,
     PROP_REALIZAR_PREGUNTA,
     PROP_RESPONDER_AL_USUARIO,
-    build_prompt,
     build_system_prompt,
 )
-from .questions import QUESTIONS
+from . import metrics
+from .checkpointer import checkpointer
+from .graph_registry import graph_registry
+from .prompt_registry import prompt_registry
+from .providers import LazyProvider
+from .history_service import SummaryState, abuild_history, build_history
 
-# Construct the path relative to the Django project
-PROMPTS_PATH = Path(settings.BASE_DIR) / "config" / "prompts.json"
 
-
-# Load prompts from the JSON file
-def load_prompts() -> dict:
-    with open(PROMPTS_PATH, "r", encoding="utf-8") as file:
-        return json.load(file)
-
-
-# Usage
-PROMPTS = load_prompts()
-
-
-class Question(TypedDict):
-    key: str
-    question: str
-    answer: Optional[str]  # Respuesta opcional, por defecto None
-
-
-class State(MessagesState):
+class State(SummaryState):
     messages: Annotated[list, add_messages]
-    questions: List[Question]  # Lista de preguntas con respuestas opcionales
-
-
-# Inicializar MemorySaver
-memory = MemorySaver()
 
 
 @tool
@@ -70,83 +46,98 @@ def search(query: str):
 tools = [search]
 
 tool_node = ToolNode(tools)
-llm = ChatOpenAI(model_name="gpt-3.5-turbo", temperature=0.7)
-
-
-prompt_template = ChatPromptTemplate.from_messages(
-    [
-        SystemMessagePromptTemplate.from_template(build_system_prompt()),
-        MessagesPlaceholder(variable_name="history"),
-        HumanMessagePromptTemplate.from_template("{input}"),
-    ]
+# Created on first use: importing this module (RagAppConfig.ready does, for
+# every management command) needs no OpenAI key.
+runnable_provider: LazyProvider[ChatOpenAI] = LazyProvider(
+    "chat_llm", lambda: ChatOpenAI(model_name="gpt-3.5-turbo", temperature=0.7)
 )
 
-runnable = llm
 
+AGENT_PROMPT = "chat.agent"
 
-def agent(state: State) -> State:
-
-    user_prompt = state["messages"][-1].content if state["messages"] else ""
 
-    prompt_template = ChatPromptTemplate.from_messages(
+def build_agent_prompt_template(prompts: dict) -> ChatPromptTemplate:
+    # The user message is passed as a value, never compiled as a template.
+    return ChatPromptTemplate.from_messages(
         [
             SystemMessagePromptTemplate.from_template(build_system_prompt()),
             MessagesPlaceholder(variable_name="history"),
-            HumanMessagePromptTemplate.from_template(user_prompt),
+            HumanMessagePromptTemplate.from_template("{input}"),
         ]
     )
 
-    response = runnable.invoke(
-        prompt_template.invoke(
-            {
-                "history": state["messages"][:-1],
-                "input": build_prompt(user_prompt),
-            }
-        )
+
+prompt_registry.register(AGENT_PROMPT, build_agent_prompt_template)
+
+
+def agent_prompt(state: State, history: list):
+    user_prompt = state["messages"][-1].content if state["messages"] else ""
+
+    return prompt_registry.get(AGENT_PROMPT).invoke(
+        {
+            "history": history,
+            "input": user_prompt,
+        }
     )
 
+
+def agent(state: State) -> State:
+
+    runnable = runnable_provider.get()
+    response = runnable.invoke(agent_prompt(state, build_history(state, runnable)))
+
     state["messages"].append(AIMessage(content=response.content))
 
     return state
 
 
-# Function to evaluate the first interaction
-def evaluate_interaction(state: State) -> str:
-    if (
-        "questions" not in state
-        or not state["questions"]
-        or len(state["messages"]) == 1
-    ):
-        return "agent"  # First interaction directs to introduction agent
-    return "analyze_questions"  # Otherwise, analyze the user's input
+async def aagent(state: State) -> State:
+    """Async version of agent."""
 
+    runnable = runnable_provider.get()
+    response = await runnable.ainvoke(
+        agent_prompt(state, await abuild_history(state, runnable))
+    )
 
-# Main function to handle the chat
-def handle_chat(user_prompt: str, form_id: str, thread_id: str):
+    state["messages"].append(AIMessage(content=response.content))
+
+    return state
+
+
+def build_chat_graph() -> StateGraph:
+    """Builds the (uncompiled) LangGraph workflow for the generic chat."""
 
     # Create the StateGraph and add nodes
     builder = StateGraph(state_schema=State)
 
     # Nodes
-    builder.add_node("agent", agent)
+    builder.add_node("agent", RunnableLambda(agent, afunc=aagent))
     # Define the flow
 
-    # Si no están inicializadas, agregar preguntas y luego ir a evaluate_interaction
     builder.add_edge(START, "agent")
 
-    builder.add_edge("analyze_questions", "agent")
-
     # The END
     builder.add_edge("agent", END)
 
-    # Compile and execute the LangGraph workflow
-    app = builder.compile(checkpointer=memory)
+    return builder
+
+
+CHAT_GRAPH = "chat"
+
+graph_registry.register(CHAT_GRAPH, build_chat_graph, checkpointer=checkpointer)
+
+
+# Main function to handle the chat
+def handle_chat(user_prompt: str, form_id: str, thread_id: str):
+
+    # The workflow is compiled once per process by the registry
+    app = graph_registry.get(CHAT_GRAPH)
     config = {
         "configurable": {
             "form_id": thread_id,
             "thread_id": thread_id,
         },
-        memory: {},
+        "callbacks": metrics.callbacks(),
     }
 
     final_state = app.invoke(
@@ -155,3 +146,22 @@ def handle_chat(user_prompt: str, form_id: str, thread_id: str):
 
     # Return the final AI response
     return final_state["messages"][-1].content
+
+
+async def ahandle_chat(user_prompt: str, form_id: str, thread_id: str):
+    """Async version of handle_chat (ainvoke on the compiled graph)."""
+
+    app = graph_registry.get(CHAT_GRAPH)
+    config = {
+        "configurable": {
+            "form_id": thread_id,
+            "thread_id": thread_id,
+        },
+        "callbacks": metrics.callbacks(),
+    }
+
+    final_state = await app.ainvoke(
+        {"messages": [{"role": "user", "content": user_prompt}]}, config
+    )
+
+    return final_state["messages"][-1].content
@@ -0,0 +1,486 @@
+import hashlib
+import logging
+import random
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import MemorySaver
+
+from .metrics import checkpoint_duration, timed
+from ..models import GraphCheckpoint, GraphCheckpointBlob, GraphCheckpointWrite
+
+logger = logging.getLogger(__name__)
+
+# Checkpoints kept per thread (and namespace). Once as many again have been
+# saved, the older ones, their pending writes and the blob versions only they
+# used are deleted in one go. 0 keeps every checkpoint.
+CHECKPOINTS_KEPT = getattr(settings, "LANGGRAPH_CHECKPOINTS_KEPT", 10)
+
+
+def db_sync_to_async(func):
+    """
+    ``sync_to_async`` for ORM calls that need no particular thread. They run
+    on the default executor's threads, each with its own database connection,
+    instead of queueing on the single thread that ``thread_sensitive=True``
+    shares with every other sync call of the process. Connections that are
+    broken or older than ``CONN_MAX_AGE`` are closed around each call, as
+    Django does around each request.
+    """
+
+    def call(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(call, thread_sensitive=False)
+
+
+class DjangoCheckpointSaver(BaseCheckpointSaver[str]):
+    """
+    LangGraph checkpointer stored in the Django database.
+
+    Any worker (or node) sharing the database can continue any thread, so no
+    sticky sessions are needed, and nothing is kept in process memory.
+
+    - Each checkpoint row only holds the checkpoint header; channel values are
+      stored as blobs keyed by ``(channel, version)`` and a blob is written
+      only for the channels that changed in that step (``new_versions``).
+    - A list channel that grew by appending (``messages``) only stores the
+      new items and the version they extend, so a conversation is stored in
+      space proportional to its length, not to the square of it.
+    - Only the last ``keep`` to ``2 * keep`` checkpoints of a thread are
+      retained; blob versions no retained checkpoint needs are deleted with
+      the older ones, in batches so most steps skip the cleanup.
+    - The writes of a task are stored when it reports them, all in one
+      ``bulk_create``, so a step interrupted by a crash or an exception
+      resumes without running its finished tasks again.
+    - State is loaded lazily per ``thread_id``: only the latest (or requested)
+      checkpoint and the blob versions it references are read.
+    """
+
+    def __init__(self, *, serde=None, keep: int = CHECKPOINTS_KEPT) -> None:
+        super().__init__(serde=serde)
+        self.keep = keep
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    @timed(checkpoint_duration, operation="get_tuple")
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+
+        query = GraphCheckpoint.objects.filter(
+            thread_id=thread_id, checkpoint_ns=checkpoint_ns
+        )
+        if checkpoint_id := get_checkpoint_id(config):
+            query = query.filter(checkpoint_id=checkpoint_id)
+
+        row = query.order_by("-checkpoint_id").first()
+        if row is None:
+            return None
+        return self._to_tuple(row)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        query = GraphCheckpoint.objects.all()
+        if config:
+            query = query.filter(thread_id=config["configurable"]["thread_id"])
+            checkpoint_ns = config["configurable"].get("checkpoint_ns")
+            if checkpoint_ns is not None:
+                query = query.filter(checkpoint_ns=checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                query = query.filter(checkpoint_id=checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            query = query.filter(checkpoint_id__lt=before_id)
+
+        for row in query.order_by("thread_id", "checkpoint_ns", "-checkpoint_id").iterator():
+            metadata = self.serde.loads_typed((row.type, bytes(row.metadata)))
+            if filter and not all(
+                metadata.get(key) == value for key, value in filter.items()
+            ):
+                continue
+            if limit is not None:
+                if limit <= 0:
+                    break
+                limit -= 1
+            yield self._to_tuple(row, metadata=metadata)
+
+    def _to_tuple(
+        self, row: GraphCheckpoint, metadata: Optional[CheckpointMetadata] = None
+    ) -> CheckpointTuple:
+        checkpoint: Checkpoint = self.serde.loads_typed(
+            (row.type, bytes(row.checkpoint))
+        )
+        if metadata is None:
+            metadata = self.serde.loads_typed((row.type, bytes(row.metadata)))
+
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": row.thread_id,
+                    "checkpoint_ns": row.checkpoint_ns,
+                    "checkpoint_id": row.checkpoint_id,
+                }
+            },
+            checkpoint={
+                **checkpoint,
+                "channel_values": self._load_blobs(
+                    row.thread_id, row.checkpoint_ns, checkpoint["channel_versions"]
+                ),
+            },
+            metadata=metadata,
+            pending_writes=self._load_writes(
+                row.thread_id, row.checkpoint_ns, row.checkpoint_id
+            ),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": row.thread_id,
+                        "checkpoint_ns": row.checkpoint_ns,
+                        "checkpoint_id": row.parent_checkpoint_id,
+                    }
+                }
+                if row.parent_checkpoint_id
+                else None
+            ),
+        )
+
+    def _load_blobs(
+        self, thread_id: str, checkpoint_ns: str, versions: ChannelVersions
+    ) -> Dict[str, Any]:
+        if not versions:
+            return {}
+
+        wanted = Q()
+        for channel, version in versions.items():
+            wanted |= Q(channel=channel, version=str(version))
+
+        channel_values: Dict[str, Any] = {}
+        blobs = GraphCheckpointBlob.objects.filter(
+            wanted, thread_id=thread_id, checkpoint_ns=checkpoint_ns
+        ).values_list("channel", "type", "blob", "base_version")
+        for channel, type_, blob, base_version in blobs:
+            if type_ == "empty":
+                continue
+            value = self.serde.loads_typed((type_, bytes(blob)))
+            if base_version is not None:
+                value = self._load_list(thread_id, checkpoint_ns, channel, base_version) + value
+            channel_values[channel] = value
+        return channel_values
+
+    def _load_list(
+        self, thread_id: str, checkpoint_ns: str, channel: str, version: str
+    ) -> List[Any]:
+        """Full value of a list channel stored as appends: its chain of blobs, joined."""
+        rows = GraphCheckpointBlob.objects.filter(
+            thread_id=thread_id, checkpoint_ns=checkpoint_ns, channel=channel
+        )
+        bases = dict(rows.filter(length__isnull=False).values_list("version", "base_version"))
+        chain = []
+        while version is not None:
+            if version not in bases:
+                raise ValueError(
+                    f"Checkpoint blob {channel}@{version} of thread {thread_id} is missing."
+                )
+            chain.append(version)
+            version = bases[version]
+
+        parts = {
+            version: self.serde.loads_typed((type_, bytes(blob)))
+            for version, type_, blob in rows.filter(version__in=chain).values_list(
+                "version", "type", "blob"
+            )
+        }
+        return [item for version in reversed(chain) for item in parts[version]]
+
+    def _load_writes(
+        self, thread_id: str, checkpoint_ns: str, checkpoint_id: str
+    ) -> List[Tuple[str, str, Any]]:
+        rows = GraphCheckpointWrite.objects.filter(
+            thread_id=thread_id,
+            checkpoint_ns=checkpoint_ns,
+            checkpoint_id=checkpoint_id,
+        ).order_by("task_id", "idx")
+        return [
+            (row.task_id, row.channel, self.serde.loads_typed((row.type, bytes(row.blob))))
+            for row in rows
+        ]
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    @timed(checkpoint_duration, operation="put")
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        c = checkpoint.copy()
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        values: Dict[str, Any] = c.pop("channel_values")  # type: ignore[misc]
+
+        # Only the channels updated in this step are written (the delta).
+        blobs = []
+        for channel, version in new_versions.items():
+            blob = GraphCheckpointBlob(
+                thread_id=thread_id,
+                checkpoint_ns=checkpoint_ns,
+                channel=channel,
+                version=str(version),
+            )
+            value = values.get(channel)
+            if channel not in values:
+                blob.type, blob.blob = "empty", b""
+            elif isinstance(value, list):
+                self._fill_list_blob(blob, value)
+            else:
+                blob.type, blob.blob = self.serde.dumps_typed(value)
+            blobs.append(blob)
+
+        type_, serialized_checkpoint = self.serde.dumps_typed(c)
+        _, serialized_metadata = self.serde.dumps_typed(
+            get_checkpoint_metadata(config, metadata)
+        )
+
+        with transaction.atomic():
+            GraphCheckpointBlob.objects.bulk_create(blobs, ignore_conflicts=True)
+            GraphCheckpoint.objects.update_or_create(
+                thread_id=thread_id,
+                checkpoint_ns=checkpoint_ns,
+                checkpoint_id=checkpoint["id"],
+                defaults={
+                    "parent_checkpoint_id": config["configurable"].get("checkpoint_id"),
+                    "type": type_,
+                    "checkpoint": serialized_checkpoint,
+                    "metadata": serialized_metadata,
+                },
+            )
+            if self.keep:
+                self._prune(thread_id, checkpoint_ns)
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def _fill_list_blob(self, blob: GraphCheckpointBlob, items: List[Any]) -> None:
+        """
+        Store ``items`` as the items appended to the latest stored version of
+        the channel when that version's list is a prefix of it (same chained
+        digest of its items), else whole.
+        """
+        digests = []
+        running = hashlib.sha256()
+        for item in items:
+            type_, data = self.serde.dumps_typed(item)
+            running.update(hashlib.sha256(type_.encode() + b"\0" + data).digest())
+            digests.append(running.copy().hexdigest())
+
+        previous = (
+            GraphCheckpointBlob.objects.filter(
+                thread_id=blob.thread_id,
+                checkpoint_ns=blob.checkpoint_ns,
+                channel=blob.channel,
+                length__gt=0,
+                length__lte=len(items),
+            )
+            .exclude(version=blob.version)
+            .order_by("-version")
+            .values_list("version", "length", "digest")
+            .first()
+        )
+        start = 0
+        if previous is not None and digests[previous[1] - 1] == previous[2]:
+            blob.base_version, start = previous[0], previous[1]
+
+        blob.type, blob.blob = self.serde.dumps_typed(items[start:])
+        blob.length = len(items)
+        blob.digest = digests[-1] if digests else ""
+
+    def _prune(self, thread_id: str, checkpoint_ns: str) -> None:
+        """Delete checkpoints past the newest ``keep`` and the blobs only they needed."""
+        checkpoints = GraphCheckpoint.objects.filter(
+            thread_id=thread_id, checkpoint_ns=checkpoint_ns
+        ).order_by("-checkpoint_id")
+        stale = list(checkpoints.values_list("checkpoint_id", flat=True)[self.keep :])
+        if len(stale) < self.keep:
+            return
+
+        GraphCheckpoint.objects.filter(
+            thread_id=thread_id, checkpoint_ns=checkpoint_ns, checkpoint_id__in=stale
+        ).delete()
+        GraphCheckpointWrite.objects.filter(
+            thread_id=thread_id, checkpoint_ns=checkpoint_ns, checkpoint_id__in=stale
+        ).delete()
+
+        needed = set()
+        for type_, header in checkpoints.values_list("type", "checkpoint"):
+            versions = self.serde.loads_typed((type_, bytes(header)))["channel_versions"]
+            needed.update((channel, str(version)) for channel, version in versions.items())
+
+        blobs = GraphCheckpointBlob.objects.filter(thread_id=thread_id, checkpoint_ns=checkpoint_ns)
+        rows = {
+            (channel, version): (pk, base_version)
+            for pk, channel, version, base_version in blobs.values_list(
+                "pk", "channel", "version", "base_version"
+            )
+        }
+        # Appended lists also need every version they extend.
+        pending = list(needed)
+        while pending:
+            channel, version = pending.pop()
+            base_version = rows.get((channel, version), (None, None))[1]
+            if base_version is not None and (channel, base_version) not in needed:
+                needed.add((channel, base_version))
+                pending.append((channel, base_version))
+
+        unused = [pk for key, (pk, _) in rows.items() if key not in needed]
+        if unused:
+            GraphCheckpointBlob.objects.filter(pk__in=unused).delete()
+
+    @timed(checkpoint_duration, operation="put_writes")
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+
+        rows: Dict[Tuple[str, int], GraphCheckpointWrite] = {}
+        for idx, (channel, value) in enumerate(writes):
+            idx = WRITES_IDX_MAP.get(channel, idx)
+            if idx >= 0 and (task_id, idx) in rows:
+                continue
+            type_, blob = self.serde.dumps_typed(value)
+            rows[(task_id, idx)] = GraphCheckpointWrite(
+                thread_id=thread_id,
+                checkpoint_ns=checkpoint_ns,
+                checkpoint_id=checkpoint_id,
+                task_id=task_id,
+                task_path=task_path,
+                idx=idx,
+                channel=channel,
+                type=type_,
+                blob=blob,
+            )
+
+        # Regular writes are idempotent; special ones (errors, interrupts) replace.
+        regular = [row for row in rows.values() if row.idx >= 0]
+        special = [row for row in rows.values() if row.idx < 0]
+        with transaction.atomic():
+            GraphCheckpointWrite.objects.bulk_create(regular, ignore_conflicts=True)
+            if special:
+                GraphCheckpointWrite.objects.bulk_create(
+                    special,
+                    update_conflicts=True,
+                    unique_fields=["thread_id", "checkpoint_ns", "checkpoint_id", "task_id", "idx"],
+                    update_fields=["task_path", "channel", "type", "blob"],
+                )
+
+    @timed(checkpoint_duration, operation="delete_thread")
+    def delete_thread(self, thread_id: str) -> None:
+        with transaction.atomic():
+            GraphCheckpoint.objects.filter(thread_id=thread_id).delete()
+            GraphCheckpointBlob.objects.filter(thread_id=thread_id).delete()
+            GraphCheckpointWrite.objects.filter(thread_id=thread_id).delete()
+
+    # ------------------------------------------------------------------
+    # Async API: the ORM calls run in worker threads (db_sync_to_async), so
+    # awaiting graphs (ainvoke / astream) never block the event loop on the
+    # database, and checkpoints of different requests are stored in parallel.
+    # ------------------------------------------------------------------
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await db_sync_to_async(self.get_tuple)(config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await db_sync_to_async(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )()
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await db_sync_to_async(self.put)(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await db_sync_to_async(self.put_writes)(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await db_sync_to_async(self.delete_thread)(thread_id)
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        next_v = current_v + 1
+        next_h = random.random()
+        return f"{next_v:032}.{next_h:016}"
+
+
+def get_checkpointer() -> BaseCheckpointSaver:
+    """Create the checkpointer selected by ``settings.LANGGRAPH_CHECKPOINTER``."""
+    backend = getattr(settings, "LANGGRAPH_CHECKPOINTER", "django")
+    if backend == "memory":
+        return MemorySaver()
+    if backend == "django":
+        return DjangoCheckpointSaver()
+    raise ValueError(f"Unknown LANGGRAPH_CHECKPOINTER backend: '{backend}'.")
+
+
+# Shared by every workflow in this process.
+checkpointer = get_checkpointer()
@@ -2,19 +2,18 @@ import datetime
 
 from typing_extensions import TypedDict
 from django.conf import settings
-from pathlib import Path
 import json
-from typing import Annotated, Optional, List
+from typing import Annotated, Dict, Optional, List
 
-from langgraph.checkpoint.memory import MemorySaver
 from langgraph.prebuilt import ToolNode
-from langgraph.graph import MessagesState, StateGraph, START, END
+from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 
 from langchain.schema import AIMessage, HumanMessage, SystemMessage
 from langchain_openai import ChatOpenAI
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 from langchain_core.tools import tool
-from langchain_core.messages.utils import trim_messages
+from pydantic import BaseModel, Field
 from langchain_core.prompts import (
     ChatPromptTemplate,
     MessagesPlaceholder,
@@ -30,72 +29,116 @@ from .prompts_service import (
     build_prompt,
     build_system_prompt,
 )
-from .questions import QUESTIONS
+from . import metrics
+from .answer_store import answer_store
+from .checkpointer import checkpointer
+from .graph_registry import graph_registry
+from .prompt_registry import prompt_registry
+from .providers import LazyProvider
+from .llm_cache import llm_cache
+from .history_service import SummaryState, abuild_history, build_history
+from .streaming_service import astream_graph_tokens, stream_graph_tokens
+from .option_matcher import match_option
+from .questions import QUESTION_CATALOG, CatalogQuestion
+
+class State(SummaryState):
+    messages: Annotated[list, add_messages]
+    # Respuestas de la sesión por índice de pregunta en QUESTION_CATALOG; el
+    # texto de las preguntas no se copia al estado (ni a cada checkpoint).
+    answers: Dict[int, str]
+    next_question: int  # Índice de la primera pregunta sin responder
 
-# Construct the path relative to the Django project
-PROMPTS_PATH = Path(settings.BASE_DIR) / "config" / "prompts.json"
 
+@tool
+def search(query: str):
+    """Check if the question anwer a question"""
+    return "Se respondio una pregunta?"
 
-# Load prompts from the JSON file
-def load_prompts() -> dict:
-    with open(PROMPTS_PATH, "r", encoding="utf-8") as file:
-        return json.load(file)
 
+tools = [search]
 
-# Usage
-PROMPTS = load_prompts()
+tool_node = ToolNode(tools)
+# Los modelos se crean en el primer uso: importar este módulo (lo hace
+# RagAppConfig.ready en cada comando de manage.py) no requiere la clave de OpenAI.
+runnable_provider: LazyProvider[ChatOpenAI] = LazyProvider(
+    "cifava_llm", lambda: ChatOpenAI(model_name="gpt-3.5-turbo", temperature=0.7)
+)
+# Clasificación determinista (temperatura 0): la misma pregunta, historial y
+# respuesta producen el mismo prompt, así que reintentos y envíos duplicados
+# se responden desde la caché sin llamar al modelo.
+classifier_provider: LazyProvider[ChatOpenAI] = LazyProvider(
+    "cifava_classifier",
+    lambda: ChatOpenAI(model_name="gpt-3.5-turbo", temperature=0, cache=llm_cache or False),
+)
 
 
-class Question(TypedDict):
-    key: str
-    question: str
-    answer: Optional[str]  # Respuesta opcional, por defecto None
+# Plantillas compiladas una sola vez por el registro y recompiladas solo
+# cuando cambia config/prompts.json.
+AGENT_PROMPT = "cifava.agent"
+ANALYZE_QUESTIONS_PROMPT = "cifava.analyze_questions"
+ANALYZE_AND_RESPOND_PROMPT = "cifava.analyze_and_respond"
 
 
-class State(MessagesState):
-    messages: Annotated[list, add_messages]
-    questions: List[Question]  # Lista de preguntas con respuestas opcionales
+def build_agent_prompt_template(prompts: dict) -> ChatPromptTemplate:
+    return ChatPromptTemplate.from_messages(
+        [
+            SystemMessagePromptTemplate.from_template(build_system_prompt()),
+            MessagesPlaceholder(variable_name="history"),
+            HumanMessagePromptTemplate.from_template("{input}"),
+        ]
+    )
 
 
-# Inicializar MemorySaver
-memory = MemorySaver()
+def build_analyze_questions_prompt_template(prompts: dict) -> ChatPromptTemplate:
+    return ChatPromptTemplate.from_messages(
+        [
+            SystemMessagePromptTemplate.from_template(
+                "Eres un asistente que revisa respuestas de usuarios a preguntas predefinidas."
+            ),
+            HumanMessagePromptTemplate.from_template(prompts["analyze_questions"]),
+        ]
+    )
 
 
-@tool
-def search(query: str):
-    """Check if the question anwer a question"""
-    return "Se respondio una pregunta?"
+def build_analyze_and_respond_prompt_template(prompts: dict) -> ChatPromptTemplate:
+    return ChatPromptTemplate.from_messages(
+        [
+            SystemMessagePromptTemplate.from_template(build_system_prompt()),
+            MessagesPlaceholder(variable_name="history"),
+            HumanMessagePromptTemplate.from_template(prompts["analyze_and_respond"]),
+        ]
+    )
 
 
-tools = [search]
+prompt_registry.register(AGENT_PROMPT, build_agent_prompt_template)
+prompt_registry.register(
+    ANALYZE_QUESTIONS_PROMPT, build_analyze_questions_prompt_template
+)
+prompt_registry.register(
+    ANALYZE_AND_RESPOND_PROMPT, build_analyze_and_respond_prompt_template
+)
 
-tool_node = ToolNode(tools)
-llm = ChatOpenAI(model_name="gpt-3.5-turbo", temperature=0.7)
 
+class AnsweredQuestion(BaseModel):
+    key: str = Field(description="Identificador de la pregunta respondida.")
+    answer: str = Field(description="Respuesta extraída del mensaje del usuario.")
 
-prompt_template = ChatPromptTemplate.from_messages(
-    [
-        SystemMessagePromptTemplate.from_template(build_system_prompt()),
-        MessagesPlaceholder(variable_name="history"),
-        HumanMessagePromptTemplate.from_template("{input}"),
-    ]
-)
 
-analyce_prompt_template = ChatPromptTemplate.from_messages(
-    [
-        SystemMessagePromptTemplate.from_template(
-            "Eres un asistente que revisa respuestas de usuarios a preguntas predefinidas."
-        ),
-        MessagesPlaceholder(variable_name="history"),
-        HumanMessagePromptTemplate.from_template(
-            'La pregunta a evaluar es: "{question}". '
-            "Revisa la conversación y responde con 'sí' si la pregunta ha sido respondida, "
-            "de lo contrario, responde 'no'."
-        ),
-    ]
-)
+class AnsweredQuestions(BaseModel):
+    """Salida estructurada de analyze_questions: respuestas detectadas."""
+
+    answered_questions: List[AnsweredQuestion] = Field(
+        default_factory=list,
+        description="Preguntas pendientes que el usuario respondió, con su respuesta.",
+    )
+
+
+class CIFAVATurn(AnsweredQuestions):
+    """Salida estructurada del modo combinado: respuestas detectadas y réplica."""
+
+    reply: str = Field(description="Siguiente mensaje para el usuario.")
+
 
-runnable = llm
 
 # Función para finalizar el flujo
 def always_end(state: State) -> str:
@@ -103,45 +146,100 @@ def always_end(state: State) -> str:
 
 
 def add_questions_node(state: State) -> State:
-    """Agrega preguntas si aún no están en el estado."""
+    """Inicializa el estado del formulario si aún no existe."""
+
+    # Solo inicializar si el estado no lo tiene aún
+    if "answers" not in state or state["answers"] is None:
+        state["answers"] = {}
+        state["next_question"] = 0
+
+    return state
+
 
-    # Solo agregar preguntas si el estado no las tiene aún
-    if "questions" not in state or not state["questions"]:
-        state["questions"] = QUESTIONS
+# Réplica fija una vez contestado todo el formulario: no hace falta el modelo.
+FORM_COMPLETED_REPLY = (
+    "¡Muchas gracias! Ya respondiste todas las preguntas del formulario. "
+    "Tus respuestas quedaron guardadas."
+)
 
+
+def close_form(state: State) -> State:
+    """Responde con el mensaje de cierre cuando no quedan preguntas."""
+    state["messages"].append(AIMessage(content=FORM_COMPLETED_REPLY))
     return state
 
 
-def get_next_unanswered_question(state: State) -> Question:
+def get_next_unanswered_question(state: State) -> Optional[CatalogQuestion]:
     """Obtiene la siguiente pregunta sin responder, o devuelve None si todas han sido contestadas."""
-    for question in state["questions"]:
-        if question["answer"] is None:
-            return question
-    return None  # No hay preguntas pendientes
+    index = state["next_question"]
+    if index >= len(QUESTION_CATALOG):
+        return None  # No hay preguntas pendientes
+    return QUESTION_CATALOG[index]
 
 
-def agent(state: State) -> State:
+def record_answer(state: State, question: CatalogQuestion, answer: str) -> None:
+    """Guarda la respuesta y avanza el puntero a la siguiente pregunta pendiente."""
+    # Se crea un mapa nuevo en lugar de mutar el que viene del checkpoint
+    answers = {**state["answers"], question.index: answer}
+    state["answers"] = answers
 
-    if "questions" not in state or not state["questions"]:
-        state = add_questions_node(state)
+    # Amortizado O(1): cada índice se salta como máximo una vez por sesión
+    index = state["next_question"]
+    while index < len(QUESTION_CATALOG) and index in answers:
+        index += 1
+    state["next_question"] = index
 
+
+def start_agent_turn(state: State) -> Optional[CatalogQuestion]:
+    """Inicializa el formulario si hace falta y devuelve la siguiente pendiente."""
+
+    state = add_questions_node(state)
+
+    return get_next_unanswered_question(state)
+
+
+def agent_prompt(state: State, history: list, next_question: CatalogQuestion):
     user_prompt = state["messages"][-1].content if state["messages"] else ""
 
-    next_question = get_next_unanswered_question(state)
+    return prompt_registry.get(AGENT_PROMPT).invoke(
+        {
+            "history": history,
+            "input": build_prompt(
+                user_prompt=user_prompt,
+                question=next_question.question,
+            ),
+        }
+    )
 
-    if next_question == None:
-        return state
 
+def agent(state: State) -> State:
+
+    next_question = start_agent_turn(state)
+
+    if next_question is None:
+        return close_form(state)
+
+    runnable = runnable_provider.get()
     response = runnable.invoke(
-        prompt_template.invoke(
-            {
-                "history": state["messages"][:-1],
-                "input": build_prompt(
-                    user_prompt=user_prompt,
-                    question=next_question["question"],
-                ),
-            }
-        )
+        agent_prompt(state, build_history(state, runnable), next_question)
+    )
+
+    state["messages"].append(AIMessage(content=response.content))
+
+    return state
+
+
+async def aagent(state: State) -> State:
+    """Versión asíncrona de agent."""
+
+    next_question = start_agent_turn(state)
+
+    if next_question is None:
+        return close_form(state)
+
+    runnable = runnable_provider.get()
+    response = await runnable.ainvoke(
+        agent_prompt(state, await abuild_history(state, runnable), next_question)
     )
 
     state["messages"].append(AIMessage(content=response.content))
@@ -149,61 +247,254 @@ def agent(state: State) -> State:
     return state
 
 
-def analyze_questions(state: State) -> State:
-    """Analiza si el usuario respondió la pregunta actual y actualiza el state."""
+def format_pending_questions(questions: List[CatalogQuestion]) -> str:
+    """Lista las preguntas pendientes como líneas "- CLAVE: pregunta"."""
+    return "\n".join(
+        f"- {question.key}: {question.question}" for question in questions
+    )
+
+
+def get_pending_questions(state: State) -> List[CatalogQuestion]:
+    answers = state["answers"]
+    return [
+        question
+        for question in QUESTION_CATALOG[state["next_question"] :]
+        if question.index not in answers
+    ]
+
+
+def analysis_prompt(state: State, pending: List[CatalogQuestion]):
+    # Última respuesta del usuario y último mensaje de la IA
+    user_message = state["messages"][-1].content if state["messages"] else ""
+    ai_last_message = next(
+        (
+            message.content
+            for message in reversed(state["messages"][:-1])
+            if isinstance(message, AIMessage)
+        ),
+        "",
+    )
+
+    return prompt_registry.get(ANALYZE_QUESTIONS_PROMPT).invoke(
+        {
+            "predefined_questions": format_pending_questions(pending),
+            "user_message": user_message,
+            "ai_last_message": ai_last_message,
+        }
+    )
+
 
-    # Obtener la última respuesta del usuario
+def record_answered_questions(
+    state: State, pending: List[CatalogQuestion], analysis: AnsweredQuestions
+) -> None:
+    """
+    Guarda de una pasada la respuesta extraída para cada pregunta pendiente
+    detectada. Se ignoran identificadores desconocidos o ya contestados; si
+    el modelo no extrajo texto, se guarda el mensaje completo del usuario.
+    """
     user_message = state["messages"][-1].content if state["messages"] else ""
+    answers = {item.key.strip(): item.answer for item in analysis.answered_questions}
+    for question in pending:
+        if question.key in answers:
+            record_answer(state, question, answers[question.key].strip() or user_message)
+
+
+def apply_analysis(
+    state: State, pending: List[CatalogQuestion], analysis: AnsweredQuestions
+) -> State:
+    record_answered_questions(state, pending, analysis)
+    return state
+
 
-    # Obtener la pregunta sin contestar más reciente
-    next_question = get_next_unanswered_question(state)
+def answer_closed_question(state: State) -> bool:
+    """
+    Vía rápida sin modelo: si la pregunta en curso tiene opciones cerradas y
+    el mensaje del usuario coincide sin ambigüedad con ellas, guarda la
+    opción y devuelve True.
+    """
+    index = state["next_question"]
+    if index >= len(QUESTION_CATALOG):
+        return False
 
-    if not next_question:
+    user_message = state["messages"][-1].content if state["messages"] else ""
+    answer = match_option(QUESTION_CATALOG[index], user_message)
+    if answer is None:
+        return False
+
+    record_answer(state, QUESTION_CATALOG[index], answer)
+    return True
+
+
+def save_answers(
+    config: Optional[RunnableConfig], previous: Dict[int, str], state: State
+) -> None:
+    """
+    Envía al answer_store las respuestas nuevas o cambiadas en este turno y
+    marca el formulario como completo cuando ya no quedan preguntas.
+    """
+    form_id = ((config or {}).get("configurable") or {}).get("form_id")
+    if not form_id:
+        return
+    changed = False
+    for index, answer in state["answers"].items():
+        if previous.get(index) != answer:
+            question = QUESTION_CATALOG[index]
+            answer_store.store_answer(form_id, question.key, question.question, answer)
+            changed = True
+
+    # El formulario se completa en el turno que responde la última pregunta
+    if changed and state["next_question"] >= len(QUESTION_CATALOG):
+        answer_store.mark_completed(form_id)
+
+
+def analyze_questions(state: State, config: Optional[RunnableConfig] = None) -> State:
+    """
+    Detecta en una sola llamada al modelo todas las preguntas que el usuario
+    respondió con su último mensaje y las marca en el state. Las respuestas
+    claras a preguntas de opción cerrada se reconocen sin llamar al modelo.
+    """
+
+    pending = get_pending_questions(state)
+    if not pending:
         return state  # No hay preguntas pendientes, no hacemos nada
 
-    # Construimos el prompt para el modelo de OpenAI
-    prompt = analyce_prompt_template.invoke(
+    previous = state["answers"]
+    if not answer_closed_question(state):
+        analysis = (
+            classifier_provider.get()
+            .with_structured_output(AnsweredQuestions)
+            .invoke(analysis_prompt(state, pending))
+        )
+        state = apply_analysis(state, pending, analysis)
+
+    save_answers(config, previous, state)
+    return state
+
+
+async def aanalyze_questions(
+    state: State, config: Optional[RunnableConfig] = None
+) -> State:
+    """Versión asíncrona de analyze_questions."""
+
+    pending = get_pending_questions(state)
+    if not pending:
+        return state
+
+    previous = state["answers"]
+    if not answer_closed_question(state):
+        analysis = await (
+            classifier_provider.get()
+            .with_structured_output(AnsweredQuestions)
+            .ainvoke(analysis_prompt(state, pending))
+        )
+        state = apply_analysis(state, pending, analysis)
+
+    save_answers(config, previous, state)
+    return state
+
+
+def fused_prompt(state: State, pending: List[CatalogQuestion], history: list):
+    user_prompt = state["messages"][-1].content if state["messages"] else ""
+
+    return prompt_registry.get(ANALYZE_AND_RESPOND_PROMPT).invoke(
         {
-            "question": next_question["question"],
-            "history": state["messages"],
-            "input": user_message,
+            "history": history,
+            "predefined_questions": format_pending_questions(pending),
+            "user_prompt": user_prompt,
         }
     )
 
-    analysis_response = runnable.invoke(prompt)
-    answered_correctly = analysis_response.content.lower().strip() == "sí"
 
-    # Si el modelo dice que la respuesta es válida, asignamos la respuesta al estado
-    if answered_correctly:
-        for question in state["questions"]:
-            if question["key"] == next_question["key"]:
-                question["answer"] = user_message  # Guardamos la respuesta
-                break
+def apply_fused_turn(
+    state: State, pending: List[CatalogQuestion], turn: CIFAVATurn
+) -> State:
+    # En el primer mensaje todavía no se ha hecho ninguna pregunta
+    if len(state["messages"]) > 1:
+        record_answered_questions(state, pending, turn)
+
+    state["messages"].append(AIMessage(content=turn.reply))
+
+    return state
+
+
+def analyze_and_respond(state: State, config: Optional[RunnableConfig] = None) -> State:
+    """
+    Modo combinado: en una sola llamada estructurada detecta las preguntas
+    respondidas (con su respuesta) y genera el siguiente mensaje.
+    """
+
+    state = add_questions_node(state)
+
+    pending = get_pending_questions(state)
+    if not pending:
+        return close_form(state)
+
+    previous = state["answers"]
+    # La pregunta en curso, si se resolvió localmente, ya no se le pasa al
+    # modelo; la llamada sigue siendo necesaria para generar la réplica.
+    if len(state["messages"]) > 1 and answer_closed_question(state):
+        pending = get_pending_questions(state)
+
+    runnable = runnable_provider.get()
+    turn = runnable.with_structured_output(CIFAVATurn).invoke(
+        fused_prompt(state, pending, build_history(state, runnable))
+    )
+
+    state = apply_fused_turn(state, pending, turn)
+    save_answers(config, previous, state)
+    return state
+
+
+async def aanalyze_and_respond(
+    state: State, config: Optional[RunnableConfig] = None
+) -> State:
+    """Versión asíncrona de analyze_and_respond."""
+
+    state = add_questions_node(state)
+
+    pending = get_pending_questions(state)
+    if not pending:
+        return close_form(state)
+
+    previous = state["answers"]
+    # La pregunta en curso, si se resolvió localmente, ya no se le pasa al
+    # modelo; la llamada sigue siendo necesaria para generar la réplica.
+    if len(state["messages"]) > 1 and answer_closed_question(state):
+        pending = get_pending_questions(state)
 
-    return state  # Devolvemos el estado actualizado
+    runnable = runnable_provider.get()
+    turn = await runnable.with_structured_output(CIFAVATurn).ainvoke(
+        fused_prompt(state, pending, await abuild_history(state, runnable))
+    )
+
+    state = apply_fused_turn(state, pending, turn)
+    save_answers(config, previous, state)
+    return state
 
 
 # Function to evaluate the first interaction
 def evaluate_interaction(state: State) -> str:
     if (
-        "questions" not in state
-        or not state["questions"]
+        "answers" not in state
         or len(state["messages"]) == 1
     ):
         return "agent"  # First interaction directs to introduction agent
     return "analyze_questions"  # Otherwise, analyze the user's input
 
 
-# Main function to handle the chat
-def handle_cifava_chat(user_prompt: str, form_id: str, thread_id: str):
+def build_cifava_graph() -> StateGraph:
+    """Construye el flujo de LangGraph del formulario CIFAVA (sin compilar)."""
 
     # Create the StateGraph and add nodes
     builder = StateGraph(state_schema=State)
 
     # Nodes
     builder.add_node("add_questions", add_questions_node)
-    builder.add_node("agent", agent)
-    builder.add_node("analyze_questions", analyze_questions)
+    # Each node has a sync and an async implementation (invoke / ainvoke)
+    builder.add_node("agent", RunnableLambda(agent, afunc=aagent))
+    builder.add_node(
+        "analyze_questions", RunnableLambda(analyze_questions, afunc=aanalyze_questions)
+    )
     builder.add_node("always_end", always_end)
     # Define the flow
 
@@ -217,19 +508,105 @@ def handle_cifava_chat(user_prompt: str, form_id: str, thread_id: str):
     # The END
     builder.add_edge("agent", END)
 
-    # Compile and execute the LangGraph workflow
-    app = builder.compile(checkpointer=memory)
-    config = {
+    return builder
+
+
+def build_cifava_fused_graph() -> StateGraph:
+    """
+    Variante del flujo CIFAVA con un único nodo: analiza y responde en la
+    misma llamada al modelo, en lugar de analyze_questions seguido de agent.
+    """
+
+    builder = StateGraph(state_schema=State)
+
+    builder.add_node(
+        "analyze_and_respond",
+        RunnableLambda(analyze_and_respond, afunc=aanalyze_and_respond),
+    )
+
+    builder.add_edge(START, "analyze_and_respond")
+    builder.add_edge("analyze_and_respond", END)
+
+    return builder
+
+
+CIFAVA_GRAPH = "cifava"
+CIFAVA_FUSED_GRAPH = "cifava_fused"
+
+graph_registry.register(CIFAVA_GRAPH, build_cifava_graph, checkpointer=checkpointer)
+graph_registry.register(
+    CIFAVA_FUSED_GRAPH, build_cifava_fused_graph, checkpointer=checkpointer
+)
+
+
+def build_config(form_id: str, thread_id: str) -> dict:
+    return {
         "configurable": {
-            "form_id": thread_id,
+            "form_id": form_id,
             "thread_id": thread_id,
         },
-        memory: {},
+        "callbacks": metrics.callbacks(),
     }
 
+
+# Main function to handle the chat
+def handle_cifava_chat(user_prompt: str, form_id: str, thread_id: str):
+
+    # The workflow is compiled once per process by the registry; the variant
+    # (two-node or fused) is chosen per deployment
+    app = graph_registry.get(getattr(settings, "CIFAVA_GRAPH", CIFAVA_GRAPH))
+    config = build_config(form_id, thread_id)
+
     final_state = app.invoke(
         {"messages": [{"role": "user", "content": user_prompt}]}, config
     )
 
     # Return the final AI response
     return final_state["messages"][-1].content
+
+
+# Nodes whose model output is the conversational reply. The fused node emits
+# structured JSON, so its reply is sent whole once the turn completes.
+STREAM_NODES = {"agent"}
+
+
+def stream_cifava_chat(user_prompt: str, form_id: str, thread_id: str):
+    """Same as handle_cifava_chat, but yields the reply token by token."""
+
+    app = graph_registry.get(getattr(settings, "CIFAVA_GRAPH", CIFAVA_GRAPH))
+    config = build_config(form_id, thread_id)
+
+    yield from stream_graph_tokens(
+        app,
+        {"messages": [{"role": "user", "content": user_prompt}]},
+        config,
+        STREAM_NODES,
+    )
+
+
+async def ahandle_cifava_chat(user_prompt: str, form_id: str, thread_id: str):
+    """Versión asíncrona de handle_cifava_chat (ainvoke sobre el grafo)."""
+
+    app = graph_registry.get(getattr(settings, "CIFAVA_GRAPH", CIFAVA_GRAPH))
+    config = build_config(form_id, thread_id)
+
+    final_state = await app.ainvoke(
+        {"messages": [{"role": "user", "content": user_prompt}]}, config
+    )
+
+    return final_state["messages"][-1].content
+
+
+async def astream_cifava_chat(user_prompt: str, form_id: str, thread_id: str):
+    """Versión asíncrona de stream_cifava_chat."""
+
+    app = graph_registry.get(getattr(settings, "CIFAVA_GRAPH", CIFAVA_GRAPH))
+    config = build_config(form_id, thread_id)
+
+    async for token in astream_graph_tokens(
+        app,
+        {"messages": [{"role": "user", "content": user_prompt}]},
+        config,
+        STREAM_NODES,
+    ):
+        yield token
@@ -0,0 +1,176 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from django.conf import settings
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+
+from .metrics import embedding_cache_lookups
+from .providers import LazyProvider
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_PATH = getattr(
+    settings, "EMBEDDING_CACHE_PATH", Path(settings.BASE_DIR) / "embedding_cache.sqlite3"
+)
+
+# SQLite limits the number of parameters of a statement.
+LOOKUP_BATCH = 500
+
+
+def model_key(embeddings: Embeddings) -> str:
+    """
+    Identifies the vectors ``embeddings`` produces: the model name and, when
+    set, the requested dimensions (otherwise the class and its ``size``).
+    """
+    model = getattr(embeddings, "model", None)
+    if model:
+        dimensions = getattr(embeddings, "dimensions", None)
+        return f"{model}:{dimensions}" if dimensions else str(model)
+    size = getattr(embeddings, "size", None)
+    name = type(embeddings).__name__
+    return f"{name}:{size}" if size else name
+
+
+def text_hash(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps any LangChain ``Embeddings`` with a content-addressed cache in a
+    local SQLite file.
+
+    Vectors are stored as little-endian float32 under (model, sha256(text)),
+    so the same text is embedded once per model, whichever store or process
+    asks for it. A call looks up all its texts at once and sends only the
+    misses, in a single call, to the wrapped provider. Queries share the
+    cache with documents: the OpenAI models embed both the same way.
+    """
+
+    def __init__(self, underlying: Embeddings, path: Path = EMBEDDING_CACHE_PATH) -> None:
+        self.underlying = underlying
+        self.path = str(path)
+        self.model = model_key(underlying)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0}
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread; the ingest command embeds on a pool.
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            with connection:
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS embedding_cache ("
+                    " model TEXT NOT NULL,"
+                    " hash BLOB NOT NULL,"
+                    " vector BLOB NOT NULL,"
+                    " PRIMARY KEY (model, hash)) WITHOUT ROWID"
+                )
+            self._local.connection = connection
+        return connection
+
+    def lookup(self, hashes: List[bytes]) -> Dict[bytes, List[float]]:
+        found: Dict[bytes, List[float]] = {}
+        try:
+            connection = self._connection()
+            for start in range(0, len(hashes), LOOKUP_BATCH):
+                batch = hashes[start : start + LOOKUP_BATCH]
+                rows = connection.execute(
+                    "SELECT hash, vector FROM embedding_cache WHERE model = ?"
+                    f" AND hash IN ({', '.join('?' * len(batch))})",
+                    (self.model, *batch),
+                )
+                for key, vector in rows:
+                    found[key] = np.frombuffer(vector, dtype="<f4").tolist()
+        except sqlite3.Error:
+            # The cache is an optimization; fall back to calling the provider.
+            logger.exception("Embedding cache lookup failed")
+        return found
+
+    def store(self, vectors: Dict[bytes, List[float]]) -> None:
+        try:
+            with self._connection() as connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO embedding_cache (model, hash, vector)"
+                    " VALUES (?, ?, ?)",
+                    [
+                        (self.model, key, np.asarray(vector, dtype="<f4").tobytes())
+                        for key, vector in vectors.items()
+                    ],
+                )
+        except sqlite3.Error:
+            logger.exception("Embedding cache update failed")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes = [text_hash(text) for text in texts]
+        vectors = self.lookup(list(set(hashes)))
+
+        missing: Dict[bytes, str] = {}
+        for key, text in zip(hashes, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        self._count(hits=len(texts) - len(missing), misses=len(missing))
+
+        if missing:
+            computed = dict(
+                zip(missing, self.underlying.embed_documents(list(missing.values())))
+            )
+            self.store(computed)
+            vectors.update(computed)
+        return [vectors[key] for key in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    def _count(self, hits: int, misses: int) -> None:
+        with self._lock:
+            self._counters["hits"] += hits
+            self._counters["misses"] += misses
+        if hits:
+            embedding_cache_lookups.inc(hits, result="hit")
+        if misses:
+            embedding_cache_lookups.inc(misses, result="miss")
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats: Dict[str, float] = dict(self._counters)
+        total = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / total if total else 0.0
+        return stats
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            for counter in self._counters:
+                self._counters[counter] = 0
+
+    def clear(self) -> None:
+        with self._connection() as connection:
+            connection.execute("DELETE FROM embedding_cache WHERE model = ?", (self.model,))
+
+
+def get_embeddings(underlying: Optional[Embeddings] = None) -> Embeddings:
+    """
+    ``underlying`` (by default ``OpenAIEmbeddings()``) behind the cache
+    selected by ``settings.EMBEDDING_CACHE``: "sqlite" or "none".
+    """
+    underlying = underlying or OpenAIEmbeddings()
+    backend = getattr(settings, "EMBEDDING_CACHE", "sqlite")
+    if backend == "sqlite":
+        return CachedEmbeddings(underlying)
+    if backend == "none":
+        return underlying
+    raise ValueError(f"Unknown EMBEDDING_CACHE backend: '{backend}'.")
+
+
+# Shared by every vector store in this process; created on first use.
+embeddings_provider: LazyProvider[Embeddings] = LazyProvider("embeddings", get_embeddings)
@@ -0,0 +1,164 @@
+import logging
+import math
+from typing import Iterator, Optional, Tuple
+
+import faiss
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+# Index built by rebuild_index and convert_index. VECTOR_IVF_NLIST=0 picks
+# 4 * sqrt(N) lists; VECTOR_PQ_M sub-quantizers must divide the dimension.
+VECTOR_INDEX_TYPE = getattr(settings, "VECTOR_INDEX_TYPE", "flat")
+VECTOR_IVF_NLIST = getattr(settings, "VECTOR_IVF_NLIST", 0)
+VECTOR_PQ_M = getattr(settings, "VECTOR_PQ_M", 64)
+VECTOR_HNSW_M = getattr(settings, "VECTOR_HNSW_M", 32)
+VECTOR_TRAIN_SAMPLE = getattr(settings, "VECTOR_TRAIN_SAMPLE", 100_000)
+# Default search knobs: IVF lists probed and HNSW candidate list size.
+VECTOR_NPROBE = getattr(settings, "VECTOR_NPROBE", 16)
+VECTOR_EF_SEARCH = getattr(settings, "VECTOR_EF_SEARCH", 64)
+
+# Vectors reconstructed from an index at a time.
+BLOCK_SIZE = 10_000
+
+
+def default_nlist(count: int) -> int:
+    return max(1, int(4 * math.sqrt(count)))
+
+
+def factory_string(
+    index_type: str,
+    count: int,
+    nlist: int = VECTOR_IVF_NLIST,
+    pq_m: int = VECTOR_PQ_M,
+    hnsw_m: int = VECTOR_HNSW_M,
+) -> str:
+    """``faiss.index_factory`` description of ``index_type`` for ``count`` vectors."""
+    # IVF training needs at least one vector per list.
+    nlist = min(nlist or default_nlist(count), max(count, 1))
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "ivf_flat":
+        return f"IVF{nlist},Flat"
+    if index_type == "ivf_pq":
+        return f"IVF{nlist},PQ{pq_m}"
+    if index_type == "hnsw":
+        return f"HNSW{hnsw_m},Flat"
+    raise ValueError(f"Unknown index type: '{index_type}'.")
+
+
+def index_type_of(index: faiss.Index) -> str:
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf_flat"
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    return "flat"
+
+
+def configure_search(
+    index: faiss.Index, nprobe: int = VECTOR_NPROBE, ef_search: int = VECTOR_EF_SEARCH
+) -> None:
+    """
+    Set the default knobs on the index. Done once, before the index is
+    published: searches in flight must not see it change.
+    """
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIVF):
+        index.nprobe = nprobe
+    elif isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = ef_search
+
+
+def search_parameters(
+    index: faiss.Index, nprobe: Optional[int] = None, ef_search: Optional[int] = None
+) -> Optional[faiss.SearchParameters]:
+    """Per-query overrides of the knobs; ``None`` keeps the index defaults."""
+    index = faiss.downcast_index(index)
+    if nprobe is not None and isinstance(index, faiss.IndexIVF):
+        params = faiss.SearchParametersIVF()
+        params.nprobe = nprobe
+        return params
+    if ef_search is not None and isinstance(index, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = ef_search
+        return params
+    return None
+
+
+def writable_copy(index: faiss.Index) -> faiss.Index:
+    """
+    A copy of ``index`` that owns its data. ``faiss.clone_index`` of an index
+    read with IO_FLAG_MMAP still views the mapped file, and adding to it aborts
+    the process, so the copy goes through a serialized buffer instead.
+    """
+    return faiss.deserialize_index(faiss.serialize_index(index))
+
+
+def iter_vectors(index: faiss.Index, block_size: int = BLOCK_SIZE) -> Iterator[np.ndarray]:
+    """The stored vectors, in id order, ``block_size`` at a time."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.make_direct_map()
+    for start in range(0, index.ntotal, block_size):
+        yield index.reconstruct_n(start, min(block_size, index.ntotal - start))
+
+
+def sample_vectors(index: faiss.Index, size: int, seed: int = 0) -> np.ndarray:
+    """Up to ``size`` stored vectors picked at random, for training."""
+    if index.ntotal <= size:
+        return np.concatenate(list(iter_vectors(index)))
+    ids = np.sort(np.random.default_rng(seed).choice(index.ntotal, size, replace=False))
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.make_direct_map()
+    return np.vstack([index.reconstruct(int(i)) for i in ids]).astype("float32")
+
+
+def build_index(
+    source: faiss.Index,
+    index_type: str = VECTOR_INDEX_TYPE,
+    nlist: int = VECTOR_IVF_NLIST,
+    pq_m: int = VECTOR_PQ_M,
+    hnsw_m: int = VECTOR_HNSW_M,
+    train_sample: int = VECTOR_TRAIN_SAMPLE,
+    nprobe: int = VECTOR_NPROBE,
+    ef_search: int = VECTOR_EF_SEARCH,
+) -> faiss.Index:
+    """
+    A new ``index_type`` index holding the vectors of ``source`` under the
+    same ids (positions), so the docstore mapping stays valid. IVF indexes
+    are trained on a random sample of ``train_sample`` vectors first.
+    """
+    description = factory_string(index_type, source.ntotal, nlist, pq_m, hnsw_m)
+    index = faiss.index_factory(source.d, description, source.metric_type)
+    if not index.is_trained:
+        sample = sample_vectors(source, train_sample)
+        logger.info("Training %s on %d vectors...", description, len(sample))
+        index.train(sample)
+    for block in iter_vectors(source):
+        index.add(block)
+    configure_search(index, nprobe, ef_search)
+    logger.info("Built %s with %d vectors.", description, index.ntotal)
+    return index
+
+
+def exact_neighbors(index: faiss.Index, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Brute-force (distances, ids) of ``queries`` over the stored vectors."""
+    inner_product = index.metric_type == faiss.METRIC_INNER_PRODUCT
+    heap = faiss.ResultHeap(len(queries), k, keep_max=inner_product)
+    offset = 0
+    for block in iter_vectors(index):
+        flat = faiss.IndexFlat(index.d, index.metric_type)
+        flat.add(block)
+        distances, ids = flat.search(queries, min(k, len(block)))
+        ids = np.where(ids >= 0, ids + offset, -1)
+        heap.add_result(distances, ids)
+        offset += len(block)
+    heap.finalize()
+    return heap.D, heap.I
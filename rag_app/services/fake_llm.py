@@ -0,0 +1,204 @@
+import asyncio
+import hashlib
+import json
+import re
+import sys
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+from pydantic import PrivateAttr
+
+# "- CLAVE: pregunta" lines produced by format_pending_questions
+PENDING_QUESTION_RE = re.compile(r"^- ([^:\s]+):", re.MULTILINE)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Offline stand-in for ``ChatOpenAI`` used by the benchmarks.
+
+    It sleeps ``latency`` seconds per call and answers the CIFAVA prompts as
+    if the user had answered the first pending question on every turn, so a
+    simulated session walks through the whole form without network access.
+    """
+
+    latency: float = 0.0
+    reply_words: int = 30
+    model_name: str = "fake-chat"
+
+    _calls: int = PrivateAttr(default=0)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    @property
+    def calls(self) -> int:
+        return self._calls
+
+    def reset_calls(self) -> None:
+        with self._lock:
+            self._calls = 0
+
+    def respond(self, messages: List[BaseMessage]) -> str:
+        prompt = messages[-1].content if messages else ""
+        pending = PENDING_QUESTION_RE.findall(prompt)
+        reply = " ".join(["palabra"] * self.reply_words)
+
+        answered = [{"key": key, "answer": "respuesta"} for key in pending[:1]]
+        if prompt.startswith("Dadas las preguntas predefinidas"):
+            return json.dumps({"answered_questions": answered})
+        if prompt.startswith("Preguntas pendientes del formulario"):
+            return json.dumps({"answered_questions": answered, "reply": reply})
+        return reply
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self._calls += 1
+        message = AIMessage(content=self.respond(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        # The whole latency is paid before the first token, like a real
+        # time-to-first-token; the rest of the reply follows immediately.
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self._calls += 1
+        for token in re.split(r"(\s)", self.respond(messages)):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        # Non-blocking latency: many concurrent calls wait in parallel.
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        with self._lock:
+            self._calls += 1
+        message = AIMessage(content=self.respond(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        with self._lock:
+            self._calls += 1
+        for token in re.split(r"(\s)", self.respond(messages)):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    def with_structured_output(self, schema, **kwargs: Any):
+        return self | RunnableLambda(
+            lambda message: schema.model_validate_json(message.content)
+        )
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Offline stand-in for ``OpenAIEmbeddings``: deterministic unit vectors
+    derived from a hash of the text, after ``latency`` seconds per call.
+    """
+
+    def __init__(self, size: int = 1536, latency: float = 0.0) -> None:
+        self.size = size
+        self.latency = latency
+        self.calls = 0
+
+    def embed_text(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.size)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency:
+            time.sleep(self.latency)
+        self.calls += 1
+        return [self.embed_text(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+# (module, provider) pairs holding a chat model used by the endpoints.
+CHAT_MODEL_PROVIDERS = [
+    ("rag_app.services.chat_service", "runnable_provider"),
+    ("rag_app.services.cifava_chat_service", "runnable_provider"),
+    ("rag_app.services.cifava_chat_service", "classifier_provider"),
+]
+
+
+@contextmanager
+def offline_models(chat_model: BaseChatModel, embeddings: Embeddings):
+    """
+    Swap every chat model and embeddings client of the app for ``chat_model``
+    and ``embeddings`` (e.g. the fakes above), restoring them on exit.
+
+    The legacy ``/chat/`` agent is rebuilt around ``chat_model`` with the
+    shared checkpointer.
+    """
+    from langgraph.prebuilt import create_react_agent
+
+    from rag_app import views
+
+    from .embedding_cache import embeddings_provider
+    from .vector_service import faiss_manager_provider
+
+    # Stores created from now on get the fake embeddings from the provider;
+    # an already loaded FAISS manager has its client swapped.
+    manager = faiss_manager_provider.get() if faiss_manager_provider.ready else None
+    original_embeddings = manager.embeddings if manager is not None else None
+
+    with ExitStack() as stack:
+        for module, name in CHAT_MODEL_PROVIDERS:
+            stack.enter_context(getattr(sys.modules[module], name).override(chat_model))
+        stack.enter_context(
+            views.graph_provider.override(
+                create_react_agent(chat_model, tools=[], checkpointer=views.checkpointer)
+            )
+        )
+        stack.enter_context(embeddings_provider.override(embeddings))
+        try:
+            if manager is not None:
+                manager.embeddings = embeddings
+            yield
+        finally:
+            if manager is not None:
+                manager.embeddings = original_embeddings
@@ -0,0 +1,173 @@
+import csv
+import json
+from collections import defaultdict
+from datetime import timedelta
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import Min
+from django.db.models.functions import Now
+
+from ..models import ExportCheckpoint, FormAnswer, FormCompletion
+from .answer_store import answer_store
+from .questions import QUESTION_CATALOG
+
+FORM_PATH = Path(__file__).resolve().parent / "form.json"
+
+EXPORT_FORMATS = ("csv", "jsonl")
+EXPORT_CHUNK_SIZE = 500
+# Completions written less than EXPORT_SETTLE_SECONDS ago, and every one after
+# the first of them, wait for a later export. Ids are assigned on insert but
+# become visible on commit, so until the transactions that were running have
+# committed, a row with a lower id than one already exported can still appear.
+EXPORT_SETTLE_SECONDS = getattr(settings, "EXPORT_SETTLE_SECONDS", 30)
+
+# FormCompletion id of the last exported form
+ExportCursor = int
+
+
+@lru_cache(maxsize=1)
+def form_codes() -> Tuple[str, ...]:
+    """Field ``code``s of form.json, in document order."""
+    with open(FORM_PATH, "r", encoding="utf-8") as file:
+        form = json.load(file)
+
+    codes: List[str] = []
+
+    def walk(node):
+        if isinstance(node, dict):
+            if "code" in node:
+                codes.append(node["code"])
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(form)
+    return tuple(codes)
+
+
+@lru_cache(maxsize=1)
+def export_columns() -> Tuple[str, ...]:
+    """
+    One column per answer: the codes of form.json in its order, followed by
+    the chat questions that form.json does not list yet, in catalog order.
+    """
+    codes = form_codes()
+    extra = tuple(q.key for q in QUESTION_CATALOG if q.key not in codes)
+    return ("cursor", "form_id", "completed_at") + codes + extra
+
+
+def load_checkpoint(name: str) -> Optional[ExportCursor]:
+    checkpoint = ExportCheckpoint.objects.filter(name=name).first()
+    if checkpoint is None:
+        return None
+    return checkpoint.completion_id
+
+
+def save_checkpoint(name: str, cursor: ExportCursor) -> None:
+    ExportCheckpoint.objects.update_or_create(
+        name=name,
+        defaults={"completion_id": cursor},
+    )
+
+
+def completed_form_chunks(
+    after: Optional[ExportCursor] = None, chunk_size: int = EXPORT_CHUNK_SIZE
+) -> Iterator[Tuple[List[Dict[str, str]], ExportCursor]]:
+    """
+    Yield ``(rows, cursor)`` per chunk of completed forms after ``after``,
+    in the order their completions were written (``FormCompletion`` ids; the
+    ``completed_at`` stamped by a worker can be older than rows already
+    exported), leaving out those not settled yet (``EXPORT_SETTLE_SECONDS``).
+    Each row carries its own ``cursor``. A form completed again is exported
+    again. Completions are
+    read with a server-side cursor and answers are fetched one chunk of forms
+    at a time, so memory use depends on ``chunk_size``, not on the number of
+    forms.
+    """
+    # Buffered answers of this process must be visible to the export.
+    answer_store.flush()
+
+    completions = FormCompletion.objects.all()
+    if after is not None:
+        completions = completions.filter(id__gt=after)
+    if EXPORT_SETTLE_SECONDS:
+        unsettled = FormCompletion.objects.filter(
+            recorded_at__gt=Now() - timedelta(seconds=EXPORT_SETTLE_SECONDS)
+        ).aggregate(first=Min("id"))["first"]
+        if unsettled is not None:
+            completions = completions.filter(id__lt=unsettled)
+    completions = completions.order_by("id").values_list("id", "form_id", "completed_at")
+
+    chunk = []
+    for completion in completions.iterator(chunk_size=chunk_size):
+        chunk.append(completion)
+        if len(chunk) >= chunk_size:
+            yield pivot(chunk), chunk[-1][0]
+            chunk = []
+    if chunk:
+        yield pivot(chunk), chunk[-1][0]
+
+
+def pivot(completions) -> List[Dict[str, str]]:
+    """One row per form, with its answers as columns."""
+    answers = defaultdict(dict)
+    for form_id, key, answer in FormAnswer.objects.filter(
+        form_id__in={form_id for _, form_id, _ in completions}
+    ).values_list("form_id", "question_key", "answer"):
+        answers[form_id][key] = answer
+
+    rows = []
+    for cursor, form_id, completed_at in completions:
+        row = {column: "" for column in export_columns()}
+        row.update(answers[form_id])
+        row["cursor"] = str(cursor)
+        row["form_id"] = form_id
+        row["completed_at"] = completed_at.isoformat()
+        rows.append(row)
+    return rows
+
+
+class Echo:
+    """File-like object whose write() returns the value, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def export_lines(
+    fmt: str = "csv",
+    after: Optional[ExportCursor] = None,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+    header: bool = True,
+    on_chunk: Optional[Callable[[ExportCursor], None]] = None,
+) -> Iterator[str]:
+    """
+    Completed forms as CSV or JSON Lines text, produced incrementally.
+
+    ``on_chunk`` is called with the cursor of each chunk once all its lines
+    have been consumed, e.g. to save a checkpoint the next export resumes
+    from. That is only safe where consuming a line means it was written
+    (a file), not where it was handed to a server that may still fail to
+    deliver it; there the reader resumes from the ``cursor`` of the last row
+    it received.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: '{fmt}'.")
+
+    columns = export_columns()
+    writer = csv.writer(Echo())
+    if fmt == "csv" and header:
+        yield writer.writerow(columns)
+
+    for rows, cursor in completed_form_chunks(after, chunk_size):
+        if fmt == "csv":
+            yield "".join(writer.writerow([row[c] for c in columns]) for row in rows)
+        else:
+            yield "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+        if on_chunk is not None:
+            on_chunk(cursor)
@@ -0,0 +1,71 @@
+import logging
+import threading
+from typing import Callable, Dict, List, Optional
+
+from langgraph.graph import StateGraph
+from langgraph.graph.state import CompiledStateGraph
+
+logger = logging.getLogger(__name__)
+
+
+class GraphRegistry:
+    """
+    Keeps one compiled LangGraph workflow per name.
+
+    Services register a builder function that returns an uncompiled
+    ``StateGraph``; the registry compiles (and therefore validates) it once,
+    either at startup through ``compile_all`` or on first use, and hands the
+    same compiled app to every request afterwards.
+    """
+
+    def __init__(self) -> None:
+        self._builders: Dict[str, Callable[[], StateGraph]] = {}
+        self._checkpointers: Dict[str, object] = {}
+        self._compiled: Dict[str, CompiledStateGraph] = {}
+        self._lock = threading.Lock()
+
+    def register(
+        self,
+        name: str,
+        builder: Callable[[], StateGraph],
+        checkpointer: Optional[object] = None,
+    ) -> None:
+        with self._lock:
+            self._builders[name] = builder
+            self._checkpointers[name] = checkpointer
+            # Drop a stale compiled app if the workflow is registered again.
+            self._compiled.pop(name, None)
+
+    def get(self, name: str) -> CompiledStateGraph:
+        app = self._compiled.get(name)
+        if app is not None:
+            return app
+
+        with self._lock:
+            app = self._compiled.get(name)
+            if app is None:
+                app = self.compile(name)
+                self._compiled[name] = app
+            return app
+
+    def compile_all(self) -> None:
+        """Build and validate every registered workflow."""
+        for name in list(self._builders):
+            self.get(name)
+
+    def names(self) -> List[str]:
+        return list(self._builders)
+
+    def build(self, name: str) -> StateGraph:
+        """Return a new, uncompiled ``StateGraph`` for ``name``."""
+        if name not in self._builders:
+            raise KeyError(f"No workflow registered under '{name}'.")
+        return self._builders[name]()
+
+    def compile(self, name: str) -> CompiledStateGraph:
+        """Build and compile a fresh, uncached app for ``name``."""
+        logger.info("Compiling LangGraph workflow '%s'", name)
+        return self.build(name).compile(checkpointer=self._checkpointers[name])
+
+
+graph_registry = GraphRegistry()
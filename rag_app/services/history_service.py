@@ -0,0 +1,149 @@
+import logging
+from functools import lru_cache
+from typing import List, Sequence, Tuple
+
+from django.conf import settings
+from langchain_core.messages import BaseMessage, SystemMessage
+from langchain_core.messages.utils import get_buffer_string, trim_messages
+from langchain_core.prompts import ChatPromptTemplate, HumanMessagePromptTemplate
+from langgraph.constants import TAG_NOSTREAM
+from langgraph.graph import MessagesState
+
+logger = logging.getLogger(__name__)
+
+# History (excluding the current user message) is folded into the summary once
+# it grows past HISTORY_MAX_TOKENS, keeping only the most recent
+# HISTORY_WINDOW_TOKENS worth of messages verbatim. The gap between both
+# values means a summary call happens every few turns, not on every turn.
+HISTORY_MAX_TOKENS = getattr(settings, "HISTORY_MAX_TOKENS", 1200)
+HISTORY_WINDOW_TOKENS = getattr(settings, "HISTORY_WINDOW_TOKENS", 600)
+HISTORY_MODEL = "gpt-3.5-turbo"
+
+# Per-message overhead of the chat format (role, separators).
+TOKENS_PER_MESSAGE = 4
+
+summary_prompt_template = ChatPromptTemplate.from_messages(
+    [
+        HumanMessagePromptTemplate.from_template(
+            "Resumen actual de la conversación:\n{summary}\n\n"
+            "Mensajes nuevos:\n{messages}\n\n"
+            "Actualiza el resumen incorporando los mensajes nuevos. Conserva los datos "
+            "que el usuario compartió sobre sí mismo y el tono de la conversación. "
+            "Responde solo con el resumen, en no más de 150 palabras."
+        ),
+    ]
+)
+
+
+class SummaryState(MessagesState):
+    summary: str  # Resumen acumulado de los mensajes ya plegados
+    summarized_count: int  # Cuántos mensajes iniciales cubre el resumen
+
+
+@lru_cache(maxsize=1)
+def get_encoding():
+    """Load the tiktoken encoding once; ``None`` if it cannot be loaded (offline)."""
+    try:
+        import tiktoken
+
+        return tiktoken.encoding_for_model(HISTORY_MODEL)
+    except Exception as e:
+        logger.warning(
+            "tiktoken encoding unavailable (%s), estimating tokens from text length", e
+        )
+        return None
+
+
+def count_tokens(messages: Sequence[BaseMessage]) -> int:
+    encoding = get_encoding()
+    total = 0
+    for message in messages:
+        content = message.content if isinstance(message.content, str) else str(message.content)
+        if encoding is not None:
+            total += len(encoding.encode(content))
+        else:
+            total += len(content) // 4 + 1
+        total += TOKENS_PER_MESSAGE
+    return total
+
+
+def split_history(state: SummaryState) -> Tuple[List[BaseMessage], List[BaseMessage]]:
+    """
+    Return ``(window, folded)``: the unsummarized history and, when it exceeds
+    ``HISTORY_MAX_TOKENS``, the oldest messages that must be folded into the
+    summary so that only ``HISTORY_WINDOW_TOKENS`` remain.
+    """
+    history = state["messages"][:-1]
+    window = history[state.get("summarized_count") or 0 :]
+
+    if count_tokens(window) <= HISTORY_MAX_TOKENS:
+        return window, []
+
+    kept = trim_messages(
+        window,
+        max_tokens=HISTORY_WINDOW_TOKENS,
+        token_counter=count_tokens,
+        strategy="last",
+        allow_partial=False,
+    )
+    return window, window[: len(window) - len(kept)]
+
+
+def summary_prompt(state: SummaryState, folded: List[BaseMessage]):
+    return summary_prompt_template.invoke(
+        {
+            "summary": state.get("summary") or "(vacío)",
+            "messages": get_buffer_string(folded),
+        }
+    )
+
+
+def fold_summary(
+    state: SummaryState,
+    summary: str,
+    window: List[BaseMessage],
+    folded: List[BaseMessage],
+) -> List[BaseMessage]:
+    """Store the new summary in the state and return the remaining window."""
+    state["summary"] = summary
+    state["summarized_count"] = (state.get("summarized_count") or 0) + len(folded)
+    return window[len(folded) :]
+
+
+def with_summary(state: SummaryState, window: List[BaseMessage]) -> List[BaseMessage]:
+    summary = state.get("summary")
+    if not summary:
+        return list(window)
+    return [
+        SystemMessage(content=f"Resumen de la conversación anterior:\n{summary}")
+    ] + list(window)
+
+
+def build_history(state: SummaryState, llm) -> List[BaseMessage]:
+    """
+    Return the history to send to the model for the current turn: the running
+    summary (as a system message) followed by the recent window of messages.
+
+    When the unsummarized history exceeds ``HISTORY_MAX_TOKENS`` the oldest
+    messages are folded into ``state["summary"]`` with one call to ``llm``, and
+    ``state["summarized_count"]`` is advanced so they are never sent again.
+    """
+    window, folded = split_history(state)
+    if folded:
+        # The summary is internal; keep it out of token streaming.
+        response = llm.invoke(
+            summary_prompt(state, folded), config={"tags": [TAG_NOSTREAM]}
+        )
+        window = fold_summary(state, response.content, window, folded)
+    return with_summary(state, window)
+
+
+async def abuild_history(state: SummaryState, llm) -> List[BaseMessage]:
+    """Async version of ``build_history``."""
+    window, folded = split_history(state)
+    if folded:
+        response = await llm.ainvoke(
+            summary_prompt(state, folded), config={"tags": [TAG_NOSTREAM]}
+        )
+        window = fold_summary(state, response.content, window, folded)
+    return with_summary(state, window)
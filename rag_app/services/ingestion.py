@@ -0,0 +1,346 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Deque, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from langchain_core.embeddings import Embeddings
+
+from ..models import Document, DocumentChange, IngestCheckpoint
+from .history_service import get_encoding
+from .lexical_index import LexicalIndex, get_lexical_index
+from .vector_service import VECTOR_EMBED_BATCH, FAISSManager
+
+logger = logging.getLogger(__name__)
+
+# Chunks are INGEST_CHUNK_TOKENS long and repeat the last INGEST_CHUNK_OVERLAP
+# tokens of the previous chunk of the same record.
+INGEST_CHUNK_TOKENS = getattr(settings, "INGEST_CHUNK_TOKENS", 500)
+INGEST_CHUNK_OVERLAP = getattr(settings, "INGEST_CHUNK_OVERLAP", 50)
+INGEST_WORKERS = getattr(settings, "INGEST_WORKERS", 4)
+INGEST_COMMIT_SIZE = getattr(settings, "INGEST_COMMIT_SIZE", 1000)
+
+TEXT_SUFFIXES = (".txt", ".md")
+JSONL_SUFFIXES = (".jsonl",)
+
+# Content hashes remembered in memory to skip repeats without a query.
+RECENT_HASHES = 100_000
+
+# (source file, records of it fully ingested)
+IngestPosition = Tuple[str, int]
+
+
+@dataclass
+class Chunk:
+    source: str
+    record: int  # 1-based position of the record in its source
+    last: bool  # Last chunk of its record
+    title: str
+    text: str
+    content_hash: str
+
+
+@dataclass
+class IngestStats:
+    chunks: int = 0
+    duplicates: int = 0
+    embedded: int = 0
+    written: int = 0
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def iter_files(paths: Iterable[str]) -> Iterator[Path]:
+    """Ingestible files under ``paths``, in a stable (sorted, depth-first) order."""
+    for path in map(Path, paths):
+        if path.is_dir():
+            names = sorted(entry.name for entry in os.scandir(path))
+            yield from iter_files(str(path / name) for name in names)
+        elif path.suffix in TEXT_SUFFIXES + JSONL_SUFFIXES:
+            yield path
+
+
+def iter_records(path: Path, skip: int = 0) -> Iterator[Tuple[int, str, Iterator[str]]]:
+    """
+    ``(record, title, pieces)`` per record of a file, after the first ``skip``:
+    one per line of a JSON Lines file (``{"title": ..., "content": ...}``), or
+    the whole file, read line by line, for a text file. ``pieces`` must be
+    consumed before the next record is read.
+    """
+    with path.open(encoding="utf-8") as file:
+        if path.suffix in JSONL_SUFFIXES:
+            for number, line in enumerate(file, 1):
+                if number <= skip or not line.strip():
+                    continue
+                item = json.loads(line)
+                title = item.get("title") or f"{path.name}:{number}"
+                yield number, title, iter([item.get("content", "")])
+        elif skip < 1:
+            yield 1, path.name, iter(file)
+
+
+class TokenChunker:
+    """
+    Splits a stream of text into chunks of ``size`` tokens overlapping by
+    ``overlap`` tokens, holding at most one chunk of tokens at a time.
+
+    Uses the tiktoken encoding of the models; offline it falls back to
+    whitespace-delimited words.
+    """
+
+    def __init__(self, size: int = INGEST_CHUNK_TOKENS, overlap: int = INGEST_CHUNK_OVERLAP) -> None:
+        if not 0 <= overlap < size:
+            raise ValueError("overlap must be smaller than the chunk size")
+        self.size = size
+        self.overlap = overlap
+        self.encoding = get_encoding()
+
+    def encode(self, text: str) -> list:
+        if self.encoding is not None:
+            return self.encoding.encode(text)
+        return re.findall(r"\S+\s*", text)
+
+    def decode(self, tokens: list) -> str:
+        if self.encoding is not None:
+            return self.encoding.decode(tokens)
+        return "".join(tokens)
+
+    def chunks(self, pieces: Iterable[str]) -> Iterator[str]:
+        buffer: list = []
+        fresh = 0  # Tokens of the buffer not yet part of an emitted chunk
+        for piece in pieces:
+            tokens = self.encode(piece)
+            buffer.extend(tokens)
+            fresh += len(tokens)
+            while len(buffer) >= self.size:
+                yield self.decode(buffer[: self.size])
+                buffer = buffer[self.size - self.overlap :]
+                fresh = len(buffer) - self.overlap
+        if fresh > 0:
+            yield self.decode(buffer)
+
+
+def iter_chunks(
+    paths: Sequence[str],
+    chunker: TokenChunker,
+    resume: Optional[IngestPosition] = None,
+) -> Iterator[Chunk]:
+    """Chunks of every record under ``paths``, after the ``resume`` position."""
+    if resume is not None and not Path(resume[0]).exists():
+        logger.warning("Checkpoint source %s is gone; reading everything again", resume[0])
+        resume = None
+
+    for path in iter_files(paths):
+        skip = 0
+        if resume is not None:
+            if str(path) != resume[0]:
+                continue
+            skip = resume[1]
+            resume = None
+
+        for record, title, pieces in iter_records(path, skip):
+            previous: Optional[str] = None
+            part = 0
+            for text in chunker.chunks(pieces):
+                if previous is not None:
+                    part += 1
+                    yield make_chunk(path, record, False, title, part, previous)
+                previous = text
+            if previous is not None:
+                yield make_chunk(path, record, True, title, part + 1, previous)
+
+
+def make_chunk(path: Path, record: int, last: bool, title: str, part: int, text: str) -> Chunk:
+    text = text.strip()
+    if part > 1:
+        title = f"{title} ({part})"
+    return Chunk(str(path), record, last, title[:255], text, content_hash(text))
+
+
+def load_checkpoint(name: str) -> Optional[IngestPosition]:
+    checkpoint = IngestCheckpoint.objects.filter(name=name).first()
+    if checkpoint is None:
+        return None
+    return checkpoint.source, checkpoint.records
+
+
+def save_checkpoint(name: str, position: IngestPosition) -> None:
+    IngestCheckpoint.objects.update_or_create(
+        name=name, defaults={"source": position[0], "records": position[1]}
+    )
+
+
+class IngestPipeline:
+    """
+    Writes chunks to the ``Document`` table, the FAISS index and the lexical
+    (BM25) index.
+
+    Chunks are read lazily and handled in batches of ``batch_size``: chunks
+    whose content hash was already seen (recently, or stored) are dropped,
+    and the rest are embedded on a pool of ``workers`` threads. At most
+    ``2 * workers`` batches are in flight, and results are written in input
+    order, ``commit_size`` chunks at a time: first to FAISS (under their
+    content hash as docstore id, so repeating a write is harmless), then to
+    the database together with the checkpoint and the ``DocumentChange`` rows
+    every lexical index applies (``bulk_create`` sends no signals).
+
+    The pipeline's own buffers depend on these sizes, not on the corpus. The
+    FAISS index still holds every vector in memory; chunk texts are left out
+    of it (searches read them from the ``Document`` table), and it is written
+    to disk once, at the end, rather than every ``VECTOR_FLUSH_EVERY``
+    documents: commits stay durable through its journal.
+    """
+
+    def __init__(
+        self,
+        manager: FAISSManager,
+        embeddings: Embeddings,
+        batch_size: int = VECTOR_EMBED_BATCH,
+        workers: int = INGEST_WORKERS,
+        commit_size: int = INGEST_COMMIT_SIZE,
+        checkpoint: Optional[str] = None,
+        on_commit: Optional[Callable[[IngestStats, Optional[IngestPosition]], None]] = None,
+        lexical_index: Optional[LexicalIndex] = None,
+    ) -> None:
+        self.manager = manager
+        self.lexical_index = lexical_index if lexical_index is not None else get_lexical_index()
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.workers = workers
+        self.commit_size = commit_size
+        self.checkpoint = checkpoint
+        self.on_commit = on_commit
+        self.stats = IngestStats()
+        self._recent: "OrderedDict[str, None]" = OrderedDict()
+
+    def run(self, chunks: Iterable[Chunk]) -> IngestStats:
+        in_flight: Deque[Tuple[List[Chunk], List[Chunk], Future]] = deque()
+        # Chunks read and (chunk, vector) pairs embedded since the last commit.
+        group: List[Chunk] = []
+        rows: List[Tuple[Chunk, List[float]]] = []
+
+        def drain_one() -> None:
+            batch, new, future = in_flight.popleft()
+            rows.extend(zip(new, future.result()))
+            group.extend(batch)
+            if len(group) >= self.commit_size:
+                self.commit(group, rows)
+                group.clear()
+                rows.clear()
+
+        with self.manager.flushes_deferred(), ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="ingest"
+        ) as executor:
+            for batch in self.batches(chunks):
+                new = self.unseen(batch)
+                if new:
+                    future = executor.submit(
+                        self.embeddings.embed_documents, [chunk.text for chunk in new]
+                    )
+                else:
+                    future = Future()
+                    future.set_result([])
+                in_flight.append((batch, new, future))
+                if len(in_flight) >= 2 * self.workers:
+                    drain_one()
+            while in_flight:
+                drain_one()
+            if group:
+                self.commit(group, rows)
+        return self.stats
+
+    def batches(self, chunks: Iterable[Chunk]) -> Iterator[List[Chunk]]:
+        batch: List[Chunk] = []
+        for chunk in chunks:
+            self.stats.chunks += 1
+            batch.append(chunk)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def unseen(self, batch: List[Chunk]) -> List[Chunk]:
+        """Chunks of ``batch`` whose content is neither recent nor stored."""
+        candidates = {}
+        for chunk in batch:
+            if chunk.text and chunk.content_hash not in self._recent:
+                candidates.setdefault(chunk.content_hash, chunk)
+        stored = set(
+            Document.objects.filter(content_hash__in=list(candidates)).values_list(
+                "content_hash", flat=True
+            )
+        )
+        new = [chunk for key, chunk in candidates.items() if key not in stored]
+
+        for chunk in batch:
+            self._recent[chunk.content_hash] = None
+            self._recent.move_to_end(chunk.content_hash)
+        while len(self._recent) > RECENT_HASHES:
+            self._recent.popitem(last=False)
+
+        self.stats.duplicates += len(batch) - len(new)
+        self.stats.embedded += len(new)
+        return new
+
+    def commit(self, group: List[Chunk], rows: List[Tuple[Chunk, List[float]]]) -> None:
+        position = next(
+            ((chunk.source, chunk.record) for chunk in reversed(group) if chunk.last), None
+        )
+        if rows:
+            self.manager.add_embeddings(
+                [""] * len(rows),  # Read from the Document table when found
+                [vector for _, vector in rows],
+                [
+                    {"title": chunk.title, "source": chunk.source, "content_hash": chunk.content_hash}
+                    for chunk, _ in rows
+                ],
+                ids=[chunk.content_hash for chunk, _ in rows],
+            )
+        with transaction.atomic():
+            Document.objects.bulk_create(
+                [
+                    Document(
+                        title=chunk.title,
+                        content=chunk.text,
+                        embedding=vector,
+                        content_hash=chunk.content_hash,
+                    )
+                    for chunk, vector in rows
+                ],
+                batch_size=500,
+                ignore_conflicts=True,
+            )
+            if rows:
+                # bulk_create sends no signals; log the rows for every lexical index.
+                DocumentChange.objects.bulk_create(
+                    [
+                        DocumentChange(document_id=document_id)
+                        for document_id in Document.objects.filter(
+                            content_hash__in=[chunk.content_hash for chunk, _ in rows]
+                        ).values_list("id", flat=True)
+                    ],
+                    batch_size=500,
+                )
+            if self.checkpoint and position is not None:
+                save_checkpoint(self.checkpoint, position)
+        if rows:
+            self.lexical_index.sync()
+        self.stats.written += len(rows)
+        if self.on_commit is not None:
+            self.on_commit(self.stats, position)
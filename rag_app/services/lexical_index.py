@@ -0,0 +1,539 @@
+import atexit
+import logging
+import math
+import os
+import re
+import threading
+import unicodedata
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+from django.db.models import Max
+
+from ..models import Document, DocumentChange
+from .metrics import search_duration, timed
+from .providers import LazyProvider
+
+logger = logging.getLogger(__name__)
+
+LEXICAL_INDEX_PATH = Path(
+    getattr(settings, "LEXICAL_INDEX_PATH", Path(settings.BASE_DIR) / "lexical_index")
+)
+# BM25 term frequency saturation and length normalization.
+LEXICAL_BM25_K1 = getattr(settings, "LEXICAL_BM25_K1", 1.2)
+LEXICAL_BM25_B = getattr(settings, "LEXICAL_BM25_B", 0.75)
+# Every LEXICAL_FLUSH_INTERVAL seconds the changes made by other processes are
+# applied and the index is written if it changed; also at exit.
+LEXICAL_FLUSH_INTERVAL = getattr(settings, "LEXICAL_FLUSH_INTERVAL", 5.0)
+
+INDEX_NAME = "bm25.npz"
+
+# Term frequencies are stored as uint16.
+MAX_TF = 65535
+
+TOKEN_RE = re.compile(r"\w+")
+
+# Words too common to help ranking; dropping them keeps the longest posting
+# lists out of the index and out of every query.
+STOPWORDS = frozenset(
+    "a al ante como con de del e el en es esta este la las le les lo los me mi no o "
+    "para pero por que se si sin su sus te un una y ya "
+    "an and are as at be by for from in is it of on or that the this to with".split()
+)
+
+# Rows read from the Document table at a time.
+CHUNK_SIZE = 2000
+# Ids per IN (...) lookup; SQLite limits the parameters of a statement.
+LOOKUP_BATCH = 500
+
+# DocumentChange ids below the last one applied that are read again, for rows
+# that committed after a higher id had been seen (concurrent transactions).
+SYNC_WINDOW = 1000
+
+DocumentRow = Tuple[int, str, str]  # (id, title, content)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase words without accents ("Económica" -> "economica"), minus stopwords."""
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return [token for token in TOKEN_RE.findall(text) if token not in STOPWORDS]
+
+
+def document_rows(queryset=None) -> Iterable[DocumentRow]:
+    queryset = Document.objects.all() if queryset is None else queryset
+    return (
+        queryset.order_by("id")
+        .values_list("id", "title", "content")
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index over the title and content of ``Document`` rows,
+    held in memory and saved to one file under ``path``.
+
+    Indexed documents have consecutive positions. The posting lists of all
+    terms are two flat arrays, positions (int32) and term frequencies
+    (uint16), with ``offsets`` delimiting each term's slice. Documents added
+    since the last merge go to small per-term ``array`` buffers instead, so
+    an addition costs only its own tokens; replaced and deleted documents are
+    tombstoned. ``flush`` merges buffers and tombstones into the flat arrays
+    with vectorized sorts and writes them gap-encoded and compressed, at the
+    latest ``flush_interval`` seconds after a change.
+
+    The ``Document`` table remains the source of truth and the file is only a
+    cache of it. Every write to the table is also logged in ``DocumentChange``
+    (by the model signals and the ingest pipeline); ``sync`` re-reads the
+    documents of the changes not applied yet, whichever process made them,
+    and the background thread runs it every ``flush_interval`` seconds. The
+    file records the last change it reflects, so a process never replaces it
+    with an older view, and a process loading it only applies the changes
+    after that. ``rebuild`` starts over from the table.
+    """
+
+    def __init__(
+        self,
+        path: Path = LEXICAL_INDEX_PATH,
+        k1: float = LEXICAL_BM25_K1,
+        b: float = LEXICAL_BM25_B,
+        flush_interval: float = LEXICAL_FLUSH_INTERVAL,
+    ) -> None:
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        # Set once the index follows DocumentChange (sync or rebuild).
+        self.tracking = False
+        self._reset()
+        self.loaded = (path / INDEX_NAME).exists()
+        if self.loaded:
+            self.load()
+
+    def _reset(self) -> None:
+        # Merged documents, sorted by id, and their posting lists.
+        self.terms: Dict[str, int] = {}
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.postings = np.zeros(0, dtype=np.int32)
+        self.freqs = np.zeros(0, dtype=np.uint16)
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.lengths = np.zeros(0, dtype=np.int32)
+        # Documents added since, and their postings by term.
+        self._new_ids = array("q")
+        self._new_lengths = array("i")
+        self._new_positions: Dict[int, int] = {}
+        self._buffer: Dict[str, Tuple[array, array]] = {}
+        self._dead: Set[int] = set()
+        # Live documents and their total length, for the BM25 average.
+        self.count = 0
+        self.total_length = 0
+        # Last DocumentChange applied, and those applied within SYNC_WINDOW of it.
+        self.last_change = 0
+        self._applied: Set[int] = set()
+        # Changes not yet written to disk.
+        self.pending = 0
+        self._version = 0
+        self._cached: Optional[Tuple[int, np.ndarray, np.ndarray, np.ndarray]] = None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def load(self) -> None:
+        with np.load(self.path / INDEX_NAME) as data:
+            blob = data["terms"].tobytes().decode("utf-8")
+            offsets = data["offsets"].astype(np.int64)
+            gaps = data["gaps"].astype(np.int64)
+            freqs = data["freqs"].astype(np.uint16)
+            ids = data["ids"].astype(np.int64)
+            lengths = data["lengths"].astype(np.int32)
+            last_change = int(data["last_change"])
+
+        # Each term's first posting is absolute, the rest are gaps.
+        sums = np.cumsum(gaps)
+        starts = offsets[:-1]
+        base = np.repeat(sums[starts] - gaps[starts], np.diff(offsets))
+        with self.lock:
+            self._reset()
+            self.terms = {term: n for n, term in enumerate(blob.split("\n"))} if blob else {}
+            self.offsets = offsets
+            self.postings = (sums - base).astype(np.int32)
+            self.freqs = freqs
+            self.ids = ids
+            self.lengths = lengths
+            self.count = len(ids)
+            self.total_length = int(lengths.sum())
+            self.last_change = last_change
+        logger.info("Loaded the lexical index: %d documents, %d terms", self.count, len(self.terms))
+
+    def saved_change(self) -> int:
+        """``last_change`` of the index file, -1 without a readable one."""
+        try:
+            with np.load(self.path / INDEX_NAME) as data:
+                return int(data["last_change"])
+        except (OSError, KeyError, ValueError):
+            return -1
+
+    def save(self, force: bool = False) -> None:
+        """
+        Merge pending changes and write the index file (aside, then moved into
+        place), unless the file already reflects the same or a later change.
+        """
+        with self._save_lock:
+            with self.lock:
+                self._merge()
+                terms, offsets, postings = list(self.terms), self.offsets, self.postings
+                freqs, ids, lengths = self.freqs, self.ids, self.lengths
+                last_change = self.last_change
+                pending, self.pending = self.pending, 0
+
+            if not force and self.tracking and self.saved_change() >= last_change:
+                return  # Written by another process that has seen as much.
+
+            try:
+                gaps = np.diff(postings, prepend=0).astype(np.int32)
+                gaps[offsets[:-1]] = postings[offsets[:-1]]
+                self.path.mkdir(parents=True, exist_ok=True)
+                target = self.path / INDEX_NAME
+                # Per process: several may save at the same time.
+                temporary = f"{target}.{os.getpid()}.tmp"
+                with open(temporary, "wb") as file:
+                    np.savez_compressed(
+                        file,
+                        terms=np.frombuffer("\n".join(terms).encode("utf-8"), dtype=np.uint8),
+                        offsets=offsets,
+                        gaps=gaps,
+                        freqs=freqs,
+                        ids=ids,
+                        lengths=lengths,
+                        last_change=np.int64(last_change),
+                    )
+                    file.flush()
+                    os.fsync(file.fileno())
+                os.replace(temporary, target)
+            except Exception:
+                with self.lock:
+                    self.pending += pending
+                raise
+
+    def flush(self) -> None:
+        if self.pending:
+            self.save()
+            logger.info("Saved the lexical index (%d documents).", self.count)
+
+    def add_documents(self, rows: Iterable[DocumentRow]) -> int:
+        """Index ``(id, title, content)`` rows, replacing those already indexed."""
+        added = 0
+        with self.lock:
+            for doc_id, title, content in rows:
+                self._remove(doc_id)
+                counts = Counter(tokenize(f"{title}\n{content}"))
+                length = sum(counts.values())
+                position = len(self.ids) + len(self._new_ids)
+                self._new_ids.append(doc_id)
+                self._new_lengths.append(length)
+                self._new_positions[doc_id] = position
+                for term, tf in counts.items():
+                    buffer = self._buffer.get(term)
+                    if buffer is None:
+                        buffer = self._buffer[term] = (array("i"), array("H"))
+                    buffer[0].append(position)
+                    buffer[1].append(min(tf, MAX_TF))
+                self.count += 1
+                self.total_length += length
+                added += 1
+            self._changed(added)
+        return added
+
+    def remove_documents(self, doc_ids: Iterable[int]) -> int:
+        with self.lock:
+            removed = sum(self._remove(doc_id) for doc_id in doc_ids)
+            self._changed(removed)
+        return removed
+
+    def sync(self) -> int:
+        """
+        Apply the ``DocumentChange`` rows not applied yet, made by any process:
+        their documents are read again and indexed, or removed if gone. The
+        last ``SYNC_WINDOW`` changes are looked at again, so one that committed
+        after a higher id was applied is not missed. Returns the number of
+        changes applied.
+        """
+        with self._sync_lock:
+            self.tracking = True
+            changes = [
+                (change_id, document_id)
+                for change_id, document_id in DocumentChange.objects.filter(
+                    id__gt=self.last_change - SYNC_WINDOW
+                )
+                .order_by("id")
+                .values_list("id", "document_id")
+                if change_id not in self._applied
+            ]
+            if not changes:
+                return 0
+
+            document_ids = sorted({document_id for _, document_id in changes})
+            rows: List[DocumentRow] = []
+            for start in range(0, len(document_ids), LOOKUP_BATCH):
+                rows.extend(
+                    Document.objects.filter(
+                        id__in=document_ids[start : start + LOOKUP_BATCH]
+                    ).values_list("id", "title", "content")
+                )
+            self.add_documents(rows)
+            self.remove_documents(set(document_ids) - {row[0] for row in rows})
+
+            with self.lock:
+                self.last_change = max(self.last_change, changes[-1][0])
+                self._applied.update(change_id for change_id, _ in changes)
+                self._applied = {
+                    change_id
+                    for change_id in self._applied
+                    if change_id > self.last_change - SYNC_WINDOW
+                }
+            return len(changes)
+
+    def rebuild(self) -> int:
+        """Index the whole Document table from scratch and save."""
+        with self._sync_lock:
+            # Changes made while the table is read are applied by the next sync.
+            last_change = DocumentChange.objects.aggregate(last=Max("id"))["last"] or 0
+            with self.lock:
+                self._reset()
+            count = self.add_documents(document_rows())
+            with self.lock:
+                self.last_change = last_change
+            self.tracking = True
+        self.save(force=True)
+        return count
+
+    @timed(search_duration, operation="lexical")
+    def search(self, query: str, k: int = 4) -> List[Tuple[int, float]]:
+        """The ``k`` best ``(document id, BM25 score)`` pairs for ``query``."""
+        terms = set(tokenize(query))
+        hits: List[np.ndarray] = []
+        weights: List[np.ndarray] = []
+        with self.lock:
+            if not terms or not self.count:
+                return []
+            ids, lengths, alive = self._columns()
+            average = self.total_length / self.count
+            for term in terms:
+                positions, freqs = self._postings(term)
+                live = alive[positions]
+                positions, freqs = positions[live], freqs[live].astype(np.float32)
+                if not len(positions):
+                    continue
+                df = len(positions)
+                idf = math.log(1 + (self.count - df + 0.5) / (df + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * lengths[positions] / average)
+                hits.append(positions)
+                weights.append(idf * freqs * (self.k1 + 1) / (freqs + norm))
+        if not hits:
+            return []
+
+        candidates, inverse = np.unique(np.concatenate(hits), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(weights))
+        if len(scores) > k:
+            top = np.argpartition(-scores, k)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(ids[candidates[i]]), float(scores[i])) for i in top]
+
+    def _postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Positions and frequencies of ``term``, merged and buffered (copied)."""
+        parts_positions, parts_freqs = [], []
+        number = self.terms.get(term)
+        if number is not None:
+            start, end = self.offsets[number], self.offsets[number + 1]
+            parts_positions.append(self.postings[start:end])
+            parts_freqs.append(self.freqs[start:end])
+        buffer = self._buffer.get(term)
+        if buffer is not None:
+            parts_positions.append(np.array(buffer[0], dtype=np.int32))
+            parts_freqs.append(np.array(buffer[1], dtype=np.uint16))
+        if not parts_positions:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.uint16)
+        return np.concatenate(parts_positions), np.concatenate(parts_freqs)
+
+    def _columns(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Ids, lengths and liveness by position; rebuilt only after a change."""
+        if self._cached is None or self._cached[0] != self._version:
+            ids = np.concatenate([self.ids, np.array(self._new_ids, dtype=np.int64)])
+            lengths = np.concatenate(
+                [self.lengths, np.array(self._new_lengths, dtype=np.int32)]
+            )
+            alive = np.ones(len(ids), dtype=bool)
+            alive[list(self._dead)] = False
+            self._cached = (self._version, ids, lengths, alive)
+        return self._cached[1], self._cached[2], self._cached[3]
+
+    def _position(self, doc_id: int) -> Optional[int]:
+        position = self._new_positions.get(doc_id)
+        if position is None:
+            found = int(np.searchsorted(self.ids, doc_id))
+            if found < len(self.ids) and self.ids[found] == doc_id:
+                position = found
+        if position is None or position in self._dead:
+            return None
+        return position
+
+    def _remove(self, doc_id: int) -> bool:
+        position = self._position(doc_id)
+        if position is None:
+            return False
+        self._dead.add(position)
+        self._new_positions.pop(doc_id, None)
+        if position < len(self.lengths):
+            self.total_length -= int(self.lengths[position])
+        else:
+            self.total_length -= self._new_lengths[position - len(self.lengths)]
+        self.count -= 1
+        return True
+
+    def _changed(self, count: int) -> None:
+        if not count:
+            return
+        self.pending += count
+        self._version += 1
+        self._ensure_flusher()
+
+    def _merge(self) -> None:
+        """Fold the buffers and tombstones into the flat arrays, documents by id."""
+        if not self._buffer and not self._dead and not len(self._new_ids):
+            return
+        ids, lengths, alive = self._columns()
+        vocabulary = list(self.terms)
+        numbers = dict(self.terms)
+        for term in self._buffer:
+            if term not in numbers:
+                numbers[term] = len(vocabulary)
+                vocabulary.append(term)
+
+        term_parts = [np.repeat(np.arange(len(self.terms), dtype=np.int32), np.diff(self.offsets))]
+        position_parts = [self.postings]
+        freq_parts = [self.freqs]
+        for term, (positions, freqs) in self._buffer.items():
+            term_parts.append(np.full(len(positions), numbers[term], dtype=np.int32))
+            position_parts.append(np.array(positions, dtype=np.int32))
+            freq_parts.append(np.array(freqs, dtype=np.uint16))
+        terms = np.concatenate(term_parts)
+        positions = np.concatenate(position_parts)
+        freqs = np.concatenate(freq_parts)
+
+        # Live documents get new positions in id order.
+        live = np.flatnonzero(alive)
+        order = live[np.argsort(ids[live], kind="stable")]
+        remap = np.full(len(ids), -1, dtype=np.int32)
+        remap[order] = np.arange(len(order), dtype=np.int32)
+
+        keep = alive[positions]
+        terms, positions, freqs = terms[keep], remap[positions[keep]], freqs[keep]
+        sort = np.lexsort((positions, terms))
+        terms, positions, freqs = terms[sort], positions[sort], freqs[sort]
+
+        # Terms left without postings are dropped; the order of the rest holds.
+        counts = np.bincount(terms, minlength=len(vocabulary))
+        used = np.flatnonzero(counts)
+        self.terms = {vocabulary[number]: n for n, number in enumerate(used)}
+        self.offsets = np.concatenate([[0], np.cumsum(counts[used])]).astype(np.int64)
+        self.postings = positions.astype(np.int32)
+        self.freqs = freqs.astype(np.uint16)
+        self.ids = ids[order]
+        self.lengths = lengths[order]
+        self._new_ids = array("q")
+        self._new_lengths = array("i")
+        self._new_positions = {}
+        self._buffer = {}
+        self._dead = set()
+        self._version += 1
+
+    def close(self) -> None:
+        """Flush and stop the background thread."""
+        self._closed = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def _ensure_flusher(self) -> None:
+        if self._thread is not None or self._closed:
+            return
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="lexical-flusher", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                if self.tracking:
+                    self.sync()
+                self.flush()
+            except Exception:
+                logger.exception("Failed to update the lexical index; will retry")
+            finally:
+                if self.tracking:
+                    # Do not keep a connection open between rounds.
+                    connection.close()
+
+
+def load_lexical_index(path: Path = LEXICAL_INDEX_PATH) -> LexicalIndex:
+    """
+    The saved index brought up to date with the table (built from it if there
+    is no file), following later changes in the background.
+    """
+    index = LexicalIndex(path)
+    if index.loaded:
+        applied = index.sync()
+        logger.info("Applied %d document changes to the lexical index.", applied)
+    else:
+        index.rebuild()
+    index._ensure_flusher()
+    return index
+
+
+# Loaded on first use (or by the warm-up in RagAppConfig.ready).
+lexical_index_provider: LazyProvider[LexicalIndex] = LazyProvider("lexical", load_lexical_index)
+
+
+def get_lexical_index() -> LexicalIndex:
+    return lexical_index_provider.get()
+
+
+def sync_if_loaded() -> None:
+    """Apply new document changes now, if this process has the index loaded."""
+    if not lexical_index_provider.ready:
+        return
+    try:
+        get_lexical_index().sync()
+    except Exception:
+        logger.exception("Failed to update the lexical index; the next sync will retry")
+
+
+@atexit.register
+def flush_at_exit() -> None:
+    if not lexical_index_provider.ready:
+        return
+    try:
+        get_lexical_index().flush()
+    except Exception:
+        logger.exception("Failed to save the lexical index at exit")
@@ -0,0 +1,232 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from django.conf import settings
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache, InMemoryCache
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, Generation
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_PATH = getattr(
+    settings, "LLM_CACHE_PATH", Path(settings.BASE_DIR) / "llm_cache.sqlite3"
+)
+LLM_CACHE_TTL = getattr(settings, "LLM_CACHE_TTL", 24 * 60 * 60)
+LLM_CACHE_MAX_ENTRIES = getattr(settings, "LLM_CACHE_MAX_ENTRIES", 1024)
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Canonical form of the serialized messages LangChain passes as ``prompt``:
+    message ids are dropped, text content is stripped and keys are sorted, so
+    a retry or a duplicate submission maps to the same key.
+    """
+    try:
+        messages = json.loads(prompt)
+    except ValueError:
+        return prompt.strip()
+
+    def clean(value):
+        if isinstance(value, dict):
+            return {
+                key: clean(item)
+                for key, item in value.items()
+                if not (key == "id" and isinstance(item, (str, type(None))))
+            }
+        if isinstance(value, list):
+            return [clean(item) for item in value]
+        if isinstance(value, str):
+            return value.strip()
+        return value
+
+    return json.dumps(clean(messages), sort_keys=True, ensure_ascii=False)
+
+
+def dump_generations(generations: RETURN_VAL_TYPE) -> str:
+    rows = []
+    for generation in generations:
+        row = {"text": generation.text, "generation_info": generation.generation_info}
+        if isinstance(generation, ChatGeneration):
+            row["message"] = message_to_dict(generation.message)
+        rows.append(row)
+    return json.dumps(rows, ensure_ascii=False)
+
+
+def load_generations(value: str) -> RETURN_VAL_TYPE:
+    generations = []
+    for row in json.loads(value):
+        if "message" in row:
+            generations.append(
+                ChatGeneration(
+                    message=messages_from_dict([row["message"]])[0],
+                    generation_info=row["generation_info"],
+                )
+            )
+        else:
+            generations.append(
+                Generation(text=row["text"], generation_info=row["generation_info"])
+            )
+    return generations
+
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    """
+    Hash of the model parameters (``llm_string`` includes the model name and
+    temperature) and the normalized messages.
+    """
+    digest = hashlib.sha256()
+    digest.update(llm_string.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(normalize_prompt(prompt).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class TieredLLMCache(BaseCache):
+    """
+    LangChain LLM cache with a bounded in-memory LRU in front of a local
+    SQLite file.
+
+    Entries expire ``ttl`` seconds after being stored. The memory tier is
+    per process; the SQLite tier is shared by every worker on the host and
+    survives restarts. Only pass it as ``cache=`` to models whose answer is
+    deterministic for a given prompt (temperature 0), such as the
+    classification step.
+    """
+
+    def __init__(
+        self,
+        path: Path = LLM_CACHE_PATH,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES,
+        ttl: float = LLM_CACHE_TTL,
+    ) -> None:
+        self.path = str(path)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._memory: "OrderedDict[str, Tuple[float, RETURN_VAL_TYPE]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._counters = {"memory_hits": 0, "sqlite_hits": 0, "misses": 0}
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread, opened on first use; sqlite3 connections
+        # are not shareable between threads.
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            with connection:
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS llm_cache ("
+                    " key TEXT PRIMARY KEY,"
+                    " value TEXT NOT NULL,"
+                    " expires_at REAL NOT NULL)"
+                )
+            self._local.connection = connection
+        return connection
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            self._counters[counter] += 1
+
+    def _remember(self, key: str, expires_at: float, value: RETURN_VAL_TYPE) -> None:
+        with self._lock:
+            self._memory[key] = (expires_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = cache_key(prompt, llm_string)
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    return entry[1]
+                del self._memory[key]
+
+        try:
+            row = (
+                self._connection()
+                .execute(
+                    "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+                )
+                .fetchone()
+            )
+            if row is not None and row[1] > now:
+                value = load_generations(row[0])
+                self._remember(key, row[1], value)
+                self._count("sqlite_hits")
+                return value
+        except (sqlite3.Error, ValueError, KeyError):
+            # The cache is an optimization; fall back to calling the model.
+            logger.exception("LLM cache lookup failed")
+
+        self._count("misses")
+        return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = cache_key(prompt, llm_string)
+        expires_at = time.time() + self.ttl
+        self._remember(key, expires_at, return_val)
+        try:
+            with self._connection() as connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, expires_at)"
+                    " VALUES (?, ?, ?)",
+                    (key, dump_generations(return_val), expires_at),
+                )
+        except sqlite3.Error:
+            logger.exception("LLM cache update failed")
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._memory.clear()
+        with self._connection() as connection:
+            connection.execute("DELETE FROM llm_cache")
+
+    def purge_expired(self) -> int:
+        """Delete expired rows from the SQLite tier; returns how many."""
+        with self._connection() as connection:
+            cursor = connection.execute(
+                "DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),)
+            )
+        return cursor.rowcount
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["memory_entries"] = len(self._memory)
+        return stats
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            for counter in self._counters:
+                self._counters[counter] = 0
+
+
+def get_llm_cache() -> Optional[BaseCache]:
+    """Create the cache selected by ``settings.LLM_CACHE``; ``None`` disables it."""
+    backend = getattr(settings, "LLM_CACHE", "tiered")
+    if backend == "tiered":
+        return TieredLLMCache()
+    if backend == "memory":
+        return InMemoryCache(maxsize=LLM_CACHE_MAX_ENTRIES)
+    if backend == "none":
+        return None
+    raise ValueError(f"Unknown LLM_CACHE backend: '{backend}'.")
+
+
+# Shared by every deterministic model in this process.
+llm_cache = get_llm_cache()
@@ -0,0 +1,118 @@
+import json
+import mmap
+import os
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Union
+
+import numpy as np
+from langchain_community.docstore.base import Docstore
+from langchain_core.documents import Document
+
+# Records (one JSON object per stored vector, in index order) and the int64
+# offsets delimiting them (N + 1 values), next to index.faiss.
+DOCSTORE_DATA = "docstore.bin"
+DOCSTORE_OFFSETS = "docstore.offsets.npy"
+
+
+def write_mapped_docstore(db, path: Path) -> None:
+    """
+    Write the documents of the LangChain FAISS store ``db`` in index order.
+    Both files are written aside and moved into place, data first.
+    """
+    data_path = path / DOCSTORE_DATA
+    offsets_path = path / DOCSTORE_OFFSETS
+    offsets = np.zeros(db.index.ntotal + 1, dtype="<i8")
+
+    with open(f"{data_path}.tmp", "wb") as data:
+        for position in range(db.index.ntotal):
+            docstore_id = db.index_to_docstore_id[position]
+            document = db.docstore.search(docstore_id)
+            record = {
+                "id": docstore_id,
+                "content": document.page_content,
+                "metadata": document.metadata,
+            }
+            data.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+            offsets[position + 1] = data.tell()
+        data.flush()
+        os.fsync(data.fileno())
+    with open(f"{offsets_path}.tmp", "wb") as file:
+        np.save(file, offsets)
+        file.flush()
+        os.fsync(file.fileno())
+
+    os.replace(f"{data_path}.tmp", data_path)
+    os.replace(f"{offsets_path}.tmp", offsets_path)
+
+
+class MappedDocstore(Docstore):
+    """
+    Read-only docstore over the files of ``write_mapped_docstore``, both
+    memory-mapped: opening it reads nothing but the offsets header, and every
+    process mapping the same files shares their pages in the OS page cache.
+
+    Documents are read by index position (``at``); lookups by id build an
+    id -> position map on first use.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.offsets = np.load(path / DOCSTORE_OFFSETS, mmap_mode="r")
+        with open(path / DOCSTORE_DATA, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            # mmap cannot map an empty file.
+            self.data: Union[mmap.mmap, bytes] = (
+                mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+            )
+        if int(self.offsets[-1]) != size:
+            raise ValueError("The docstore offsets do not match its data file.")
+        self._positions: Optional[Dict[str, int]] = None
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def record(self, position: int) -> dict:
+        start, end = int(self.offsets[position]), int(self.offsets[position + 1])
+        return json.loads(self.data[start:end])
+
+    def at(self, position: int) -> Document:
+        record = self.record(position)
+        return Document(page_content=record["content"], metadata=record["metadata"])
+
+    def search(self, search: str) -> Union[str, Document]:
+        if self._positions is None:
+            self._positions = {self.record(p)["id"]: p for p in range(len(self))}
+        position = self._positions.get(search)
+        if position is None:
+            return f"ID {search} not found."
+        return self.at(position)
+
+    @property
+    def _dict(self) -> Dict[str, Document]:
+        # What InMemoryDocstore exposes; copy_snapshot materializes the store
+        # through it when a flush builds the next snapshot.
+        documents = {}
+        for position in range(len(self)):
+            record = self.record(position)
+            documents[record["id"]] = Document(
+                page_content=record["content"], metadata=record["metadata"]
+            )
+        return documents
+
+
+class MappedIds(Mapping):
+    """``index_to_docstore_id`` read lazily from a ``MappedDocstore``."""
+
+    def __init__(self, docstore: MappedDocstore) -> None:
+        self.docstore = docstore
+
+    def __getitem__(self, position: int) -> str:
+        if not 0 <= position < len(self.docstore):
+            raise KeyError(position)
+        return self.docstore.record(position)["id"]
+
+    def __len__(self) -> int:
+        return len(self.docstore)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(len(self.docstore)))
@@ -0,0 +1,373 @@
+import functools
+import ipaddress
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from django.conf import settings
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+# Recording is a dictionary update under a per-metric lock; with
+# METRICS_ENABLED = False every instrumentation point returns immediately.
+METRICS_ENABLED = getattr(settings, "METRICS_ENABLED", True)
+
+# Networks whose clients may scrape /metrics without a staff session.
+ALLOWED_NETWORKS = tuple(
+    ipaddress.ip_network(network, strict=False)
+    for network in getattr(settings, "METRICS_ALLOWED_NETWORKS", ("127.0.0.1", "::1"))
+)
+
+# Seconds; spans a cached lookup (~1 ms) to a slow completion (~30 s).
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+LabelValues = Tuple[str, ...]
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(
+            name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        )
+        for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+class Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values: Dict[LabelValues, Any] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        return [
+            f"{self.name}{format_labels(self.label_names, key)} {format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: str) -> None:
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # Per-bucket (non-cumulative) counts + overflow, sum, count
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = {key: (list(entry[0]), entry[1], entry[2]) for key, entry in self._values.items()}
+
+        lines = []
+        names = self.label_names + ("le",)
+        for key, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                lines.append(
+                    f"{self.name}_bucket{format_labels(names, key + (format_value(bound),))} "
+                    f"{cumulative}"
+                )
+            labels = format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Process-wide collection of metrics rendered in Prometheus text format."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric '{metric.name}' is already registered.")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labels))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_request_duration = registry.histogram(
+    "rag_http_request_duration_seconds",
+    "Time spent serving requests, by URL route and status code.",
+    ("route", "method", "status"),
+)
+http_requests_in_flight = registry.gauge(
+    "rag_http_requests_in_flight", "Requests currently being served."
+)
+node_duration = registry.histogram(
+    "rag_graph_node_duration_seconds",
+    "Time spent in each LangGraph node.",
+    ("node", "status"),
+)
+nodes_in_flight = registry.gauge(
+    "rag_graph_nodes_in_flight", "LangGraph nodes currently running.", ("node",)
+)
+llm_duration = registry.histogram(
+    "rag_llm_request_duration_seconds",
+    "Duration of chat model calls.",
+    ("model", "status"),
+)
+llm_in_flight = registry.gauge(
+    "rag_llm_requests_in_flight", "Chat model calls currently running.", ("model",)
+)
+llm_prompt_tokens = registry.counter(
+    "rag_llm_prompt_tokens_total", "Prompt tokens sent to the chat model.", ("model",)
+)
+llm_completion_tokens = registry.counter(
+    "rag_llm_completion_tokens_total",
+    "Completion tokens produced by the chat model.",
+    ("model",),
+)
+checkpoint_duration = registry.histogram(
+    "rag_checkpoint_duration_seconds",
+    "Checkpoint reads and writes in the Django checkpointer.",
+    ("operation",),
+)
+vector_duration = registry.histogram(
+    "rag_vector_store_duration_seconds",
+    "FAISS vector store operations.",
+    ("operation",),
+)
+search_duration = registry.histogram(
+    "rag_search_duration_seconds",
+    "Lexical (BM25) and hybrid searches.",
+    ("operation",),
+)
+embedding_cache_lookups = registry.counter(
+    "rag_embedding_cache_lookups_total",
+    "Texts looked up in the embedding cache, by result (hit or miss).",
+    ("result",),
+)
+
+
+def scrape_allowed(address: Optional[str]) -> bool:
+    """Whether ``address`` (a client IP) is inside ``ALLOWED_NETWORKS``."""
+    try:
+        ip = ipaddress.ip_address(address or "")
+    except ValueError:
+        return False
+    return any(ip in network for network in ALLOWED_NETWORKS)
+
+
+def timed(histogram: Histogram, **labels: str):
+    """Decorator recording the duration of each call in ``histogram``."""
+
+    def decorator(func):
+        if not METRICS_ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start, **labels)
+
+        return wrapper
+
+    return decorator
+
+
+def token_usage(response: LLMResult) -> Tuple[int, int]:
+    """(prompt, completion) tokens reported by the provider, 0 if unknown."""
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    if usage:
+        return usage.get("prompt_tokens") or 0, usage.get("completion_tokens") or 0
+
+    prompt = completion = 0
+    for generations in response.generations:
+        for generation in generations:
+            metadata = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if metadata:
+                prompt += metadata.get("input_tokens") or 0
+                completion += metadata.get("output_tokens") or 0
+    return prompt, completion
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    LangChain callback recording LangGraph node and chat model timings.
+
+    Nodes are the outermost chain runs whose name matches the
+    ``langgraph_node`` they run in (nested runnables inherit the metadata but
+    not the name); internal nodes such as ``__start__`` are skipped.
+    """
+
+    run_inline = True  # Plain bookkeeping; no need for an executor hop.
+
+    def __init__(self) -> None:
+        self._runs: Dict[UUID, Tuple[str, str, float]] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id: UUID, kind: str, label: str) -> None:
+        with self._lock:
+            self._runs[run_id] = (kind, label, time.perf_counter())
+        (nodes_in_flight if kind == "node" else llm_in_flight).inc(**{kind: label})
+
+    def _end(self, run_id: UUID, status: str) -> Optional[Tuple[str, str]]:
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return None
+        kind, label, start = run
+        elapsed = time.perf_counter() - start
+        if kind == "node":
+            nodes_in_flight.dec(node=label)
+            node_duration.observe(elapsed, node=label, status=status)
+        else:
+            llm_in_flight.dec(model=label)
+            llm_duration.observe(elapsed, model=label, status=status)
+        return kind, label
+
+    def on_chain_start(
+        self,
+        serialized: Dict[str, Any],
+        inputs: Any,
+        *,
+        run_id: UUID,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        node = (metadata or {}).get("langgraph_node")
+        if not node or node.startswith("__") or kwargs.get("name") != node:
+            return
+        # A RunnableLambda named after its node runs inside the node's own run.
+        parent = self._runs.get(kwargs.get("parent_run_id"))
+        if parent is not None and parent[:2] == ("node", node):
+            return
+        self._start(run_id, "node", node)
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, "ok")
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, "error")
+
+    def on_chat_model_start(
+        self,
+        serialized: Dict[str, Any],
+        messages: Any,
+        *,
+        run_id: UUID,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        model = (metadata or {}).get("ls_model_name") or "unknown"
+        self._start(run_id, "model", model)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._end(run_id, "ok")
+        if run is None:
+            return
+        prompt, completion = token_usage(response)
+        if prompt:
+            llm_prompt_tokens.inc(prompt, model=run[1])
+        if completion:
+            llm_completion_tokens.inc(completion, model=run[1])
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, "error")
+
+
+metrics_callback = MetricsCallbackHandler()
+
+
+def callbacks() -> list:
+    """Callbacks to pass in a graph's ``config``; empty when metrics are off."""
+    return [metrics_callback] if METRICS_ENABLED else []
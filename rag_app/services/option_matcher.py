@@ -0,0 +1,134 @@
+import re
+import unicodedata
+from difflib import SequenceMatcher
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from .questions import CatalogQuestion
+
+# Similitud mínima (difflib) para aceptar una palabra con errores de escritura.
+# Solo se aplica a palabras de 4 letras o más; "sí" y "no" deben coincidir.
+FUZZY_THRESHOLD = 0.8
+FUZZY_MIN_LENGTH = 4
+
+# Por encima de este número de palabras una respuesta de opción única ya no se
+# considera corta: "si" puede ser condicional y conviene que decida el modelo.
+MAX_SINGLE_CHOICE_WORDS = 8
+
+# Formas coloquiales de las opciones más comunes.
+SYNONYMS = {
+    "si": {"si", "sii", "sip", "sep", "claro", "simon", "obvio"},
+    "no": {"no", "nop", "nel", "nunca", "jamas"},
+}
+
+# Palabras que indican duda; con ellas la respuesta es ambigua.
+HEDGES = {
+    "se",  # "no sé"
+    "tal",
+    "vez",
+    "veces",
+    "aveces",
+    "quizas",
+    "quiza",
+    "depende",
+    "masomenos",
+    "menos",
+    "poco",
+    "creo",
+}
+
+# Palabras que pueden acompañar a las opciones sin aportar otra respuesta
+# (en preguntas que admiten "otro", cualquier otra palabra es ambigua).
+FILLERS = {
+    "a", "al", "con", "de", "del", "el", "en", "es", "la", "las", "lo", "los",
+    "mi", "mis", "y", "e", "o", "u", "yo", "vivo", "viven", "me", "cuida",
+    "cuidan", "quiere", "platico", "le", "les", "digo", "mucho", "gracias",
+    "pues", "bueno", "tambien", "solo", "nada", "mas",
+}
+
+
+def normalize(text: str) -> str:
+    """Minúsculas, sin acentos ni signos de puntuación."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    without_accents = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return re.sub(r"[^a-z0-9ñ]+", " ", without_accents).strip()
+
+
+def tokenize(text: str) -> List[str]:
+    return normalize(text).split()
+
+
+@lru_cache(maxsize=None)
+def option_tokens(option: str) -> Tuple[str, ...]:
+    return tuple(tokenize(option))
+
+
+def word_matches(expected: str, word: str, fuzzy: bool) -> bool:
+    if word in SYNONYMS.get(expected, (expected,)):
+        return True
+    if not fuzzy or len(expected) < FUZZY_MIN_LENGTH or len(word) < FUZZY_MIN_LENGTH:
+        return False
+    return SequenceMatcher(None, expected, word).ratio() >= FUZZY_THRESHOLD
+
+
+def find_option(
+    expected: Tuple[str, ...], words: List[Optional[str]], fuzzy: bool
+) -> Optional[int]:
+    """Posición donde aparece la secuencia de palabras de la opción, o None."""
+    for start in range(len(words) - len(expected) + 1):
+        if all(
+            words[start + offset] is not None
+            and word_matches(token, words[start + offset], fuzzy)
+            for offset, token in enumerate(expected)
+        ):
+            return start
+    return None
+
+
+def match_option(question: CatalogQuestion, message: str) -> Optional[str]:
+    """
+    Busca en el mensaje del usuario las opciones cerradas de ``question``.
+
+    Devuelve la respuesta a guardar (la opción, o varias separadas por comas
+    en preguntas que admiten más de una) solo cuando la coincidencia no deja
+    lugar a dudas; en cualquier otro caso devuelve None y la clasificación se
+    delega al modelo.
+    """
+    if not question.options:
+        return None
+
+    words: List[Optional[str]] = tokenize(message)
+    if not words or HEDGES.intersection(words):
+        return None
+
+    # Primero coincidencias exactas y luego aproximadas, para que "hermanos"
+    # no lo tome "Hermanas"; dentro de cada pasada, las opciones más largas
+    # primero: "Sí me gusta pero no puedo dormir" consume sus palabras antes
+    # de que "Sí" o "No" las encuentren.
+    options = sorted(question.options, key=lambda o: -len(option_tokens(o)))
+    matched = []
+    for fuzzy in (False, True):
+        for option in options:
+            if option in matched:
+                continue
+            expected = option_tokens(option)
+            start = find_option(expected, words, fuzzy)
+            if start is None:
+                continue
+            matched.append(option)
+            for position in range(start, start + len(expected)):
+                words[position] = None
+
+    if not matched:
+        return None
+
+    leftover = [word for word in words if word is not None]
+    if question.other:
+        # Cualquier palabra no reconocida puede ser una opción "otro".
+        if any(word not in FILLERS for word in leftover):
+            return None
+    elif len(matched) > 1 or len(leftover) + 1 > MAX_SINGLE_CHOICE_WORDS:
+        return None
+
+    # Orden del catálogo, no el de aparición en el mensaje.
+    return ", ".join(option for option in question.options if option in matched)
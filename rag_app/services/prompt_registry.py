@@ -0,0 +1,109 @@
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, NamedTuple, Optional
+
+from django.conf import settings
+from langchain_core.prompts import BasePromptTemplate
+
+logger = logging.getLogger(__name__)
+
+# Construct the path relative to the Django project
+PROMPTS_PATH = Path(settings.BASE_DIR) / "config" / "prompts.json"
+
+# A builder receives the parsed prompts.json and returns a compiled template.
+PromptBuilder = Callable[[Dict[str, str]], BasePromptTemplate]
+
+
+# Load prompts from the JSON file
+def load_prompts(path: Path = PROMPTS_PATH) -> dict:
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+class PromptSnapshot(NamedTuple):
+    mtime_ns: Optional[int]
+    prompts: Dict[str, str]
+    templates: Dict[str, BasePromptTemplate]
+
+
+class PromptRegistry:
+    """
+    Compiles every registered prompt template once and serves the compiled
+    objects on each turn.
+
+    Templates are rebuilt from ``prompts.json`` when the file's mtime changes
+    (checked at most every ``check_interval`` seconds). The new set is built
+    aside and published by swapping a single reference, so a request never
+    sees a mix of old and new templates; if the file is invalid the previous
+    set stays in place.
+    """
+
+    def __init__(self, path: Path, check_interval: float = 1.0) -> None:
+        self.path = path
+        self.check_interval = check_interval
+        self._builders: Dict[str, PromptBuilder] = {}
+        self._snapshot = PromptSnapshot(None, {}, {})
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def register(self, name: str, builder: PromptBuilder) -> None:
+        with self._lock:
+            self._builders[name] = builder
+            # Compile the new template on next access.
+            self._snapshot = self._snapshot._replace(mtime_ns=None)
+
+    def get(self, name: str) -> BasePromptTemplate:
+        return self._current().templates[name]
+
+    def prompt_text(self, name: str) -> str:
+        """Raw text of an entry of prompts.json."""
+        return self._current().prompts[name]
+
+    def reload(self) -> None:
+        with self._lock:
+            self._reload()
+
+    def _current(self) -> PromptSnapshot:
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if snapshot.mtime_ns is not None and now - self._checked_at < self.check_interval:
+            return snapshot
+
+        with self._lock:
+            self._checked_at = now
+            try:
+                mtime_ns = os.stat(self.path).st_mtime_ns
+            except OSError:
+                logger.exception("Cannot stat prompts file %s", self.path)
+                return self._snapshot
+            if mtime_ns != self._snapshot.mtime_ns:
+                self._reload(mtime_ns)
+            return self._snapshot
+
+    def _reload(self, mtime_ns: Optional[int] = None) -> None:
+        if mtime_ns is None:
+            mtime_ns = os.stat(self.path).st_mtime_ns
+        try:
+            prompts = load_prompts(self.path)
+            templates = {
+                name: builder(prompts) for name, builder in self._builders.items()
+            }
+        except Exception:
+            if not self._snapshot.templates and self._builders:
+                raise
+            logger.exception("Invalid prompts in %s; keeping previous templates", self.path)
+            # Do not retry until the file changes again.
+            self._snapshot = self._snapshot._replace(mtime_ns=mtime_ns)
+            return
+
+        logger.info("Loaded %d prompt templates from %s", len(templates), self.path)
+        self._snapshot = PromptSnapshot(mtime_ns, prompts, templates)
+
+
+prompt_registry = PromptRegistry(
+    PROMPTS_PATH, check_interval=getattr(settings, "PROMPTS_RELOAD_INTERVAL", 1.0)
+)
@@ -1,4 +1,5 @@
 import json
+from functools import lru_cache
 
 # Definimos constantes para los keys principales
 KEY_PERSONALIDAD = "personalidad"
@@ -18,9 +19,11 @@ PROPOSITOS_DICT = {
     PROP_REALIZAR_PREGUNTA: "Formulas preguntas de manera fluida y relevante para que la conversación siga desarrollándose de manera orgánica.",
 }
 
+@lru_cache(maxsize=None)
 def build_system_prompt():
     """
     Construye un prompt con una estructura definida y agrega propósitos según las claves proporcionadas.
+    El texto es estático, así que se construye una sola vez y se reutiliza.
     """
     prompt_json = {
     KEY_PERSONALIDAD: """Eres una persona carismática y con gran habilidad para conectar con los demás.
@@ -40,32 +43,20 @@ def build_system_prompt():
 
     return final_prompt
 
+# Plantilla precompilada de build_prompt: solo se sustituyen los valores.
+BUILD_PROMPT_TEMPLATE = "\n".join(
+    [
+        'Responde de manera auténtica a lo que dice el usuario: "{user_prompt}", asegurándote de reconocer su mensaje de forma natural.',
+        'Luego, guía la conversación sin que se sienta forzada, integrando la pregunta: "{question}" de manera sutil y fluida.',
+    ]
+)
+
+
 def build_prompt(user_prompt,  question):
     """
     Construye un prompt con una estructura definida y agrega propósitos según las claves proporcionadas.
     """
-    prompt_json = {
-        KEY_PROPOSITOS: [
-            f'Responde de manera auténtica a lo que dice el usuario: "{user_prompt}", asegurándote de reconocer su mensaje de forma natural.',
-            f'Luego, guía la conversación sin que se sienta forzada, integrando la pregunta: "{question}" de manera sutil y fluida.',
-        ],
-        # KEY_DINAMICA: "Aprovecha el contexto para hacer la charla interesante, con un toque de curiosidad y empatía.",
-        # KEY_INTERACCION: "Mantén la interacción dinámica, con respuestas que inviten a seguir conversando sin sentirse mecánicas o estructuradas.",
-    }
-
-    # Agregar propósitos adicionales según las claves proporcionadas
-    # prompt_json = add_propositos(prompt_json, propositos_keys)
-
-    # Reconstrucción del prompt en formato de texto
-    final_prompt = (
-        # f"{prompt_json[KEY_PERSONALIDAD]}\n\n"
-        ""
-        + "\n".join(prompt_json[KEY_PROPOSITOS])
-        # + "\n\n"
-        # f"{prompt_json[KEY_DINAMICA]} {prompt_json[KEY_INTERACCION]}"
-    )
-    return "\n".join(prompt_json[KEY_PROPOSITOS])
-    return final_prompt
+    return BUILD_PROMPT_TEMPLATE.format(user_prompt=user_prompt, question=question)
 
 
 def add_propositos(existing_prompt, propositos_keys):
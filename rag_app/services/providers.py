@@ -0,0 +1,88 @@
+import importlib
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Generic, Iterable, Iterator, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Every provider, by name, for warm_up.
+providers: Dict[str, "LazyProvider"] = {}
+
+# Module defining each provider; importing it only registers the provider.
+PROVIDER_MODULES = {
+    "embeddings": "rag_app.services.embedding_cache",
+    "faiss": "rag_app.services.vector_service",
+    "lexical": "rag_app.services.lexical_index",
+    "rag": "rag_app.rag",
+    "agent": "rag_app.agents",
+}
+
+
+class LazyProvider(Generic[T]):
+    """
+    A resource (vector store, agent, client) created by ``factory`` on first
+    use instead of at import time, so importing a module or running a
+    management command does not pay for backends it never touches.
+
+    ``get`` creates the value once, even when several threads ask for it at
+    the same time. If the factory fails the error is raised to the caller and
+    the next ``get`` tries again.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], T]) -> None:
+        self.name = name
+        self.factory = factory
+        self._value: Optional[T] = None
+        self._ready = False
+        self._lock = threading.Lock()
+        providers[name] = self
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def get(self) -> T:
+        if self._ready:
+            return self._value
+
+        with self._lock:
+            if not self._ready:
+                start = time.perf_counter()
+                self._value = self.factory()
+                self._ready = True
+                logger.info(
+                    "Initialized %s in %.2fs", self.name, time.perf_counter() - start
+                )
+            return self._value
+
+    @contextmanager
+    def override(self, value: T) -> Iterator[T]:
+        """Serve ``value`` instead (e.g. an offline fake) until the block exits."""
+        with self._lock:
+            previous = (self._value, self._ready)
+            self._value, self._ready = value, True
+        try:
+            yield value
+        finally:
+            with self._lock:
+                self._value, self._ready = previous
+
+
+def warm_up(names: Iterable[str]) -> None:
+    """
+    Create the named providers now, one after the other. Failures are logged,
+    not raised: a slow or unavailable backend must not prevent the server
+    from starting, and the first request needing it will try again.
+    """
+    for name in names:
+        try:
+            if name not in PROVIDER_MODULES:
+                raise KeyError(f"Unknown provider '{name}' in RAG_WARM_UP.")
+            importlib.import_module(PROVIDER_MODULES[name])
+            providers[name].get()
+        except Exception:
+            logger.exception("Warm-up of %s failed; it will be retried on first use", name)
@@ -0,0 +1,59 @@
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator
+
+from langchain_core.messages import AIMessageChunk
+
+
+def stream_graph_tokens(
+    app, graph_input: Dict[str, Any], config: Dict[str, Any], nodes: Iterable[str]
+) -> Iterator[str]:
+    """
+    Run ``app`` with LangGraph message streaming and yield the text of every
+    token the chat model produces inside ``nodes``.
+
+    Calls made elsewhere (classification, summaries, structured output) are
+    not forwarded. If nothing was streamed, the content of the final message
+    is yielded once, so callers always receive the reply. The checkpoint is
+    written by LangGraph as the run completes, i.e. when this generator is
+    exhausted.
+    """
+    nodes = set(nodes)
+    streamed = False
+
+    for chunk, metadata in app.stream(graph_input, config, stream_mode="messages"):
+        if not isinstance(chunk, AIMessageChunk):
+            continue
+        if metadata.get("langgraph_node") not in nodes:
+            continue
+        if chunk.content:
+            streamed = True
+            yield chunk.content
+
+    if not streamed:
+        messages = app.get_state(config).values.get("messages", [])
+        if messages:
+            yield messages[-1].content
+
+
+async def astream_graph_tokens(
+    app, graph_input: Dict[str, Any], config: Dict[str, Any], nodes: Iterable[str]
+) -> AsyncIterator[str]:
+    """Async version of ``stream_graph_tokens`` (uses ``astream``)."""
+    nodes = set(nodes)
+    streamed = False
+
+    async for chunk, metadata in app.astream(
+        graph_input, config, stream_mode="messages"
+    ):
+        if not isinstance(chunk, AIMessageChunk):
+            continue
+        if metadata.get("langgraph_node") not in nodes:
+            continue
+        if chunk.content:
+            streamed = True
+            yield chunk.content
+
+    if not streamed:
+        state = await app.aget_state(config)
+        messages = state.values.get("messages", [])
+        if messages:
+            yield messages[-1].content
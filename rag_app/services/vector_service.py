@@ -1,91 +1,851 @@
+import atexit
+import base64
+import fcntl
+import json
+import os
+import pickle
 from pathlib import Path
 import threading
 import logging
-from langchain_openai import OpenAIEmbeddings
-from langchain.vectorstores import FAISS
-from typing import Any, Dict, List, Optional
+import uuid
+from contextlib import contextmanager
+import faiss
+import numpy as np
+from django.conf import settings
+from langchain_community.vectorstores import FAISS
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_core.documents import Document as LangChainDocument
+from langchain_core.embeddings import Embeddings
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+from ..models import Document
+from .embedding_cache import embeddings_provider
+from .faiss_indexes import (
+    VECTOR_INDEX_TYPE,
+    build_index,
+    configure_search,
+    search_parameters,
+    writable_copy,
+)
+from .mapped_docstore import (
+    DOCSTORE_OFFSETS,
+    MappedDocstore,
+    MappedIds,
+    write_mapped_docstore,
 )
+from .metrics import timed, vector_duration
+from .providers import LazyProvider
+
+logger = logging.getLogger(__name__)
 
 # Define the index path using Pathlib
 INDEX_PATH = Path("faiss_index")
 
+# Texts embedded per provider call by add_documents.
+VECTOR_EMBED_BATCH = getattr(settings, "VECTOR_EMBED_BATCH", 64)
+# The index is written to disk once VECTOR_FLUSH_EVERY documents are waiting,
+# at most VECTOR_FLUSH_INTERVAL seconds after an addition, and at exit.
+VECTOR_FLUSH_EVERY = getattr(settings, "VECTOR_FLUSH_EVERY", 1000)
+VECTOR_FLUSH_INTERVAL = getattr(settings, "VECTOR_FLUSH_INTERVAL", 5.0)
+
+# "heap" reads the saved index into each process; "mmap" maps it read-only.
+VECTOR_LOAD_MODE = getattr(settings, "VECTOR_LOAD_MODE", "heap")
+
+# Additions not yet written to the index files, one JSON object per line, in
+# one journal per process: journal.<pid>.<random>.jsonl.
+JOURNAL_PATTERN = "journal*.jsonl"
+
+# Every process using the index directory takes its lock file shared to append
+# to its journal or read the index files, and exclusive to write them. The
+# generation file counts the saves.
+LOCK_NAME = "lock"
+GENERATION_NAME = "generation"
+
+# Files of FAISS.save_local/load_local: the index and, pickled, the docstore
+# with the position -> docstore id mapping.
+INDEX_FILE = "index.faiss"
+INDEX_PICKLE = "index.pkl"
+
+
+def copy_snapshot(db: FAISS, index: Optional[faiss.Index] = None) -> FAISS:
+    """
+    Independent copy of a FAISS store (index, docstore and id mapping),
+    optionally with ``index`` (holding the same ids) in place of its index.
+    """
+    return FAISS(
+        embedding_function=db.embedding_function,
+        index=index if index is not None else writable_copy(db.index),
+        docstore=InMemoryDocstore(dict(db.docstore._dict)),
+        index_to_docstore_id=dict(db.index_to_docstore_id),
+        relevance_score_fn=db.override_relevance_score_fn,
+        normalize_L2=db._normalize_L2,
+        distance_strategy=db.distance_strategy,
+    )
+
+
+def document_at(db: FAISS, position: int) -> LangChainDocument:
+    """Document stored at ``position`` of the index."""
+    if isinstance(db.docstore, MappedDocstore):
+        return db.docstore.at(position)
+    return db.docstore.search(db.index_to_docstore_id[position])
+
+
+def write_atomic(path: Path, write: Callable[[BinaryIO], None]) -> None:
+    """Write ``path`` through ``write`` to a temporary file, then move it into place."""
+    with open(f"{path}.tmp", "wb") as file:
+        write(file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(f"{path}.tmp", path)
+
+
+class RecentAdditions:
+    """
+    Documents added on top of a snapshot (``base``) since it was published,
+    searched by brute force next to its index until a flush builds a new
+    snapshot holding both. Adding costs the size of the batch, not of the
+    index.
+
+    Appends never change what a reader may already be looking at: rows and
+    documents are stored first and ``count``, the published bound, is raised
+    last; growing the buffer allocates a new array. A reader that reads
+    ``count`` before ``vectors`` therefore always finds ``count`` valid rows.
+    Only the holder of ``FAISSManager.write_lock`` appends.
+    """
+
+    def __init__(self, base: FAISS) -> None:
+        self.base = base
+        self.vectors = np.empty((0, base.index.d), dtype="float32")
+        self.documents: List[LangChainDocument] = []
+        self.count = 0
+        self._known: Optional[set] = None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def known(self) -> set:
+        """Docstore ids of the base and the recent additions (built on first use)."""
+        if self._known is None:
+            self._known = set(self.base.index_to_docstore_id.values())
+            self._known.update(document.id for document in self.documents[: self.count])
+        return self._known
+
+    def append(
+        self,
+        vectors: Sequence[Sequence[float]],
+        metadatas: Sequence[Dict[str, Any]],
+        texts: Sequence[str],
+        ids: Sequence[str],
+    ) -> None:
+        rows = np.array(vectors, dtype="float32").reshape(len(ids), -1)
+        if self.base._normalize_L2:
+            faiss.normalize_L2(rows)
+        count = self.count
+        needed = count + len(ids)
+        if needed > len(self.vectors):
+            grown = np.empty((max(needed, 2 * len(self.vectors), 64), rows.shape[1]), dtype="float32")
+            grown[:count] = self.vectors[:count]
+            self.vectors = grown
+        self.vectors[count:needed] = rows
+        self.documents.extend(
+            LangChainDocument(id=id_, page_content=text, metadata=metadata)
+            for id_, text, metadata in zip(ids, texts, metadatas)
+        )
+        if self._known is not None:
+            self._known.update(ids)
+        self.count = needed  # Publish
+
+    def search(
+        self, queries: np.ndarray, k: int, params: Optional[Any] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (distances, positions) of the ``k`` nearest documents in the base and
+        the recent additions; the latter are numbered after the base.
+        """
+        count = self.count  # Before self.vectors, see the class docstring
+        vectors = self.vectors[:count]
+        index = self.base.index
+        distances, positions = index.search(queries, k, params=params)
+        if not count:
+            return distances, positions
+        heap = faiss.ResultHeap(
+            len(queries), k, keep_max=index.metric_type == faiss.METRIC_INNER_PRODUCT
+        )
+        heap.add_result(distances, positions)
+        distances, positions = faiss.knn(queries, vectors, min(k, count), metric=index.metric_type)
+        heap.add_result(distances, positions + index.ntotal)
+        heap.finalize()
+        return heap.D, heap.I
+
+    def document_at(self, position: int) -> LangChainDocument:
+        offset = position - self.base.index.ntotal
+        if offset < 0:
+            return document_at(self.base, position)
+        return self.documents[offset]
+
+    def merged(self) -> FAISS:
+        """
+        A new snapshot holding the base and the recent additions (the base
+        itself if there are none). Copies the whole store: flushes only.
+        """
+        count = self.count
+        if not count:
+            return self.base
+        db = copy_snapshot(self.base)
+        documents = self.documents[:count]
+        # Already normalized; normalizing again changes nothing.
+        db.add_embeddings(
+            zip([document.page_content for document in documents], self.vectors[:count].tolist()),
+            metadatas=[document.metadata for document in documents],
+            ids=[document.id for document in documents],
+        )
+        return db
+
+
+def stored_contents(documents: Iterable[LangChainDocument]) -> Dict[str, str]:
+    """Text of the documents stored without it, by content hash, in one query."""
+    hashes = {
+        document.metadata["content_hash"]
+        for document in documents
+        if not document.page_content and document.metadata.get("content_hash")
+    }
+    if not hashes:
+        return {}
+    return dict(
+        Document.objects.filter(content_hash__in=hashes).values_list("content_hash", "content")
+    )
+
+
+def batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    batch: List[Any] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def encode_vector(vector: Sequence[float]) -> str:
+    return base64.b64encode(np.asarray(vector, dtype="<f4").tobytes()).decode("ascii")
+
+
+def decode_vector(data: str) -> List[float]:
+    return np.frombuffer(base64.b64decode(data), dtype="<f4").tolist()
+
 
 class FAISSManager:
-    def __init__(self, index_path: Path) -> None:
+    """
+    Owns the FAISS vector store.
+
+    ``self.db`` is an immutable snapshot and ``self.recent`` the documents
+    added on top of it since (``RecentAdditions``). Searches read both
+    without taking any lock (FAISS searches are thread-safe and release the
+    GIL), so they run in parallel. Writers are serialized by ``write_lock``
+    and append to ``self.recent``, which publishes each batch without
+    copying the index. A flush builds the next snapshot, base and recent
+    additions together, and publishes it with a fresh buffer by reassigning
+    ``self.recent``, a single atomic reference swap. Searches already
+    running finish on the old one.
+
+    Additions are not written to the index files right away. Each batch is
+    appended (with its vectors) to an fsync'ed journal of this process next
+    to the index, and a background thread saves the whole index once
+    ``flush_every`` documents are waiting or ``flush_interval`` seconds after
+    an addition. Several processes can share the index directory: a save
+    holds its lock exclusively, starts from the files on disk if another
+    process saved in between, merges the journals of every process and only
+    then removes them. On startup all journals are replayed on top of the
+    saved index, so additions survive a crash without being embedded again.
+    """
+
+    def __init__(
+        self,
+        index_path: Path,
+        embeddings: Optional[Embeddings] = None,
+        batch_size: int = VECTOR_EMBED_BATCH,
+        flush_every: int = VECTOR_FLUSH_EVERY,
+        flush_interval: float = VECTOR_FLUSH_INTERVAL,
+        load_mode: str = VECTOR_LOAD_MODE,
+    ) -> None:
         self.index_path = index_path
-        self.embeddings = OpenAIEmbeddings()
-        self.db_lock = threading.Lock()
-        self.db: Optional[FAISS] = self.initialize_db()
+        self.load_mode = load_mode
+        self.embeddings = embeddings or embeddings_provider.get()
+        self.batch_size = batch_size
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.write_lock = threading.Lock()
+        # Documents added (or replayed) since the index files were written.
+        self.pending = 0
+        # Saves of the index files (by any process) that self.db includes.
+        self.generation = 0
+        self.journal_path: Optional[Path] = None
+        self._journal = None
+        self._journal_pid: Optional[int] = None
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+        # Open flushes_deferred() blocks; automatic flushes wait for none.
+        self._deferred = 0
+        self.recent: Optional[RecentAdditions] = None
+        db = self.initialize_db()
+        if self.db is not db:
+            self._publish(db)
 
-    def initialize_db(self) -> Optional[FAISS]:
-        logging.info("Initializing FAISS database...")
-        if self.index_path.exists():
-            try:
-                logging.info("Loading existing FAISS index from %s", self.index_path)
-                return FAISS.load_local(
-                    str(self.index_path),
-                    self.embeddings,
-                    allow_dangerous_deserialization=True,
-                )
-            except Exception as e:
-                logging.exception("Error loading the FAISS index")
-                return None
+    @property
+    def db(self) -> Optional[FAISS]:
+        """The current snapshot, without the additions in ``self.recent``."""
+        recent = self.recent
+        return recent.base if recent is not None else None
+
+    def initialize_db(self) -> FAISS:
+        """
+        The saved index, or a new one. Errors are raised, not logged: the
+        provider then tries again on its next ``get`` instead of keeping a
+        manager without an index.
+        """
+        logger.info("Initializing FAISS database...")
+        with self.locked():
+            if (self.index_path / INDEX_FILE).exists():
+                return self.open_saved()
+        with self.locked(exclusive=True):
+            if (self.index_path / INDEX_FILE).exists():  # Created meanwhile
+                return self.open_saved()
+            logger.info("FAISS index not found. Creating a new one...")
+            texts = ["This is a test document."]
+            metadatas = [{"title": "Example"}]
+            db = FAISS.from_texts(texts, self.embeddings, metadatas=metadatas)
+            self._save_merged(db)
+            logger.info("New FAISS index created and saved successfully.")
+            return db
+
+    def open_saved(self) -> FAISS:
+        """The saved index with every journal replayed (caller holds the lock)."""
+        logger.info("Loading existing FAISS index from %s", self.index_path)
+        db = self.load()
+        configure_search(db.index)
+        self.generation = self.saved_generation()
+        if self.load_mode == "mmap":
+            stale = not isinstance(db.docstore, MappedDocstore)
         else:
-            logging.info("FAISS index not found. Creating a new one...")
+            stale = not (self.index_path / INDEX_PICKLE).exists()
+        if stale:
+            # Saved in the other mode; the next flush writes this mode's files.
+            self.pending = max(self.pending, 1)
+            self._ensure_flusher()
+        return self.replay_journal(db)
+
+    @contextmanager
+    def locked(self, exclusive: bool = False) -> Iterator[None]:
+        """Hold the lock of the index directory, shared by every process using it."""
+        self.index_path.mkdir(parents=True, exist_ok=True)
+        with open(self.index_path / LOCK_NAME, "a") as file:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield  # Released when the file is closed
+
+    def saved_generation(self) -> int:
+        try:
+            return int((self.index_path / GENERATION_NAME).read_text())
+        except (OSError, ValueError):
+            return 0
+
+    def load(self) -> FAISS:
+        """
+        Read the saved index. In "mmap" mode the index file and the docstore
+        are memory-mapped read-only instead of read into the heap, so startup
+        does not depend on the index size and worker processes share the
+        pages. The first flush in a process copies them into its heap
+        (``RecentAdditions.merged``), so this mode suits read-mostly workers.
+        Each mode reads the files saved by the other and rewrites them in its
+        own format on the next flush.
+        """
+        if self.load_mode == "mmap":
             try:
-                texts = ["This is a test document."]
-                metadatas = [{"title": "Example"}]
-                db = FAISS.from_texts(texts, self.embeddings, metadatas=metadatas)
-                db.save_local(str(self.index_path))
-                logging.info("New FAISS index created and saved successfully.")
-                return db
-            except Exception as e:
-                logging.exception("Error creating the FAISS index")
-                return None
+                return self.load_mapped()
+            except (OSError, ValueError) as e:
+                # Saved in "heap" mode, or files from an interrupted save.
+                logger.warning("Cannot map the FAISS index (%s); loading it whole", e)
+        elif not (self.index_path / INDEX_PICKLE).exists():
+            # Saved in "mmap" mode: read the mapped files into the heap.
+            return copy_snapshot(self.load_mapped())
+        db = FAISS.load_local(
+            str(self.index_path),
+            self.embeddings,
+            allow_dangerous_deserialization=True,
+        )
+        return db
+
+    def load_mapped(self) -> FAISS:
+        flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+        # Recent faiss versions can also map flat (and HNSW) vector storage.
+        flags |= getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+        index = faiss.read_index(str(self.index_path / INDEX_FILE), flags)
+        docstore = MappedDocstore(self.index_path)
+        if len(docstore) != index.ntotal:
+            raise ValueError("the docstore does not match the index")
+        return FAISS(self.embeddings, index, docstore, MappedIds(docstore))
 
+    def save(self, db: FAISS) -> None:
+        """
+        Write the index files aside and move them into place, never over a
+        file in use: other processes, and searches still running on an older
+        snapshot, may have it memory-mapped, and truncating a mapped file
+        makes their next access fail (SIGBUS). The index goes last.
+        """
+        self.index_path.mkdir(parents=True, exist_ok=True)
+        if self.load_mode == "mmap":
+            write_mapped_docstore(db, self.index_path)
+            # The pickle is not read in this mode; a stale one must not be either.
+            (self.index_path / INDEX_PICKLE).unlink(missing_ok=True)
+        else:
+            write_atomic(
+                self.index_path / INDEX_PICKLE,
+                lambda file: pickle.dump((db.docstore, db.index_to_docstore_id), file),
+            )
+            # A mapped docstore left from "mmap" mode no longer matches.
+            (self.index_path / DOCSTORE_OFFSETS).unlink(missing_ok=True)
+        index_file = self.index_path / INDEX_FILE
+        faiss.write_index(db.index, f"{index_file}.tmp")
+        with open(f"{index_file}.tmp", "rb") as file:
+            os.fsync(file.fileno())
+        os.replace(f"{index_file}.tmp", index_file)
+
+    def read_journals(self) -> List[Dict[str, Any]]:
+        """The entries of every process's journal, oldest file first."""
+        entries = []
+        for path in sorted(self.index_path.glob(JOURNAL_PATTERN)):
+            with path.open(encoding="utf-8") as journal:
+                for line in journal:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        # A line torn by a crash mid-write; nothing after it.
+                        break
+        return entries
+
+    def merge_journals(self, db: FAISS) -> Tuple[FAISS, int]:
+        """
+        ``db`` plus the journaled documents it does not contain (a copy if
+        there are any and ``db`` is published or mapped). An interrupted
+        flush may have saved some of them already.
+        """
+        entries = self.read_journals()
+        known = set(db.index_to_docstore_id.values()) if entries else set()
+        entries = [entry for entry in entries if entry["id"] not in known]
+        if not entries:
+            return db, 0
+        if db is self.db or isinstance(db.docstore, MappedDocstore):
+            db = copy_snapshot(db)
+        db.add_embeddings(
+            [(entry["text"], decode_vector(entry["vector"])) for entry in entries],
+            metadatas=[entry["metadata"] for entry in entries],
+            ids=[entry["id"] for entry in entries],
+        )
+        return db, len(entries)
+
+    def replay_journal(self, db: FAISS) -> FAISS:
+        """Re-add the journaled documents the saved index does not contain."""
+        db, added = self.merge_journals(db)
+        if added:
+            self.pending += added
+            self._ensure_flusher()
+        logger.info("Replayed %d journaled documents.", added)
+        return db
+
+    @timed(vector_duration, operation="add_document")
     def add_document(self, content: str, metadata: Dict[str, Any]) -> None:
+        try:
+            self.add_documents([content], [metadata])
+        except Exception:
+            logger.exception("Failed to add document")
+            raise
+
+    @timed(vector_duration, operation="add_documents")
+    def add_documents(
+        self,
+        contents: Sequence[str],
+        metadatas: Optional[Sequence[Dict[str, Any]]] = None,
+        batch_size: Optional[int] = None,
+    ) -> List[str]:
+        """
+        Embed ``contents`` ``batch_size`` texts per provider call, add them to
+        the index and return their docstore ids. The additions are searchable
+        and journaled when this returns; the index files are written later.
+        """
         if self.db is None:
-            logging.error("Cannot add document. FAISS database is not initialized.")
-            return
+            logger.error("Cannot add documents. FAISS database is not initialized.")
+            return []
+        batch_size = batch_size or self.batch_size
+        metadatas = list(metadatas) if metadatas is not None else [{} for _ in contents]
 
-        with self.db_lock:
-            try:
-                logging.info("Adding new document to the FAISS index...")
-                self.db.add_texts([content], metadatas=[metadata])
-                self.db.save_local(str(self.index_path))
-                logging.info("Document added successfully.")
-            except Exception as e:
-                logging.exception("Failed to add document")
-
-    def search(self, query: str) -> List[Dict[str, Any]]:
+        with self.write_lock:
+            ids: List[str] = []
+            for start in range(0, len(contents), batch_size):
+                texts = list(contents[start : start + batch_size])
+                batch_metadatas = metadatas[start : start + batch_size]
+                batch_ids = [uuid.uuid4().hex for _ in texts]
+                vectors = self.embeddings.embed_documents(texts)
+                self._append(texts, vectors, batch_metadatas, batch_ids)
+                ids.extend(batch_ids)
+            full = self.pending >= self.flush_every
+        logger.info("Added %d documents to the FAISS index.", len(ids))
+
+        self._ensure_flusher()
+        if full:
+            self._wake.set()
+        return ids
+
+    @timed(vector_duration, operation="add_embeddings")
+    def add_embeddings(
+        self,
+        contents: Sequence[str],
+        vectors: Sequence[Sequence[float]],
+        metadatas: Sequence[Dict[str, Any]],
+        ids: Sequence[str],
+    ) -> List[str]:
+        """
+        Add already embedded documents under the given docstore ids, skipping
+        ids the index already holds, so adding the same batch twice (e.g. when
+        an ingestion resumes) is harmless. Returns the ids actually added.
+
+        A document stored with empty content and a ``content_hash`` in its
+        metadata keeps its text out of the index: searches read it from the
+        ``Document`` table instead.
+        """
         if self.db is None:
-            logging.error("Cannot perform search. FAISS database is not initialized.")
+            logger.error("Cannot add documents. FAISS database is not initialized.")
             return []
 
-        with self.db_lock:
-            try:
-                logging.info("Performing search for query: %s", query)
-                results = self.db.similarity_search(query)
-                logging.info("Search completed. Found %d results.", len(results))
-                return [
-                    {"content": res.page_content, "metadata": res.metadata}
-                    for res in results
-                ]
-            except Exception as e:
-                logging.exception("Search failed")
+        with self.write_lock:
+            known = self.recent.known()
+            rows = [
+                row for row in zip(contents, vectors, metadatas, ids) if row[3] not in known
+            ]
+            if not rows:
                 return []
+            texts, new_vectors, new_metadatas, new_ids = (list(column) for column in zip(*rows))
+            self._append(texts, new_vectors, new_metadatas, new_ids)
+            full = self.pending >= self.flush_every
+
+        self._ensure_flusher()
+        if full:
+            self._wake.set()
+        return new_ids
+
+    def _append(
+        self,
+        texts: List[str],
+        vectors: List[List[float]],
+        metadatas: Sequence[Dict[str, Any]],
+        ids: List[str],
+    ) -> None:
+        """
+        Journal a batch, then publish it in ``self.recent`` (caller holds
+        ``write_lock``). A batch journaled but not published would come back
+        on restart, so there is nothing in between that can fail.
+        """
+        self.write_journal(texts, vectors, metadatas, ids)
+        self.recent.append(vectors, metadatas, texts, ids)
+        self.pending += len(ids)
+
+    def _publish(self, db: FAISS) -> None:
+        """Make ``db`` the current snapshot, with no recent additions."""
+        self.recent = RecentAdditions(db)  # Publish
+
+    def write_journal(
+        self,
+        texts: List[str],
+        vectors: List[List[float]],
+        metadatas: Sequence[Dict[str, Any]],
+        ids: List[str],
+    ) -> None:
+        with self.locked():
+            journal = self._open_journal()
+            for text, vector, metadata, id_ in zip(texts, vectors, metadatas, ids):
+                entry = {
+                    "id": id_,
+                    "text": text,
+                    "metadata": metadata,
+                    "vector": encode_vector(vector),
+                }
+                journal.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            journal.flush()
+            os.fsync(journal.fileno())
+
+    def _open_journal(self):
+        """
+        This process's journal, opened again if a save (by any process) has
+        merged and removed it, or after a fork.
+        """
+        pid = os.getpid()
+        if self._journal_pid != pid:
+            self._journal = None  # Inherited from the parent process
+            self._journal_pid = pid
+            self.journal_path = self.index_path / f"journal.{pid}.{uuid.uuid4().hex[:8]}.jsonl"
+        elif self._journal is not None and os.fstat(self._journal.fileno()).st_nlink == 0:
+            self._journal.close()
+            self._journal = None
+        if self._journal is None:
+            self._journal = self.journal_path.open("a", encoding="utf-8")
+        return self._journal
+
+    @timed(vector_duration, operation="search")
+    def search(
+        self,
+        query: str,
+        k: int = 4,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        The ``k`` documents nearest to ``query``. ``nprobe`` (IVF indexes) and
+        ``ef_search`` (HNSW) override the index defaults for this query only,
+        trading latency for recall.
+        """
+        return self.search_many([query], k, nprobe, ef_search)[0]
+
+    @timed(vector_duration, operation="search_many")
+    def search_many(
+        self,
+        queries: Sequence[str],
+        k: int = 4,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        ``search`` for several queries at once: one embeddings call for all of
+        them and one matrix search against the index, which FAISS runs with
+        BLAS over the whole batch. Returns one result list per query, in order.
+        """
+        recent = self.recent  # The snapshot this search works on
+        if recent is None:
+            logger.error("Cannot perform search. FAISS database is not initialized.")
+            return [[] for _ in queries]
+        if not queries:
+            return []
+
+        try:
+            logger.debug("Performing search for %d queries", len(queries))
+            vectors = np.asarray(self.embeddings.embed_documents(list(queries)), dtype="float32")
+            if recent.base._normalize_L2:
+                faiss.normalize_L2(vectors)
+            params = search_parameters(recent.base.index, nprobe, ef_search)
+            _, positions = recent.search(vectors, k, params)
+            results = [
+                [recent.document_at(position) for position in row if position != -1]
+                for row in positions
+            ]
+            logger.debug("Search completed. Found %d results.", sum(map(len, results)))
+            contents = stored_contents(res for row in results for res in row)
+            return [
+                [
+                    {
+                        "content": res.page_content or contents.get(res.metadata.get("content_hash"), ""),
+                        "metadata": res.metadata,
+                    }
+                    for res in row
+                ]
+                for row in results
+            ]
+        except Exception:
+            logger.exception("Search failed")
+            raise
+
+    @contextmanager
+    def flushes_deferred(self) -> Iterator[None]:
+        """
+        Suspend the automatic flushes (by size and by interval) while the
+        block runs, e.g. a bulk load, and flush once at its end. Each flush
+        writes the whole index, so flushing every ``flush_every`` documents
+        of a large load costs O(N^2) writes; the additions stay journaled
+        meanwhile.
+        """
+        with self._thread_lock:
+            self._deferred += 1
+        try:
+            yield
+        finally:
+            with self._thread_lock:
+                self._deferred -= 1
+            self.flush()
+
+    @timed(vector_duration, operation="flush")
+    def flush(self) -> None:
+        """
+        Write the index to disk together with the additions journaled by
+        every process, then remove the journals.
+        """
+        with self.write_lock:
+            if not self.pending or self.db is None:
+                return
+            pending = self.pending
+            with self.locked(exclusive=True):
+                self._save_merged()
+            logger.info("Saved the FAISS index with %d new documents.", pending)
+
+    @timed(vector_duration, operation="rebuild")
+    def rebuild(
+        self,
+        documents: Iterable[Tuple[str, Dict[str, Any], str]],
+        batch_size: Optional[int] = None,
+        index_type: str = VECTOR_INDEX_TYPE,
+        **index_options: Any,
+    ) -> int:
+        """
+        Replace the index with one built from ``(content, metadata, id)``
+        triples, embedded ``batch_size`` at a time through ``self.embeddings``
+        (so texts already in the embedding cache cost no provider call), of
+        type ``index_type`` (see ``faiss_indexes.build_index``).
+        Writers wait until the new index is saved and published; searches keep
+        using the current one meanwhile. Returns the number of documents; with
+        none, the current index is kept.
+        """
+        batch_size = batch_size or self.batch_size
+        with self.write_lock:
+            db: Optional[FAISS] = None
+            count = 0
+            for batch in batched(documents, batch_size):
+                texts, metadatas, ids = (list(column) for column in zip(*batch))
+                pairs = list(zip(texts, self.embeddings.embed_documents(texts)))
+                if db is None:
+                    db = FAISS.from_embeddings(
+                        pairs, self.embeddings, metadatas=metadatas, ids=ids
+                    )
+                else:
+                    db.add_embeddings(pairs, metadatas=metadatas, ids=ids)
+                count += len(ids)
+            if db is None:
+                return 0
+            if index_type != "flat":
+                db = copy_snapshot(db, build_index(db.index, index_type, **index_options))
+            self._replace(db)
+        logger.info("Rebuilt the FAISS index with %d documents.", count)
+        return count
+
+    @timed(vector_duration, operation="convert")
+    def convert(self, index_type: str, **index_options: Any) -> None:
+        """
+        Replace the index with an ``index_type`` one holding the same vectors
+        and documents (e.g. to move a flat index to IVF or HNSW), trained on
+        a sample of them. Searches keep using the current index meanwhile.
+        """
+        if self.db is None:
+            logger.error("Cannot convert. FAISS database is not initialized.")
+            return
+        with self.write_lock:
+            db = self.recent.merged()
+            index = build_index(db.index, index_type, **index_options)
+            self._replace(copy_snapshot(db, index))
+
+    def _replace(self, db: FAISS) -> None:
+        """Save ``db`` as the whole index and publish it (caller holds ``write_lock``)."""
+        with self.locked(exclusive=True):
+            self._save_merged(db)
+
+    def _save_merged(self, db: Optional[FAISS] = None) -> None:
+        """
+        Save ``db`` (by default the current index) with every journal merged
+        in, publish it and remove the journals. The caller holds
+        ``write_lock`` and the exclusive directory lock.
+
+        Every process journals its additions before publishing them, and a
+        save merges all journals before removing them, so the files on disk
+        plus the journals hold every addition. The current index stands in
+        for the files only if no other process saved since it was read.
+        """
+        if db is None:
+            if self.saved_generation() == self.generation:
+                db = self.recent.merged()
+            else:
+                db = self.load()
+                configure_search(db.index)
+        db, _ = self.merge_journals(db)
+        self.save(db)
+        self.generation = self.saved_generation() + 1
+        write_atomic(
+            self.index_path / GENERATION_NAME,
+            lambda file: file.write(str(self.generation).encode("ascii")),
+        )
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        for path in self.index_path.glob(JOURNAL_PATTERN):
+            path.unlink(missing_ok=True)
+        self.pending = 0
+        self._publish(db)
+
+    def close(self) -> None:
+        """Flush and stop the background thread."""
+        self._closed = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+        with self.write_lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+
+    def _ensure_flusher(self) -> None:
+        if self._thread is not None or self._closed:
+            return
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="faiss-flusher", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if self._deferred:
+                continue
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to save the FAISS index; will retry")
+
+
+# The index is loaded on first use (or by the warm-up in RagAppConfig.ready).
+faiss_manager_provider: LazyProvider[FAISSManager] = LazyProvider(
+    "faiss", lambda: FAISSManager(INDEX_PATH)
+)
+
+
+def get_faiss_manager() -> FAISSManager:
+    return faiss_manager_provider.get()
+
 
+@atexit.register
+def flush_at_exit() -> None:
+    # Do not leave the last additions only in the journal on a clean shutdown.
+    if not faiss_manager_provider.ready:
+        return
+    try:
+        get_faiss_manager().flush()
+    except Exception:
+        logger.exception("Failed to save the FAISS index at exit")
 
-faiss_manager = FAISSManager(INDEX_PATH)
 
 if __name__ == "__main__":
     # Display the current directory using Pathlib
     current_directory = Path.cwd()
-    logging.info("Current directory: %s", current_directory)
+    logger.info("Current directory: %s", current_directory)
 
     faiss_manager = FAISSManager(INDEX_PATH)
 
@@ -96,4 +856,4 @@ if __name__ == "__main__":
 
     # Example: search
     results = faiss_manager.search("test")
-    logging.info("Search results: %s", results)
+    logger.info("Search results: %s", results)
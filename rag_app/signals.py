@@ -0,0 +1,25 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Document, DocumentChange
+from .services.lexical_index import sync_if_loaded
+
+
+# Every process applies DocumentChange rows to its lexical index (this one
+# right after the commit, the others on their next sync). Bulk writes
+# (bulk_create, update, queryset delete) send no signals: the ingest pipeline
+# logs its rows itself, and anything else needs manage.py rebuild_lexical_index.
+def record_change(document_id: int) -> None:
+    DocumentChange.objects.create(document_id=document_id)
+    transaction.on_commit(sync_if_loaded)
+
+
+@receiver(post_save, sender=Document)
+def document_saved(sender, instance, **kwargs):
+    record_change(instance.pk)
+
+
+@receiver(post_delete, sender=Document)
+def document_deleted(sender, instance, **kwargs):
+    record_change(instance.pk)
@@ -1,3 +1,956 @@
-from django.test import TestCase
+import csv
+import io
+import ipaddress
+import json
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import ValidationError
+from django.core.cache import cache
+from django.core.management import call_command
+from django.utils import timezone
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
+from langgraph.checkpoint.base import copy_checkpoint, empty_checkpoint, get_checkpoint_id
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework.throttling import ScopedRateThrottle
+
+from .models import (
+    Document,
+    ExportCheckpoint,
+    FormAnswer,
+    FormCompletion,
+    GraphCheckpoint,
+    GraphCheckpointBlob,
+    GraphCheckpointWrite,
+)
+from .fields import HEADER, pack_vector, unpack_vector
+from .search import reciprocal_rank_fusion
+from .services import metrics
+from .services.answer_store import AnswerStore
+from .services.checkpointer import DjangoCheckpointSaver
+from .services.embedding_cache import CachedEmbeddings
+from .services.fake_llm import FakeEmbeddings
+from .services import cifava_chat_service
+from .services.cifava_chat_service import AnsweredQuestion, AnsweredQuestions
+from .services.form_export import export_lines
+from .services.ingestion import TokenChunker, iter_chunks
+from .services.lexical_index import INDEX_NAME, LexicalIndex
+from .services.option_matcher import match_option
+from .services.mapped_docstore import DOCSTORE_OFFSETS, MappedDocstore
+from .services.vector_service import INDEX_PICKLE, FAISSManager
+from .services.questions import QUESTION_CATALOG, QUESTION_INDEX
+from .views import (
+    SEARCH_MANY_MAX_QUERIES,
+    HybridSearchAPIView,
+    SearchManyAPIView,
+    completed_forms_export,
+    metrics_view,
+)
+
+
+def words(count, start=0):
+    return [f"w{n} " for n in range(start, start + count)]
+
+
+class TokenChunkerTests(SimpleTestCase):
+    def setUp(self):
+        # Whitespace-delimited words instead of tiktoken (no download).
+        patcher = mock.patch("rag_app.services.ingestion.get_encoding", return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def chunks(self, pieces, size=4, overlap=1):
+        return [chunk.split() for chunk in TokenChunker(size, overlap).chunks(pieces)]
+
+    def test_chunks_overlap_by_the_last_tokens(self):
+        self.assertEqual(
+            self.chunks(["".join(words(10))]),
+            [["w0", "w1", "w2", "w3"], ["w3", "w4", "w5", "w6"], ["w6", "w7", "w8", "w9"]],
+        )
+
+    def test_no_chunk_made_only_of_overlap(self):
+        self.assertEqual(self.chunks(["".join(words(4))]), [["w0", "w1", "w2", "w3"]])
+
+    def test_short_tail_is_emitted_with_its_overlap(self):
+        self.assertEqual(self.chunks(["".join(words(11))])[-1], ["w9", "w10"])
+
+    def test_text_shorter_than_a_chunk(self):
+        self.assertEqual(self.chunks(["".join(words(2))]), [["w0", "w1"]])
+        self.assertEqual(self.chunks([]), [])
+        self.assertEqual(self.chunks(["   "]), [])
+
+    def test_pieces_are_joined_across_boundaries(self):
+        pieces = ["".join(words(3)), "".join(words(5, start=3)), "".join(words(2, start=8))]
+        self.assertEqual(self.chunks(pieces), self.chunks(["".join(words(10))]))
+
+    def test_without_overlap(self):
+        self.assertEqual(
+            self.chunks(["".join(words(6))], size=3, overlap=0),
+            [["w0", "w1", "w2"], ["w3", "w4", "w5"]],
+        )
+
+    def test_overlap_must_be_smaller_than_the_size(self):
+        with self.assertRaises(ValueError):
+            TokenChunker(4, 4)
+
+
+class IterChunksTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch("rag_app.services.ingestion.get_encoding", return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        with (self.root / "a.jsonl").open("w", encoding="utf-8") as file:
+            for n in range(1, 4):
+                content = "".join(words(6 if n == 2 else 2, start=n * 10))
+                file.write(json.dumps({"title": f"r{n}", "content": content}) + "\n")
+        (self.root / "b.txt").write_text("uno dos", encoding="utf-8")
+        self.chunker = TokenChunker(4, 1)
+
+    def positions(self, resume=None):
+        return [
+            (Path(chunk.source).name, chunk.record, chunk.last, chunk.title)
+            for chunk in iter_chunks([str(self.root)], self.chunker, resume)
+        ]
+
+    def test_records_in_order_with_their_last_chunk_marked(self):
+        self.assertEqual(
+            self.positions(),
+            [
+                ("a.jsonl", 1, True, "r1"),
+                ("a.jsonl", 2, False, "r2"),
+                ("a.jsonl", 2, True, "r2 (2)"),
+                ("a.jsonl", 3, True, "r3"),
+                ("b.txt", 1, True, "b.txt"),
+            ],
+        )
+
+    def test_resume_skips_the_records_already_ingested(self):
+        source = str(self.root / "a.jsonl")
+        self.assertEqual(
+            self.positions((source, 2)),
+            [("a.jsonl", 3, True, "r3"), ("b.txt", 1, True, "b.txt")],
+        )
+        self.assertEqual(self.positions((source, 3)), [("b.txt", 1, True, "b.txt")])
+
+    def test_resume_from_a_missing_source_reads_everything(self):
+        self.assertEqual(
+            self.positions((str(self.root / "gone.jsonl"), 2)), self.positions()
+        )
+
+    def test_chunks_carry_the_hash_of_their_text(self):
+        chunk = next(iter_chunks([str(self.root / "b.txt")], self.chunker))
+        self.assertEqual(chunk.text, "uno dos")
+        self.assertEqual(len(chunk.content_hash), 64)
+
+
+class VectorFieldTests(TestCase):
+    def test_pack_round_trip(self):
+        data = pack_vector([0.5, -1.0, 2.25])
+        self.assertEqual(len(data), HEADER.size + 3 * 4)
+        vector = unpack_vector(data)
+        self.assertEqual(vector.dtype, np.dtype("<f4"))
+        np.testing.assert_array_equal(vector, [0.5, -1.0, 2.25])
+
+    def test_invalid_vectors_are_rejected(self):
+        with self.assertRaises(ValueError):
+            pack_vector([[1.0, 2.0]])
+        with self.assertRaises(ValueError):
+            unpack_vector(b"XX\x01\x00\x01\x00\x00\x00\x00\x00\x80\x3f")
+        field = Document._meta.get_field("embedding")
+        with self.assertRaises(ValidationError):
+            field.to_python(b"VF")
+
+    def test_database_round_trip(self):
+        Document.objects.create(title="a", content="a", embedding=[0.1, 0.2, 0.3])
+        Document.objects.create(title="b", content="b", embedding=None)
+        stored = dict(Document.objects.values_list("title", "embedding"))
+        self.assertIsInstance(stored["a"], np.ndarray)
+        np.testing.assert_allclose(stored["a"], [0.1, 0.2, 0.3], rtol=1e-6)
+        self.assertIsNone(stored["b"])
+
+    def test_serialization_round_trip(self):
+        field = Document._meta.get_field("embedding")
+        document = Document(title="a", content="a", embedding=np.arange(4, dtype="<f4"))
+        text = field.value_to_string(document)
+        np.testing.assert_array_equal(field.to_python(text), [0, 1, 2, 3])
+        self.assertEqual(field.value_to_string(Document(title="b", content="b")), "")
+
+
+class CachedEmbeddingsTests(SimpleTestCase):
+    def setUp(self):
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        self.path = Path(directory) / "cache.sqlite3"
+        self.fake = FakeEmbeddings(size=8)
+        self.cached = CachedEmbeddings(self.fake, path=self.path)
+
+    def test_only_missing_texts_reach_the_provider(self):
+        first = self.cached.embed_documents(["a", "b", "a"])
+        self.assertEqual(self.fake.calls, 1)
+        np.testing.assert_allclose(first[0], first[2])
+
+        with mock.patch.object(self.fake, "embed_documents", wraps=self.fake.embed_documents) as embed:
+            second = self.cached.embed_documents(["b", "c", "a"])
+        embed.assert_called_once_with(["c"])
+        np.testing.assert_allclose(second, [first[1], self.fake.embed_text("c"), first[0]], rtol=1e-6)
+        self.assertEqual(self.cached.stats()["hits"], 3)
+
+    def test_vectors_are_shared_across_instances_of_the_same_model(self):
+        vector = self.cached.embed_query("hola")
+        other = CachedEmbeddings(FakeEmbeddings(size=8), path=self.path)
+        np.testing.assert_allclose(other.embed_query("hola"), vector)
+        self.assertEqual(other.underlying.calls, 0)
+
+        resized = CachedEmbeddings(FakeEmbeddings(size=4), path=self.path)
+        self.assertEqual(len(resized.embed_query("hola")), 4)
+        self.assertEqual(resized.underlying.calls, 1)
+
+    def test_a_broken_cache_falls_back_to_the_provider(self):
+        self.cached.path = str(Path(self.path.parent) / "missing" / "cache.sqlite3")
+        with self.assertLogs("rag_app.services.embedding_cache", "ERROR"):
+            vectors = self.cached.embed_documents(["a"])
+        self.assertEqual(len(vectors[0]), 8)
+        self.assertEqual(self.fake.calls, 1)
+
+
+class FAISSManagerMixin:
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name)
+
+    def manager(self, **kwargs):
+        """A manager over the test directory; stopped (not flushed) at cleanup, like a crash."""
+        manager = FAISSManager(
+            self.path, embeddings=FakeEmbeddings(size=8), flush_interval=3600, **kwargs
+        )
+        self.addCleanup(self.stop, manager)
+        return manager
+
+    def stop(self, manager):
+        manager._closed = True
+        manager._wake.set()
+        if manager._thread is not None:
+            manager._thread.join()
+
+    def contents(self, results):
+        return [result["content"] for result in results]
+
+
+class FAISSManagerTests(FAISSManagerMixin, SimpleTestCase):
+    def test_additions_are_searchable_before_a_flush(self):
+        manager = self.manager()
+        snapshot = manager.db
+        manager.add_documents(["alpha", "beta"], [{"n": 1}, {"n": 2}])
+
+        self.assertIs(manager.db, snapshot)  # The index is not copied
+        self.assertEqual(snapshot.index.ntotal, 1)
+        self.assertEqual(len(manager.recent), 2)
+        results = manager.search("beta", k=1)
+        self.assertEqual(self.contents(results), ["beta"])
+        self.assertEqual(results[0]["metadata"], {"n": 2})
+
+    def test_flush_publishes_a_merged_snapshot(self):
+        manager = self.manager()
+        manager.add_documents(["alpha", "beta"])
+        old = manager.recent
+        manager.flush()
+
+        self.assertEqual(manager.db.index.ntotal, 3)
+        self.assertEqual(len(manager.recent), 0)
+        self.assertEqual(self.contents(manager.search("alpha", k=1)), ["alpha"])
+        # Readers still holding the previous snapshot keep seeing the same documents.
+        self.assertEqual(old.base.index.ntotal, 1)
+        self.assertEqual(len(old), 2)
+
+    def test_recent_search_matches_the_merged_index(self):
+        manager = self.manager()
+        manager.add_documents([f"texto {number}" for number in range(10)], batch_size=3)
+        recent = manager.recent
+        queries = np.asarray(
+            manager.embeddings.embed_documents(["texto 3", "otra cosa"]), dtype="float32"
+        )
+        distances, positions = recent.search(queries, 5)
+        expected_distances, expected_positions = recent.merged().index.search(queries, 5)
+        np.testing.assert_array_equal(positions, expected_positions)
+        np.testing.assert_allclose(distances, expected_distances, rtol=1e-5)
+        self.assertEqual(recent.document_at(positions[0][0]).page_content, "texto 3")
+
+    def test_known_ids_are_skipped(self):
+        manager = self.manager()
+        vectors = manager.embeddings.embed_documents(["a", "b"])
+        self.assertEqual(manager.add_embeddings(["a", "b"], vectors, [{}, {}], ["1", "2"]), ["1", "2"])
+        self.assertEqual(manager.add_embeddings(["b"], vectors[1:], [{}], ["2"]), [])
+        self.assertEqual(len(manager.recent), 2)
+
+
+class FAISSJournalTests(FAISSManagerMixin, SimpleTestCase):
+    def test_unsaved_additions_are_replayed_on_restart(self):
+        self.manager().add_documents(["alpha", "beta"])
+        self.assertEqual(len(list(self.path.glob("journal*.jsonl"))), 1)
+
+        restarted = self.manager()
+        self.assertEqual(restarted.pending, 2)
+        self.assertEqual(restarted.db.index.ntotal, 3)
+        self.assertEqual(restarted.embeddings.calls, 0)  # Vectors come from the journal
+        self.assertEqual(self.contents(restarted.search("beta", k=1)), ["beta"])
+
+    def test_a_torn_last_line_is_ignored(self):
+        self.manager().add_documents(["alpha"])
+        journal = next(self.path.glob("journal*.jsonl"))
+        with journal.open("a", encoding="utf-8") as file:
+            file.write('{"id": "torn", "text": "be')
+        self.assertEqual(self.manager().db.index.ntotal, 2)
+
+    def test_flush_merges_every_journal_and_removes_them(self):
+        first, second = self.manager(), self.manager()
+        first.add_documents(["alpha"])
+        second.add_documents(["beta"])
+        second.flush()
+
+        self.assertEqual(list(self.path.glob("journal*.jsonl")), [])
+        restarted = self.manager()
+        self.assertEqual(restarted.pending, 0)
+        self.assertEqual(restarted.db.index.ntotal, 3)
+        self.assertEqual(self.contents(restarted.search("alpha", k=1)), ["alpha"])
+
+        # The other process saves on top of the files, not of its older snapshot.
+        first.add_documents(["gamma"])
+        first.flush()
+        self.assertEqual(self.manager().db.index.ntotal, 4)
+
+
+class FAISSMappedLoadTests(FAISSManagerMixin, SimpleTestCase):
+    def test_mapped_index_searches_and_takes_additions(self):
+        saved = self.manager(load_mode="mmap")
+        saved.add_documents(["alpha", "beta"], [{"n": 1}, {"n": 2}])
+        saved.flush()
+        self.assertFalse((self.path / INDEX_PICKLE).exists())
+
+        mapped = self.manager(load_mode="mmap")
+        self.assertIsInstance(mapped.db.docstore, MappedDocstore)
+        self.assertEqual(mapped.pending, 0)
+        results = mapped.search("beta", k=1)
+        self.assertEqual(self.contents(results), ["beta"])
+        self.assertEqual(results[0]["metadata"], {"n": 2})
+
+        mapped.add_documents(["gamma"])
+        self.assertEqual(self.contents(mapped.search("gamma", k=1)), ["gamma"])
+        mapped.flush()
+        self.assertEqual(self.manager(load_mode="mmap").db.index.ntotal, 4)
+
+    def test_heap_saved_index_is_loaded_whole_and_rewritten(self):
+        saved = self.manager(load_mode="heap")
+        saved.add_documents(["alpha"])
+        saved.flush()
+
+        with self.assertLogs("rag_app.services.vector_service", "WARNING"):
+            manager = self.manager(load_mode="mmap")
+        self.assertNotIsInstance(manager.db.docstore, MappedDocstore)
+        self.assertEqual(manager.pending, 1)  # Scheduled to write the mapped files
+
+        manager.flush()
+        self.assertTrue((self.path / DOCSTORE_OFFSETS).exists())
+        self.assertIsInstance(self.manager(load_mode="mmap").db.docstore, MappedDocstore)
+        # And back: a heap process reads the mapped files whole and writes the pickle.
+        heap = self.manager(load_mode="heap")
+        self.assertNotIsInstance(heap.db.docstore, MappedDocstore)
+        self.assertEqual(self.contents(heap.search("alpha", k=1)), ["alpha"])
+        heap.flush()
+        self.assertTrue((self.path / INDEX_PICKLE).exists())
+        self.assertFalse((self.path / DOCSTORE_OFFSETS).exists())
+
+
+class ReciprocalRankFusionTests(SimpleTestCase):
+    def test_scores_add_up_across_rankings(self):
+        fused = reciprocal_rank_fusion({"lexical": ["a", "b"], "vector": ["b", "c"]}, k=60)
+        self.assertEqual([key for key, _, _ in fused], ["b", "a", "c"])
+        self.assertAlmostEqual(fused[0][1], 1 / 62 + 1 / 61)
+        self.assertEqual(fused[0][2], {"lexical": 2, "vector": 1})
+        self.assertEqual(fused[2][2], {"vector": 2})
+
+    def test_only_the_first_appearance_in_a_ranking_counts(self):
+        fused = dict((key, (score, ranks)) for key, score, ranks in
+                     reciprocal_rank_fusion({"lexical": ["a", "a", "b"]}, k=10))
+        self.assertAlmostEqual(fused["a"][0], 1 / 11)
+        self.assertEqual(fused["a"][1], {"lexical": 1})
+        self.assertEqual(fused["b"][1], {"lexical": 3})
+
+    def test_empty_rankings(self):
+        self.assertEqual(reciprocal_rank_fusion({"lexical": [], "vector": []}), [])
+
+
+class LexicalIndexTests(SimpleTestCase):
+    rows = [
+        (1, "Gatos", "El gato duerme en la casa"),
+        (2, "Perros", "El perro ladra al gato"),
+        (3, "Casa", "Una casa grande con jardín"),
+        (7, "Economía", "Política económica y empleo"),
+    ]
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name)
+
+    def build(self):
+        index = LexicalIndex(path=self.path, flush_interval=3600)
+        index.add_documents(self.rows)
+        return index
+
+    def test_search_ranks_by_bm25(self):
+        index = self.build()
+        self.assertEqual([doc_id for doc_id, _ in index.search("gato", k=4)], [1, 2])
+        self.assertEqual(index.search("economica")[0][0], 7)  # Accents folded
+        self.assertEqual(index.search("la de y"), [])  # Only stopwords
+
+    def test_buffered_and_merged_postings_search_the_same(self):
+        index = self.build()
+        before = index.search("casa gato", k=4)
+        index.save(force=True)
+        self.assertEqual(index.search("casa gato", k=4), before)
+
+    def test_replace_and_remove(self):
+        index = self.build()
+        index.save(force=True)
+        index.add_documents([(1, "Gatos", "Ya no hay nada aquí")])
+        index.remove_documents([3])
+        self.assertEqual(len(index), 3)
+        self.assertEqual([doc_id for doc_id, _ in index.search("gato casa", k=4)], [2])
+        index.save(force=True)
+        self.assertEqual([doc_id for doc_id, _ in index.search("gato casa", k=4)], [2])
+
+    def test_save_and_load_round_trip(self):
+        index = self.build()
+        index.save(force=True)
+        index.add_documents([(9, "Gatos", "gato gato gato")])  # Buffered, then merged
+        index.remove_documents([2])
+        index.save(force=True)
+        self.assertTrue((self.path / INDEX_NAME).exists())
+
+        loaded = LexicalIndex(path=self.path, flush_interval=3600)
+        self.assertEqual(len(loaded), len(index))
+        self.assertEqual(loaded.terms, index.terms)
+        # Postings are written gap-encoded; decoding restores the positions.
+        np.testing.assert_array_equal(loaded.offsets, index.offsets)
+        np.testing.assert_array_equal(loaded.postings, index.postings)
+        np.testing.assert_array_equal(loaded.freqs, index.freqs)
+        np.testing.assert_array_equal(loaded.ids, index.ids)
+        for query in ("gato", "casa grande", "perro", "empleo"):
+            self.assertEqual(loaded.search(query, k=5), index.search(query, k=5))
+
+    def test_empty_index_round_trip(self):
+        LexicalIndex(path=self.path).save(force=True)
+        loaded = LexicalIndex(path=self.path)
+        self.assertEqual(len(loaded), 0)
+        self.assertEqual(loaded.search("gato"), [])
+
+
+def question(key):
+    return QUESTION_CATALOG[QUESTION_INDEX[key]]
+
+
+class OptionMatcherTests(SimpleTestCase):
+    def test_yes_no(self):
+        self.assertEqual(match_option(question("FRP-15"), "Sí"), "Sí")
+        self.assertEqual(match_option(question("FRP-15"), "no, la verdad"), "No")
+        self.assertEqual(match_option(question("FRP-15"), "claro que sí"), "Sí")
+
+    def test_hedges_and_contradictions_go_to_the_model(self):
+        self.assertIsNone(match_option(question("FRP-15"), "no sé"))
+        self.assertIsNone(match_option(question("FRP-15"), "a veces sí"))
+        self.assertIsNone(match_option(question("FRP-15"), "sí y no"))
+
+    def test_long_answers_go_to_the_model(self):
+        message = "sí pero solo cuando mis amigos van y hay recreo largo"
+        self.assertIsNone(match_option(question("FRP-15"), message))
+
+    def test_longer_option_wins(self):
+        self.assertEqual(
+            match_option(question("FRP-14"), "sí me gusta pero no puedo dormir"),
+            "Sí me gusta pero no puedo dormir",
+        )
+
+    def test_several_options_in_catalog_order(self):
+        self.assertEqual(
+            match_option(question("EF-1"), "vivo con mis hermanos y mi mamá"),
+            "Mamá, Hermanos",
+        )
+
+    def test_typos_match_longer_words_only(self):
+        self.assertEqual(match_option(question("EF-1"), "con mi mamaa"), "Mamá")
+        self.assertIsNone(match_option(question("FRP-15"), "sy"))
+
+    def test_unknown_words_with_other_allowed_go_to_the_model(self):
+        self.assertIsNone(match_option(question("EF-1"), "con mi mamá y mi abuela"))
+
+    def test_open_questions_never_match(self):
+        self.assertIsNone(match_option(question("NOMBRE"), "sí"))
+
+
+class AnalyzeQuestionsTests(SimpleTestCase):
+    message = "Me llamo Ana, tengo 12 años"
+
+    def classify(self, *answers):
+        """Runs analyze_questions with a classifier returning ``answers``."""
+        model = mock.Mock()
+        model.with_structured_output.return_value = RunnableLambda(
+            lambda prompt: AnsweredQuestions(
+                answered_questions=[
+                    AnsweredQuestion(key=key, answer=answer) for key, answer in answers
+                ]
+            )
+        )
+        self.enterContext(cifava_chat_service.classifier_provider.override(model))
+        state = {
+            "messages": [AIMessage("¿Cómo te llamas?"), HumanMessage(self.message)],
+            "answers": {0: "Mujer"},
+            "next_question": 1,
+        }
+        return cifava_chat_service.analyze_questions(state)
+
+    def test_each_question_stores_its_own_answer(self):
+        state = self.classify(("NOMBRE", "Ana"), (" EDAD ", "12"))
+        self.assertEqual(state["answers"], {0: "Mujer", 1: "Ana", 2: "12"})
+        self.assertEqual(state["next_question"], 3)
+
+    def test_unknown_or_answered_keys_are_ignored(self):
+        state = self.classify(("GENERO", "Hombre"), ("OTRA", "x"), ("NOMBRE", "Ana"))
+        self.assertEqual(state["answers"], {0: "Mujer", 1: "Ana"})
+
+    def test_empty_answer_falls_back_to_the_message(self):
+        state = self.classify(("NOMBRE", " "))
+        self.assertEqual(state["answers"][1], self.message)
+
+    def test_nothing_answered(self):
+        state = self.classify()
+        self.assertEqual(state["answers"], {0: "Mujer"})
+        self.assertEqual(state["next_question"], 1)
+
+
+class SearchManyViewTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.manager = mock.Mock()
+        self.manager.search_many.side_effect = lambda queries, **kwargs: [[] for _ in queries]
+        self.enterContext(mock.patch("rag_app.views.get_faiss_manager", return_value=self.manager))
+
+    def search(self, queries, user=None):
+        request = APIRequestFactory().post(
+            "/search/many/", {"queries": queries}, format="json"
+        )
+        if user is not None:
+            force_authenticate(request, user=user)
+        return SearchManyAPIView.as_view()(request)
+
+    def user(self, pk=1):
+        return mock.Mock(pk=pk, is_authenticated=True)
+
+    def test_anonymous_requests_are_rejected(self):
+        self.assertEqual(self.search(["hola"]).status_code, 403)
+        self.manager.search_many.assert_not_called()
+
+    def test_batch_size_is_capped(self):
+        queries = ["hola"] * SEARCH_MANY_MAX_QUERIES
+        self.assertEqual(self.search(queries, self.user()).status_code, 200)
+        response = self.search(queries + ["hola"], self.user())
+        self.assertEqual(response.status_code, 400)
+        self.manager.search_many.assert_called_once()
+
+    def test_requests_are_throttled_per_user(self):
+        self.enterContext(
+            mock.patch.object(ScopedRateThrottle, "THROTTLE_RATES", {"search_many": "2/min"})
+        )
+        statuses = [self.search(["hola"], self.user()).status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+        self.assertEqual(self.search(["hola"], self.user(pk=2)).status_code, 200)
+
+
+class HybridSearchViewTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.hybrid_search = self.enterContext(
+            mock.patch("rag_app.views.hybrid_search", return_value=[])
+        )
+
+    def search(self, user=None):
+        request = APIRequestFactory().post("/search/hybrid/", {"query": "hola"}, format="json")
+        if user is not None:
+            force_authenticate(request, user=user)
+        return HybridSearchAPIView.as_view()(request)
+
+    def test_anonymous_requests_are_rejected(self):
+        self.assertEqual(self.search().status_code, 403)
+        self.hybrid_search.assert_not_called()
+
+    def test_requests_are_throttled_per_user(self):
+        self.enterContext(
+            mock.patch.object(ScopedRateThrottle, "THROTTLE_RATES", {"hybrid_search": "1/min"})
+        )
+        user = mock.Mock(pk=1, is_authenticated=True)
+        self.assertEqual(self.search(user).status_code, 200)
+        self.assertEqual(self.search(user).status_code, 429)
+        self.hybrid_search.assert_called_once_with("hola", k=4)
+
+
+class MetricsViewTests(SimpleTestCase):
+    def scrape(self, address, staff=False):
+        request = RequestFactory().get("/metrics", REMOTE_ADDR=address)
+        request.user = mock.Mock(is_staff=True) if staff else AnonymousUser()
+        return metrics_view(request)
+
+    def test_loopback_can_scrape(self):
+        response = self.scrape("127.0.0.1")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"# TYPE rag_http_request_duration_seconds histogram", response.content)
+
+    def test_other_clients_are_forbidden(self):
+        self.assertEqual(self.scrape("203.0.113.5").status_code, 403)
+        self.assertEqual(self.scrape("not-an-ip").status_code, 403)
+
+    def test_staff_can_scrape_from_anywhere(self):
+        self.assertEqual(self.scrape("203.0.113.5", staff=True).status_code, 200)
+
+    def test_allowed_networks(self):
+        networks = (ipaddress.ip_network("10.0.0.0/8"),)
+        with mock.patch.object(metrics, "ALLOWED_NETWORKS", networks):
+            self.assertTrue(metrics.scrape_allowed("10.1.2.3"))
+            self.assertFalse(metrics.scrape_allowed("127.0.0.1"))
+
+
+def conversation(turns):
+    messages = []
+    for turn in range(turns):
+        messages.append(HumanMessage(f"pregunta {turn}", id=f"h{turn}"))
+        messages.append(AIMessage(f"respuesta {turn}", id=f"a{turn}"))
+    return messages
+
+
+class CheckpointSaverMixin:
+    thread_id = "thread"
+
+    def setUp(self):
+        self.saver = DjangoCheckpointSaver(keep=0)
+
+    def root(self):
+        return {"configurable": {"thread_id": self.thread_id, "checkpoint_ns": ""}}
+
+    def step(self, config, values, step=0, saver=None):
+        """Save a checkpoint after ``config`` where the channels in ``values`` changed."""
+        saver = saver or self.saver
+        previous = saver.get_tuple(config) if get_checkpoint_id(config) else None
+        checkpoint = copy_checkpoint(previous.checkpoint) if previous else empty_checkpoint()
+        checkpoint["id"] = empty_checkpoint()["id"]
+        new_versions = {
+            channel: saver.get_next_version(checkpoint["channel_versions"].get(channel), None)
+            for channel in values
+        }
+        checkpoint["channel_versions"].update(new_versions)
+        checkpoint["channel_values"].update(values)
+        return saver.put(config, checkpoint, {"source": "loop", "step": step}, new_versions)
+
+    def blobs(self, channel):
+        blobs = GraphCheckpointBlob.objects.filter(thread_id=self.thread_id, channel=channel)
+        return blobs.order_by("version")
+
+
+class DjangoCheckpointSaverTests(CheckpointSaverMixin, TestCase):
+    def test_put_and_get_round_trip(self):
+        first = self.step(self.root(), {"messages": conversation(1), "answers": {"EDAD": "12"}})
+        second = self.step(first, {"answers": {"EDAD": "12", "GENERO": "F"}}, step=1)
+
+        saved = self.saver.get_tuple({"configurable": {"thread_id": self.thread_id}})
+        self.assertEqual(saved.config, second)
+        self.assertEqual(saved.parent_config, first)
+        self.assertEqual(saved.metadata["step"], 1)
+        self.assertEqual(
+            saved.checkpoint["channel_values"],
+            {"messages": conversation(1), "answers": {"EDAD": "12", "GENERO": "F"}},
+        )
+        # An older checkpoint still reads the values it had.
+        older = self.saver.get_tuple(first)
+        self.assertEqual(older.checkpoint["channel_values"]["answers"], {"EDAD": "12"})
+        self.assertIsNone(self.saver.get_tuple({"configurable": {"thread_id": "other"}}))
+
+    def test_appended_messages_store_only_the_new_items(self):
+        config = self.root()
+        for turns in range(1, 5):
+            config = self.step(config, {"messages": conversation(turns)}, step=turns)
+
+        blobs = list(self.blobs("messages"))
+        self.assertIsNone(blobs[0].base_version)
+        for previous, blob in zip(blobs, blobs[1:]):
+            self.assertEqual(blob.base_version, previous.version)
+            stored = self.saver.serde.loads_typed((blob.type, bytes(blob.blob)))
+            self.assertEqual(len(stored), 2)
+        saved = self.saver.get_tuple(config)
+        self.assertEqual(saved.checkpoint["channel_values"]["messages"], conversation(4))
+
+    def test_a_rewritten_list_is_stored_whole(self):
+        config = self.step(self.root(), {"messages": conversation(2)})
+        summarized = conversation(3)[2:]  # Older turns dropped
+        config = self.step(config, {"messages": summarized}, step=1)
+        self.assertIsNone(self.blobs("messages").last().base_version)
+        self.assertEqual(
+            self.saver.get_tuple(config).checkpoint["channel_values"]["messages"], summarized
+        )
+
+    def test_old_checkpoints_and_their_blobs_are_pruned(self):
+        saver = DjangoCheckpointSaver(keep=2)
+        config = self.root()
+        for turn in range(1, 9):
+            config = self.step(
+                config, {"messages": conversation(turn), "answers": {"turn": turn}}, turn, saver
+            )
+            saver.put_writes(config, [("answers", {"turn": turn})], task_id=f"task{turn}")
+
+        checkpoints = GraphCheckpoint.objects.filter(thread_id=self.thread_id)
+        self.assertLessEqual(checkpoints.count(), 4)
+        kept = set(checkpoints.values_list("checkpoint_id", flat=True))
+        self.assertEqual(
+            set(GraphCheckpointWrite.objects.values_list("checkpoint_id", flat=True)), kept
+        )
+        self.assertEqual(self.blobs("answers").count(), len(kept))
+        saved = saver.get_tuple(config)
+        self.assertEqual(saved.checkpoint["channel_values"]["messages"], conversation(8))
+        self.assertEqual(saved.checkpoint["channel_values"]["answers"], {"turn": 8})
+
+    def test_put_writes(self):
+        config = self.step(self.root(), {"messages": conversation(1)})
+        self.saver.put_writes(config, [("messages", "b"), ("answers", 1)], task_id="t2")
+        self.saver.put_writes(config, [("messages", "a")], task_id="t1")
+        # Repeated regular writes are ignored; errors replace the previous one.
+        self.saver.put_writes(config, [("messages", "ignored")], task_id="t1")
+        self.saver.put_writes(config, [("__error__", "first")], task_id="t1")
+        self.saver.put_writes(config, [("__error__", "second")], task_id="t1")
+
+        self.assertEqual(
+            self.saver.get_tuple(config).pending_writes,
+            [
+                ("t1", "__error__", "second"),
+                ("t1", "messages", "a"),
+                ("t2", "messages", "b"),
+                ("t2", "answers", 1),
+            ],
+        )
+
+    def test_list(self):
+        configs = [self.root()]
+        for step in range(4):
+            configs.append(self.step(configs[-1], {"answers": {"step": step}}, step=step))
+        self.step({"configurable": {"thread_id": "other", "checkpoint_ns": ""}}, {"answers": {}})
+
+        listed = list(self.saver.list(self.root()))
+        self.assertEqual([item.config for item in listed], configs[:0:-1])
+        self.assertEqual(
+            [item.metadata["step"] for item in self.saver.list(self.root(), filter={"step": 2})], [2]
+        )
+        self.assertEqual(
+            [item.config for item in self.saver.list(self.root(), before=configs[3], limit=1)],
+            [configs[2]],
+        )
+        self.assertEqual(len(list(self.saver.list(None))), 5)
+
+    def test_delete_thread(self):
+        config = self.step(self.root(), {"messages": conversation(1)})
+        self.saver.put_writes(config, [("answers", 1)], task_id="t")
+        self.saver.delete_thread(self.thread_id)
+        self.assertIsNone(self.saver.get_tuple(self.root()))
+        self.assertFalse(GraphCheckpointBlob.objects.exists())
+        self.assertFalse(GraphCheckpointWrite.objects.exists())
+
+
+class AsyncDjangoCheckpointSaverTests(CheckpointSaverMixin, TransactionTestCase):
+    # The async methods use their own connections in worker threads, which
+    # cannot see the uncommitted transaction of a TestCase.
+
+    async def test_async_variants(self):
+        checkpoint = empty_checkpoint()
+        checkpoint["channel_versions"] = {"messages": "1"}
+        checkpoint["channel_values"] = {"messages": conversation(1)}
+        config = await self.saver.aput(self.root(), checkpoint, {"step": 0}, {"messages": "1"})
+        await self.saver.aput_writes(config, [("answers", {"EDAD": "12"})], task_id="t")
+
+        saved = await self.saver.aget_tuple(config)
+        self.assertEqual(saved.checkpoint["channel_values"]["messages"], conversation(1))
+        self.assertEqual(saved.pending_writes, [("t", "answers", {"EDAD": "12"})])
+        self.assertEqual([item.config async for item in self.saver.alist(self.root())], [config])
+
+        await self.saver.adelete_thread(self.thread_id)
+        self.assertIsNone(await self.saver.aget_tuple(config))
+
+
+class AnswerStoreTests(TestCase):
+    def setUp(self):
+        # Flushes are explicit here: no background thread.
+        self.store = AnswerStore(batch_size=3)
+        self.enterContext(mock.patch.object(self.store, "_ensure_flusher"))
+
+    def test_answers_are_buffered_until_flushed(self):
+        self.store.store_answer("f1", "NOMBRE", "¿Nombre?", "Ana")
+        self.assertFalse(FormAnswer.objects.exists())
+        self.assertEqual(self.store.get_stored_answer("f1", "NOMBRE"), "Ana")
+        self.assertEqual(self.store.get_form_answers("f1"), {"NOMBRE": "Ana"})
+
+        self.store.flush()
+        self.assertEqual(
+            list(FormAnswer.objects.values_list("form_id", "question_key", "answer")),
+            [("f1", "NOMBRE", "Ana")],
+        )
+        self.assertEqual(self.store.get_stored_answer("f1", "NOMBRE"), "Ana")
+
+    def test_newer_answers_replace_pending_and_stored_ones(self):
+        self.store.store_answer("f1", "NOMBRE", "¿Nombre?", "Ana")
+        self.store.flush()
+        self.store.store_answer("f1", "NOMBRE", "¿Nombre?", "Eva")
+        self.store.store_answer("f1", "NOMBRE", "¿Nombre?", "Sara")
+        self.store.store_answer("f1", "EDAD", "¿Edad?", "12")
+        self.assertEqual(self.store.get_form_answers("f1"), {"NOMBRE": "Sara", "EDAD": "12"})
+
+        self.store.flush()
+        self.assertEqual(
+            dict(FormAnswer.objects.values_list("question_key", "answer")),
+            {"NOMBRE": "Sara", "EDAD": "12"},
+        )
+
+    def test_a_full_batch_wakes_the_flusher(self):
+        for key in ("A", "B"):
+            self.store.store_answer("f1", key, "?", "x")
+        self.assertFalse(self.store._wake.is_set())
+        self.store.store_answer("f1", "C", "?", "x")
+        self.assertTrue(self.store._wake.is_set())
+
+    def test_failed_flush_keeps_the_answers(self):
+        self.store.store_answer("f1", "NOMBRE", "¿Nombre?", "Ana")
+        self.store.mark_completed("f1")
+        with mock.patch.object(
+            FormAnswer.objects, "bulk_create", side_effect=RuntimeError("db down")
+        ):
+            with self.assertRaises(RuntimeError):
+                self.store.flush()
+        self.assertEqual(self.store.get_stored_answer("f1", "NOMBRE"), "Ana")
+
+        self.store.flush()
+        self.assertTrue(FormAnswer.objects.filter(form_id="f1").exists())
+        self.assertTrue(FormCompletion.objects.filter(form_id="f1").exists())
+
+
+class FormExportTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch("rag_app.services.form_export.EXPORT_SETTLE_SECONDS", 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.key = QUESTION_CATALOG[0].key
+
+    def complete(self, form_id, answer="sí"):
+        FormAnswer.objects.update_or_create(
+            form_id=form_id,
+            question_key=self.key,
+            defaults={"question": "?", "answer": answer, "answered_at": timezone.now()},
+        )
+        return FormCompletion.objects.create(form_id=form_id, completed_at=timezone.now()).pk
+
+    def rows(self, **kwargs):
+        return [json.loads(line) for line in "".join(export_lines("jsonl", **kwargs)).splitlines()]
+
+    def test_rows_carry_their_answers_and_cursor(self):
+        first = self.complete("f1", "uno")
+        second = self.complete("f2", "dos")
+        rows = self.rows()
+        self.assertEqual([row["form_id"] for row in rows], ["f1", "f2"])
+        self.assertEqual([row["cursor"] for row in rows], [str(first), str(second)])
+        self.assertEqual(rows[0][self.key], "uno")
+
+    def test_resume_after_a_cursor(self):
+        first = self.complete("f1")
+        self.complete("f2")
+        self.complete("f1", "otra vez")  # Completed again: exported again
+        self.assertEqual([row["form_id"] for row in self.rows(after=first)], ["f2", "f1"])
+
+        cursors = []
+        self.rows(chunk_size=2, on_chunk=cursors.append)
+        self.assertEqual(len(cursors), 2)
+        self.assertEqual(self.rows(after=cursors[-1]), [])
+
+    def test_recent_completions_and_the_ones_after_them_wait(self):
+        old = timezone.now() - timedelta(minutes=5)
+        first = self.complete("f1")
+        recent = self.complete("f2")
+        last = self.complete("f3")
+        FormCompletion.objects.filter(pk__in=[first, last]).update(recorded_at=old)
+        with mock.patch("rag_app.services.form_export.EXPORT_SETTLE_SECONDS", 30):
+            self.assertEqual([row["form_id"] for row in self.rows()], ["f1"])
+            FormCompletion.objects.filter(pk=recent).update(recorded_at=old)
+            self.assertEqual([row["form_id"] for row in self.rows()], ["f1", "f2", "f3"])
+
+    def download(self, query, staff=True):
+        request = RequestFactory().get("/iav/cifava/forms/export", query)
+        request.user = mock.Mock(is_staff=staff)
+        return completed_forms_export(request)
+
+    def test_view_resumes_from_the_client_cursor(self):
+        first = self.complete("f1")
+        self.complete("f2")
+        response = self.download({"format": "csv", "after": first})
+        table = list(csv.DictReader(io.StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual([row["form_id"] for row in table], ["f2"])
+        self.assertFalse(ExportCheckpoint.objects.exists())
+
+    def test_view_rejects_bad_requests(self):
+        self.assertEqual(self.download({"after": "x"}).status_code, 400)
+        self.assertEqual(self.download({"format": "xml"}).status_code, 400)
+        self.assertEqual(self.download({}, staff=False).status_code, 403)
+
+    def test_command_appends_from_its_checkpoint(self):
+        self.complete("f1")
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "forms.csv"
+            call_command("export_forms", checkpoint="nightly", output=str(path), stderr=io.StringIO())
+            self.complete("f2")
+            call_command("export_forms", checkpoint="nightly", output=str(path), stderr=io.StringIO())
+            table = list(csv.DictReader(path.open(encoding="utf-8")))
+        self.assertEqual([row["form_id"] for row in table], ["f1", "f2"])
+        self.assertEqual(
+            ExportCheckpoint.objects.get(name="nightly").completion_id,
+            FormCompletion.objects.latest("id").pk,
+        )
+
+
+class CompletedFormTests(SimpleTestCase):
+    def setUp(self):
+        # No model call is expected once every question is answered.
+        model = mock.Mock(side_effect=AssertionError("model called"))
+        self.enterContext(cifava_chat_service.runnable_provider.override(model))
+        self.enterContext(cifava_chat_service.classifier_provider.override(model))
+
+    def completed(self):
+        return {
+            "messages": [HumanMessage("eso es todo")],
+            "answers": {question.index: "sí" for question in QUESTION_CATALOG},
+            "next_question": len(QUESTION_CATALOG),
+        }
+
+    def assertClosed(self, state):
+        self.assertIsInstance(state["messages"][-1], AIMessage)
+        self.assertEqual(state["messages"][-1].content, cifava_chat_service.FORM_COMPLETED_REPLY)
+
+    def test_fused_turn_closes_the_form(self):
+        self.assertClosed(cifava_chat_service.analyze_and_respond(self.completed()))
+
+    def test_agent_closes_the_form(self):
+        state = cifava_chat_service.analyze_questions(self.completed())
+        self.assertClosed(cifava_chat_service.agent(state))
+
+    async def test_async_nodes_close_the_form(self):
+        self.assertClosed(await cifava_chat_service.aanalyze_and_respond(self.completed()))
+        self.assertClosed(await cifava_chat_service.aagent(self.completed()))
@@ -1,7 +1,17 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from django.views.generic import TemplateView
-from .views import CIFAVAChatAPIView, ChatAPIView
+from .views import (
+    AsyncChatView,
+    AsyncCIFAVAChatView,
+    CIFAVAChatAPIView,
+    ChatAPIView,
+    HybridSearchAPIView,
+    SearchManyAPIView,
+    completed_forms_export,
+    form_answers_csv,
+    metrics_view,
+)
 
 
 from django.views.generic import TemplateView
@@ -27,6 +37,29 @@ urlpatterns = [
     # IAV endpoints: example static page and chat endpoint
     path("iav/cifava/chat/", CIFAVAChatAPIView.as_view(), name="chat"),
 
+    # Async versions of the chat endpoints (serve with an ASGI server)
+    path("chat/async/", AsyncChatView.as_view(), name="chat-async"),
+    path(
+        "iav/cifava/chat/async/",
+        AsyncCIFAVAChatView.as_view(),
+        name="cifava-chat-async",
+    ),
+
+    # CSV export of the stored form answers
+    path("iav/cifava/answers.csv", form_answers_csv, name="cifava-answers-csv"),
+
+    # Completed forms, one row per form (staff only)
+    path("iav/cifava/forms/export", completed_forms_export, name="cifava-forms-export"),
+
+    # Vector search with many queries in one request
+    path("search/many/", SearchManyAPIView.as_view(), name="search-many"),
+
+    # Keyword (BM25) + vector search fused in one call
+    path("search/hybrid/", HybridSearchAPIView.as_view(), name="search-hybrid"),
+
+    # Prometheus metrics of this worker process
+    path("metrics", metrics_view, name="metrics"),
+
     path(
         "iav/cifava", TemplateView.as_view(template_name="static_page.html"), name="iav"
     ),
@@ -1,3 +1,4 @@
+import csv
 import json
 import logging
 import uuid  # Import to generate a unique thread_id
@@ -8,24 +9,107 @@ from drf_yasg.utils import swagger_auto_schema
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, SystemMessage
 from langgraph.prebuilt import create_react_agent
-from langgraph.checkpoint.memory import MemorySaver
 from rest_framework import serializers, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.throttling import ScopedRateThrottle
 from rest_framework.views import APIView
 
 # Django imports
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, render
+from django.views import View
 
 # Local application imports
 # from .models import Character
 # from .serializers import CharacterSerializer
-from .services.cifava_chat_service import handle_cifava_chat  # Import the chat logic
+from .search import hybrid_search
+from .services import metrics
+from .services.answer_store import answer_store
+from .services.form_export import (
+    EXPORT_FORMATS,
+    Echo,
+    export_lines,
+)
+from .services.checkpointer import checkpointer
+from .services.providers import LazyProvider
+from .services.cifava_chat_service import (  # Import the chat logic
+    ahandle_cifava_chat,
+    astream_cifava_chat,
+    handle_cifava_chat,
+    stream_cifava_chat,
+)
+from .services.streaming_service import astream_graph_tokens, stream_graph_tokens
+from .services.vector_service import get_faiss_manager
 
 # Configure logger
 logger = logging.getLogger(__name__)
 
 
+# -----------------------------------------------------------------------------
+# Server-Sent Events helpers shared by the chat endpoints.
+def sse_event(data, event=None):
+    """Format one Server-Sent Event."""
+    message = f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+    if event:
+        message = f"event: {event}\n{message}"
+    return message
+
+
+def sse_response(tokens):
+    """
+    Forward reply tokens as SSE: one ``data`` event per token, then an ``end``
+    event with the full reply (or an ``error`` event if the run failed).
+    """
+
+    def event_stream():
+        parts = []
+        try:
+            for token in tokens:
+                parts.append(token)
+                yield sse_event({"token": token})
+        except Exception:
+            logger.error("Error during streamed graph invocation", exc_info=True)
+            yield sse_event(
+                {"error": "An error occurred while processing your request."},
+                event="error",
+            )
+            return
+        yield sse_event({"response": "".join(parts)}, event="end")
+
+    return event_stream_response(event_stream())
+
+
+def asse_response(tokens):
+    """Async version of ``sse_response`` for async token iterators (ASGI)."""
+
+    async def event_stream():
+        parts = []
+        try:
+            async for token in tokens:
+                parts.append(token)
+                yield sse_event({"token": token})
+        except Exception:
+            logger.error("Error during streamed graph invocation", exc_info=True)
+            yield sse_event(
+                {"error": "An error occurred while processing your request."},
+                event="error",
+            )
+            return
+        yield sse_event({"response": "".join(parts)}, event="end")
+
+    return event_stream_response(event_stream())
+
+
+def event_stream_response(events):
+    response = StreamingHttpResponse(events, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Keep reverse proxies (nginx) from buffering the stream.
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
 # -----------------------------------------------------------------------------
 # CharacterViewSet: CRUD endpoints for managing characters via DRF.
 # class CharacterViewSet(viewsets.ModelViewSet):
@@ -95,18 +179,29 @@ class CharacterPromptAPIView(APIView):
         )
 
 
-llm = ChatOpenAI(model_name="gpt-3.5-turbo", temperature=0.7)
+def build_agent_graph():
+    llm = ChatOpenAI(model_name="gpt-3.5-turbo", temperature=0.7)
+    return create_react_agent(llm, tools=[], checkpointer=checkpointer)
 
-# Inicializar MemorySaver
-memory = MemorySaver()
 
-graph = create_react_agent(llm, tools=[], checkpointer=memory)
+# Built on first use, so loading the URLconf needs no OpenAI key.
+graph_provider = LazyProvider("chat_agent", build_agent_graph)
 
 
 # Define a serializer to validate input
 class ChatRequestSerializer(serializers.Serializer):
     prompt = serializers.CharField(required=True, allow_blank=False)
     system = serializers.CharField(required=False, allow_blank=True)
+    stream = serializers.BooleanField(required=False, default=False)
+
+
+class CIFAVAChatRequestSerializer(serializers.Serializer):
+    # A missing prompt keeps its own error message ("No prompt provided.").
+    prompt = serializers.CharField(
+        required=False, allow_blank=True, trim_whitespace=False, default=""
+    )
+    stream = serializers.BooleanField(required=False, default=False)
+
 
 class ChatAPIView(APIView):
     """
@@ -136,8 +231,11 @@ class ChatAPIView(APIView):
             "configurable": {
                 "thread_id": thread_id,
             },
+            "callbacks": metrics.callbacks(),
         }
 
+        graph = graph_provider.get()
+
         # Build the messages list including the optional system message
         messages = []
         system_message = data.get("system", "")
@@ -158,6 +256,12 @@ class ChatAPIView(APIView):
         # Append the human prompt message
         messages.append(HumanMessage(data["prompt"]))
 
+        # Streaming mode: forward tokens as Server-Sent Events
+        if data["stream"]:
+            return sse_response(
+                stream_graph_tokens(graph, {"messages": messages}, config, ["agent"])
+            )
+
         # Invoke the graph and handle potential exceptions
         try:
             final_state = graph.invoke({"messages": messages}, config)
@@ -198,6 +302,10 @@ class CIFAVAChatAPIView(APIView):
                     type=openapi.TYPE_STRING,
                     description="The user's prompt or question (in Spanish).",
                 ),
+                "stream": openapi.Schema(
+                    type=openapi.TYPE_BOOLEAN,
+                    description="Stream the response as Server-Sent Events (text/event-stream).",
+                ),
             },
             required=["prompt"],
         ),
@@ -214,20 +322,30 @@ class CIFAVAChatAPIView(APIView):
         },
     )
     def post(self, request, format=None):
+        serializer = CIFAVAChatRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
         # Get the user's message
-        user_prompt = request.data.get("prompt", "")
+        user_prompt = serializer.validated_data["prompt"]
         if not user_prompt:
             return Response(
                 {"error": "No prompt provided."}, status=status.HTTP_400_BAD_REQUEST
             )
         for key, value in request.session.items():
-            print("{} => {}".format(key, value))
+            logger.debug(f"Session item: {key} => {value}")
         # Generate a `thread_id` if it does not exist in the session
         thread_id = request.session.get("thread_id")
         if not thread_id:
             thread_id = str(uuid.uuid4())  # Generate a unique UUID
             request.session["thread_id"] = thread_id  # Store it in the session
 
+        # Streaming mode: forward tokens as Server-Sent Events
+        if serializer.validated_data["stream"]:
+            return sse_response(
+                stream_cifava_chat(user_prompt, form_id=thread_id, thread_id=thread_id)
+            )
+
         # Call chat logic with `thread_id`
         ai_response = handle_cifava_chat(
             user_prompt, form_id=thread_id, thread_id=thread_id
@@ -235,3 +353,321 @@ class CIFAVAChatAPIView(APIView):
 
         # Return the AI's response
         return Response({"response": ai_response})
+
+
+# -----------------------------------------------------------------------------
+# Async chat views. Served under ASGI (core.asgi), each request awaits the model
+# with ainvoke/astream instead of holding a worker thread, so one worker can
+# keep hundreds of conversations waiting on the LLM at the same time.
+async def aget_thread_id(request):
+    """Return the session's thread_id, creating one if it does not exist."""
+    thread_id = await request.session.aget("thread_id")
+    if not thread_id:
+        thread_id = str(uuid.uuid4())
+        await request.session.aset("thread_id", thread_id)
+        logger.debug(f"New thread_id generated: {thread_id}")
+    return thread_id
+
+
+def parse_json_body(request):
+    try:
+        return json.loads(request.body or b"{}")
+    except json.JSONDecodeError:
+        return None
+
+
+class AsyncChatView(View):
+    """
+    Async version of ChatAPIView.
+    URL: /chat/async/
+
+    The conversation is found through the session cookie, so the request
+    needs the CSRF token (``X-CSRFToken`` header) like any form post.
+    """
+
+    async def post(self, request):
+        payload = parse_json_body(request)
+        if payload is None:
+            return JsonResponse(
+                {"error": "Invalid JSON body."}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        serializer = ChatRequestSerializer(data=payload)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        thread_id = await aget_thread_id(request)
+
+        config = {
+            "configurable": {
+                "thread_id": thread_id,
+            },
+            "callbacks": metrics.callbacks(),
+        }
+        graph = graph_provider.get()
+
+        # Build the messages list including the optional system message
+        messages = []
+        system_message = data.get("system", "")
+        if system_message:
+            state = await graph.aget_state(config)
+            state_messages = state.values.get("messages", [])
+
+            if not len(state_messages):
+                messages.append(SystemMessage(content=system_message))
+            else:
+                for item in state_messages:
+                    if isinstance(item, SystemMessage) and item.content != system_message:
+                        await graph.aupdate_state(
+                            config,
+                            {"messages": [SystemMessage(content=system_message, id=item.id)]},
+                        )
+
+        messages.append(HumanMessage(data["prompt"]))
+
+        if data["stream"]:
+            return asse_response(
+                astream_graph_tokens(graph, {"messages": messages}, config, ["agent"])
+            )
+
+        try:
+            final_state = await graph.ainvoke({"messages": messages}, config)
+            response_content = final_state["messages"][-1].content
+        except Exception:
+            logger.error("Error during graph invocation", exc_info=True)
+            return JsonResponse(
+                {"error": "An error occurred while processing your request."},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+        return JsonResponse({"response": response_content})
+
+
+class AsyncCIFAVAChatView(View):
+    """
+    Async version of CIFAVAChatAPIView.
+    URL: /iav/cifava/chat/async/
+
+    Needs the CSRF token, like AsyncChatView.
+    """
+
+    async def post(self, request):
+        payload = parse_json_body(request)
+        if payload is None:
+            return JsonResponse(
+                {"error": "Invalid JSON body."}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        serializer = CIFAVAChatRequestSerializer(data=payload)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        user_prompt = serializer.validated_data["prompt"]
+        if not user_prompt:
+            return JsonResponse(
+                {"error": "No prompt provided."}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        thread_id = await aget_thread_id(request)
+
+        if serializer.validated_data["stream"]:
+            return asse_response(
+                astream_cifava_chat(user_prompt, form_id=thread_id, thread_id=thread_id)
+            )
+
+        ai_response = await ahandle_cifava_chat(
+            user_prompt, form_id=thread_id, thread_id=thread_id
+        )
+
+        return JsonResponse({"response": ai_response})
+
+
+# Largest batch accepted by the multi-query search endpoint.
+SEARCH_MANY_MAX_QUERIES = 16
+
+
+class SearchManyRequestSerializer(serializers.Serializer):
+    queries = serializers.ListField(
+        child=serializers.CharField(allow_blank=False),
+        allow_empty=False,
+        max_length=SEARCH_MANY_MAX_QUERIES,
+    )
+    k = serializers.IntegerField(required=False, default=4, min_value=1, max_value=100)
+    nprobe = serializers.IntegerField(required=False, min_value=1)
+    ef_search = serializers.IntegerField(required=False, min_value=1)
+
+
+class SearchManyAPIView(APIView):
+    """
+    Runs several vector searches in one request (agent tool calls, evaluation
+    jobs): the queries are embedded in one call and searched as one matrix.
+    Each request costs an embeddings call, so it is limited to authenticated
+    users at the ``search_many`` throttle rate.
+    """
+
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = "search_many"
+
+    @swagger_auto_schema(
+        operation_summary="Search the document index with many queries",
+        request_body=SearchManyRequestSerializer,
+        responses={
+            200: openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    "results": openapi.Schema(
+                        type=openapi.TYPE_ARRAY,
+                        description="One list of {content, metadata} per query, in order.",
+                        items=openapi.Schema(
+                            type=openapi.TYPE_ARRAY,
+                            items=openapi.Schema(type=openapi.TYPE_OBJECT),
+                        ),
+                    )
+                },
+            )
+        },
+    )
+    def post(self, request, format=None):
+        serializer = SearchManyRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        results = get_faiss_manager().search_many(
+            data["queries"],
+            k=data["k"],
+            nprobe=data.get("nprobe"),
+            ef_search=data.get("ef_search"),
+        )
+        return Response({"results": results})
+
+
+class HybridSearchRequestSerializer(serializers.Serializer):
+    query = serializers.CharField(allow_blank=False)
+    k = serializers.IntegerField(required=False, default=4, min_value=1, max_value=100)
+
+
+class HybridSearchAPIView(APIView):
+    """
+    Keyword (BM25) and vector search over the documents in one call, fused
+    by reciprocal rank; both indexes are local to the process. Authenticated
+    users only, at the ``hybrid_search`` throttle rate.
+    """
+
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = "hybrid_search"
+
+    @swagger_auto_schema(
+        operation_summary="Hybrid BM25 + vector search of the document index",
+        request_body=HybridSearchRequestSerializer,
+        responses={
+            200: openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    "results": openapi.Schema(
+                        type=openapi.TYPE_ARRAY,
+                        description="{content, metadata, score, ranks}, best first.",
+                        items=openapi.Schema(type=openapi.TYPE_OBJECT),
+                    )
+                },
+            )
+        },
+    )
+    def post(self, request, format=None):
+        serializer = HybridSearchRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        return Response({"results": hybrid_search(data["query"], k=data["k"])})
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint (text exposition format 0.0.4). Staff users
+    and clients in ``METRICS_ALLOWED_NETWORKS`` only.
+    """
+    if not metrics.METRICS_ENABLED:
+        raise Http404("Metrics are disabled.")
+    if not (request.user.is_staff or metrics.scrape_allowed(request.META.get("REMOTE_ADDR"))):
+        return JsonResponse({"error": "Forbidden."}, status=status.HTTP_403_FORBIDDEN)
+    return HttpResponse(
+        metrics.registry.render(),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+def form_answers_csv(request):
+    """
+    Streams the stored CIFAVA answers as CSV, one row at a time, so the export
+    never builds the whole file in memory.
+
+    Staff users get every form (or the one in ``?form_id=``); anyone else only
+    gets the form of their own session.
+    """
+    if request.user.is_staff:
+        form_id = request.GET.get("form_id")
+    else:
+        form_id = request.session.get("thread_id")
+        if not form_id:
+            raise Http404("No form in this session.")
+
+    writer = csv.writer(Echo())
+
+    def rows():
+        yield writer.writerow(["form_id", "question_key", "question", "answer", "answered_at"])
+        for answer in answer_store.export_rows(form_id):
+            yield writer.writerow(
+                [
+                    answer.form_id,
+                    answer.question_key,
+                    answer.question,
+                    answer.answer,
+                    answer.answered_at.isoformat(),
+                ]
+            )
+
+    response = StreamingHttpResponse(rows(), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = 'attachment; filename="answered_questions.csv"'
+    return response
+
+
+def completed_forms_export(request):
+    """
+    Streams every completed CIFAVA form as one row (CSV or JSON Lines) with
+    the answers as columns, reading the forms in chunks.
+
+    ``?format=csv|jsonl`` picks the format. Every row carries a ``cursor``;
+    ``?after=<cursor>`` sends only the forms completed after that row, so a
+    download cut short resumes from the last row the client received.
+    Nothing is recorded on the server (named checkpoints are kept by the
+    ``export_forms`` command, which writes the rows itself). Staff only.
+    """
+    if not request.user.is_staff:
+        return JsonResponse({"error": "Forbidden."}, status=status.HTTP_403_FORBIDDEN)
+
+    fmt = request.GET.get("format", "csv")
+    if fmt not in EXPORT_FORMATS:
+        return JsonResponse(
+            {"error": f"format must be one of: {', '.join(EXPORT_FORMATS)}."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    after = request.GET.get("after")
+    if after is not None:
+        try:
+            after = int(after)
+        except ValueError:
+            return JsonResponse(
+                {"error": "after must be the cursor of an exported row."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+    lines = export_lines(fmt, after=after)
+    content_type = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    response = StreamingHttpResponse(lines, content_type=f"{content_type}; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="cifava_forms.{fmt}"'
+    return response